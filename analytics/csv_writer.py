@@ -0,0 +1,196 @@
+"""
+نوشتن CSVهای analytics روی thread پس‌زمینه
+
+log_signal، log_trade و log_position_event فقط سطر را در یک صف محدود می‌گذارند و
+thread معاملاتی (اطراف order_send) هیچ‌وقت منتظر دیسک نمی‌ماند. CSVWriter فایل هر روز
+را باز نگه می‌دارد (با رسیدن فایل روز بعد همان نوع، فایل قبلی بسته می‌شود)، سطرها را
+دسته‌ای می‌نویسد و هر batch_rows سطر یا هر flush_interval ثانیه flush می‌کند. اگر صف پر
+باشد سطر دور ریخته و در dropped شمرده می‌شود. close() (shutdown_analytics در پایان main و atexit) باقی‌مانده
+صف را می‌نویسد و فایل‌ها را می‌بندد.
+
+sinks (مثلا AnalyticsStore) هر سطر را با add(kind, row, path) روی همین thread دریافت
+می‌کنند و بعد از هر flush فایل‌ها flush می‌شوند (سطرها در آن لحظه روی دیسک هستند).
+"""
+
+import csv
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+_STOP = object()
+
+
+class _OpenFile:
+    __slots__ = ("fp", "file", "writer")
+
+    def __init__(self, fp: Path, headers: list):
+        self.fp = fp
+        new = not fp.exists() or fp.stat().st_size == 0
+        self.file = fp.open("a", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.file, fieldnames=headers, extrasaction="ignore")
+        if new:
+            self.writer.writeheader()
+
+
+class CSVWriter:
+    """صف محدود سطرهای CSV و thread نویسنده با file handleهای باز"""
+
+    def __init__(self, maxsize: int = 10000, flush_interval: float = 1.0, batch_rows: int = 256):
+        self.flush_interval = flush_interval
+        self.batch_rows = batch_rows
+        self._queue = queue.Queue(maxsize)
+        self._files = {}  # مسیر فایل -> _OpenFile
+        self.sinks = []   # اشیای با add(kind, row, path) و flush()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.errors = 0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if not self.running and not self._closed:
+                self._thread = threading.Thread(target=self._run, name="analytics-writer", daemon=True)
+                self._thread.start()
+        return self
+
+    def write(self, fp: Path, headers: list, row: dict, kind: Optional[str] = None) -> bool:
+        """گذاشتن یک سطر در صف (بدون انتظار)؛ False اگر صف پر یا writer بسته باشد"""
+        if self._closed:
+            self.dropped += 1
+            return False
+        if not self.running:
+            self.start()
+        try:
+            self._queue.put_nowait((Path(fp), headers, row, kind))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                print(f"[analytics.csv_writer] Warning: queue full, {self.dropped} row(s) dropped")
+            return False
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """انتظار تا نوشته و flush شدن سطرهای فعلی صف (برای تست و پایان برنامه)"""
+        if not self.running:
+            return self._queue.empty()
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """نوشتن باقی‌مانده صف و بستن فایل‌ها؛ سطرهای بعد از close دور ریخته می‌شوند"""
+        if self._closed:
+            return
+        self._closed = True
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                pass
+            thread.join(timeout)
+        if thread is None or not thread.is_alive():
+            # thread اجرا نشده یا تمام شده: باقی‌مانده صف همین‌جا نوشته می‌شود
+            self._drain()
+            self._close_files()
+
+    def stats(self) -> dict:
+        return {"queue": self._queue.qsize(), "written": self.written, "dropped": self.dropped,
+                "flushes": self.flushes, "errors": self.errors, "open_files": len(self._files)}
+
+    def _run(self):
+        pending = 0
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush)) if pending else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                self._drain()
+                self._close_files()
+                return
+            if isinstance(item, threading.Event):
+                self._flush_files()
+                pending, last_flush = 0, time.monotonic()
+                item.set()
+                continue
+            if item is not None:
+                self._write(*item)
+                pending += 1
+            if pending and (pending >= self.batch_rows or time.monotonic() - last_flush >= self.flush_interval):
+                self._flush_files()
+                pending, last_flush = 0, time.monotonic()
+
+    def _drain(self):
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is not _STOP:
+                self._write(*item)
+        self._flush_files()
+
+    def _write(self, fp: Path, headers: list, row: dict, kind: Optional[str] = None):
+        try:
+            f = self._files.get(fp)
+            if f is None:
+                f = self._open(fp, headers)
+            f.writer.writerow(row)
+            self.written += 1
+        except Exception as e:
+            self.errors += 1
+            print(f"[analytics.csv_writer] Failed to write {fp.name}: {e}")
+        if kind is not None:
+            for sink in self.sinks:
+                try:
+                    sink.add(kind, row, fp)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"[analytics.csv_writer] Sink {type(sink).__name__} failed: {e}")
+
+    def _open(self, fp: Path, headers: list) -> _OpenFile:
+        # فایل روز قبل همان نوع ({symbol}_{kind}_{date}.csv) دیگر لازم نیست
+        prefix = fp.name.rsplit("_", 1)[0]
+        for other in [p for p in self._files if p.parent == fp.parent and p.name.rsplit("_", 1)[0] == prefix]:
+            self._files.pop(other).file.close()
+        f = self._files[fp] = _OpenFile(fp, headers)
+        return f
+
+    def _flush_files(self):
+        for f in self._files.values():
+            try:
+                f.file.flush()
+            except Exception:
+                self.errors += 1
+        for sink in self.sinks:
+            try:
+                sink.flush()
+            except Exception as e:
+                self.errors += 1
+                print(f"[analytics.csv_writer] Sink {type(sink).__name__} flush failed: {e}")
+        self.flushes += 1
+
+    def _close_files(self):
+        for f in self._files.values():
+            try:
+                f.file.close()
+            except Exception:
+                self.errors += 1
+        self._files.clear()
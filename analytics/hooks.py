@@ -1,14 +1,21 @@
-import os, csv
-from datetime import datetime, timezone, timedelta
+import os, csv, atexit
+from datetime import timezone, timedelta
 from pathlib import Path
 from typing import Optional
 
+from clock_gold import now, utcnow
+from metatrader5_config_gold import LOG_CONFIG
+from analytics.tick_recorder import TickRecorder
+from analytics.csv_writer import CSVWriter
+from analytics.store import AnalyticsStore
+
 ROOT = Path(__file__).resolve().parent  # gold_trading_bot
 RAW_DIR = ROOT / "trading-analytics-logger" / "data" / "raw"
 MARKET_DIR = RAW_DIR / "market"
 SIGNAL_DIR = RAW_DIR / "signals"
 TRADE_DIR  = RAW_DIR / "trades"
 EVENT_DIR  = RAW_DIR / "events"
+DB_PATH = ROOT / "trading-analytics-logger" / "analytics.db"
 
 def _ensure_dirs():
     """Ensure required directories exist."""
@@ -36,21 +43,87 @@ _ensure_dirs()
 
 def _iran_now_str():
     tehran = timezone(timedelta(hours=3, minutes=30))
-    return datetime.now(tehran).strftime("%Y-%m-%d %H:%M:%S")
+    return now(tehran).strftime("%Y-%m-%d %H:%M:%S")
 
 def _utc_now_str():
-    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    return utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+_csv_writer = None
+_store = None
+
+def _get_store() -> Optional[AnalyticsStore]:
+    """پایگاه داده SQLite (اگر LOG_CONFIG['sqlite_store'] فعال باشد)"""
+    global _store
+    if _store is None and LOG_CONFIG.get("sqlite_store", False):
+        _store = AnalyticsStore(DB_PATH)
+        atexit.register(_store.close)
+    return _store
+
+def _get_csv_writer() -> CSVWriter:
+    global _csv_writer
+    if _csv_writer is None:
+        store = _get_store()  # atexit: اول writer و بعد store بسته می‌شود
+        _csv_writer = CSVWriter(maxsize=LOG_CONFIG.get("csv_queue_size", 10000),
+                                flush_interval=LOG_CONFIG.get("csv_flush_interval", 1.0),
+                                batch_rows=LOG_CONFIG.get("csv_batch_rows", 256))
+        if store is not None:
+            _csv_writer.sinks.append(store)
+        atexit.register(_csv_writer.close)
+    return _csv_writer
 
-def _append_csv(fp: Path, headers: list[str], row: dict):
+def analytics_stats() -> dict:
+    """وضعیت writerهای پس‌زمینه (عمق صف، سطرهای نوشته/دور ریخته شده)"""
+    stats = {}
+    if _csv_writer is not None:
+        stats["csv"] = _csv_writer.stats()
+    if _tick_recorder is not None:
+        stats["ticks"] = {"records": _tick_recorder.records, "flushes": _tick_recorder.flushes}
+    return stats
+
+def shutdown_analytics() -> dict:
+    """نوشتن باقی‌مانده صف‌ها و بستن فایل‌ها (در پایان main)؛ خروجی analytics_stats"""
+    if _csv_writer is not None:
+        _csv_writer.close()
+    if _tick_recorder is not None:
+        _tick_recorder.close()
+    if _store is not None:
+        _store.flush()
+    return analytics_stats()
+
+def _append_csv(fp: Path, headers: list[str], row: dict, kind: Optional[str] = None):
+    if LOG_CONFIG.get("async_csv", True):
+        _get_csv_writer().write(fp, headers, row, kind)
+        return
     file_exists = fp.exists()
     with fp.open("a", newline="", encoding="utf-8") as f:
         w = csv.DictWriter(f, fieldnames=headers, extrasaction="ignore")
         if not file_exists:
             w.writeheader()
         w.writerow(row)
+    store = _get_store()
+    if store is not None and kind is not None:
+        store.insert(kind, [row], fp)
+
+_tick_recorder = None
+
+def _get_tick_recorder() -> TickRecorder:
+    global _tick_recorder
+    if _tick_recorder is None:
+        store = _get_store()  # atexit: اول recorder و بعد store بسته می‌شود
+        _tick_recorder = TickRecorder(MARKET_DIR, flush_interval=LOG_CONFIG.get("tick_flush_interval", 1.0))
+        if store is not None:
+            _tick_recorder.sinks.append(store)
+        atexit.register(_tick_recorder.close)
+    return _tick_recorder
 
-def log_market(symbol: str, bid: float, ask: float, last: Optional[float], point: float, digits: int, source="mt5", session="bot"):
-    """ذخیره داده‌های بازار (ticks)"""
+def log_market(symbol: str, bid: float, ask: float, last: Optional[float], point: float, digits: int, source="mt5", session="bot",
+               time_msc: Optional[int]=None, flags: int=0):
+    """ذخیره داده‌های بازار (ticks)؛ در حالت 'bin' فایل باینری روزانه (CSV با tick_recorder.to_csv)"""
+    if LOG_CONFIG.get("market_format", "csv") == "bin":
+        if time_msc is None:
+            time_msc = int(utcnow().timestamp() * 1000)
+        _get_tick_recorder().record(symbol, time_msc, bid, ask, last, flags, point, digits)
+        return
     pip = 0.01 if digits in (2,3) else 0.0001
     spread_points = (ask - bid) / point if (ask and bid and point) else None
     spread_pips = (ask - bid) / pip if (ask and bid) else None
@@ -63,11 +136,11 @@ def log_market(symbol: str, bid: float, ask: float, last: Optional[float], point
         "point": point, "digits": digits,
         "source": source, "session": session
     }
-    fp = MARKET_DIR / f"{symbol}_ticks_{datetime.utcnow():%Y-%m-%d}.csv"
+    fp = MARKET_DIR / f"{symbol}_ticks_{utcnow():%Y-%m-%d}.csv"
     _append_csv(fp, [
         "dt_utc","dt_iran","symbol","bid","ask","last",
         "spread_points","spread_pips","point","digits","source","session"
-    ], row)
+    ], row, "market")
 
 def log_signal(symbol: str, strategy: str, direction: str, rr: float, entry: float, sl: float, tp: Optional[float],
                fib: Optional[dict]=None, confidence: Optional[float]=None, features_json: Optional[str]=None, note: Optional[str]=None):
@@ -81,11 +154,11 @@ def log_signal(symbol: str, strategy: str, direction: str, rr: float, entry: flo
         "fib_0": fib.get("0.0"), "fib_0705": fib.get("0.705"), "fib_09": fib.get("0.9"), "fib_1": fib.get("1.0"),
         "confidence": confidence, "features_json": features_json, "note": note
     }
-    fp = SIGNAL_DIR / f"{symbol}_signals_{datetime.utcnow():%Y-%m-%d}.csv"
+    fp = SIGNAL_DIR / f"{symbol}_signals_{utcnow():%Y-%m-%d}.csv"
     _append_csv(fp, [
         "dt_utc","dt_iran","symbol","strategy","direction","rr","entry","sl","tp",
         "fib_0","fib_0705","fib_09","fib_1","confidence","features_json","note"
-    ], row)
+    ], row, "signals")
 
 def log_trade(symbol: str, side: str, request: dict, result, reason: str=""):
     """ذخیره معاملات انجام شده"""
@@ -116,17 +189,17 @@ def log_trade(symbol: str, side: str, request: dict, result, reason: str=""):
         "magic": request.get("magic"), "reason": reason,
         "risk_abs": risk_abs
     }
-    fp = TRADE_DIR / f"{symbol}_trades_{datetime.utcnow():%Y-%m-%d}.csv"
+    fp = TRADE_DIR / f"{symbol}_trades_{utcnow():%Y-%m-%d}.csv"
     _append_csv(fp, [
         "dt_utc","dt_iran","symbol","side","req_price","req_vol","req_deviation","req_filling",
         "retcode","order","deal","result_price","result_comment","sl","tp","magic","reason","risk_abs"
-    ], row)
+    ], row, "trades")
 
 def log_position_event(symbol: str, ticket: int, event: str, direction: str, entry: float, current_price: float,
                         sl: float, tp: Optional[float], profit_R: Optional[float], stage: Optional[int], risk_abs: Optional[float],
                         locked_R: Optional[float] = None, volume: Optional[float] = None, note: Optional[str] = None):
     """ذخیره رویدادهای پوزیشن (open, close, trailing, etc.)"""
-    fp = EVENT_DIR / f"{symbol}_position_events_{datetime.utcnow():%Y-%m-%d}.csv"
+    fp = EVENT_DIR / f"{symbol}_position_events_{utcnow():%Y-%m-%d}.csv"
     headers = [
         "dt_utc","dt_iran","symbol","ticket","event","direction","stage","entry","current_price",
         "sl","tp","risk_abs","profit_R","locked_R","volume","note"
@@ -149,5 +222,5 @@ def log_position_event(symbol: str, ticket: int, event: str, direction: str, ent
         "volume": volume,
         "note": note
     }
-    _append_csv(fp, headers, row)
+    _append_csv(fp, headers, row, "events")
 
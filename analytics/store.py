@@ -0,0 +1,315 @@
+"""
+پایگاه داده SQLite محلی برای analytics (کنار CSVهای خام)
+
+هر نوع داده (market، signals، trades، events) یک جدول با همان ستون‌های CSV دارد و یک
+ستون ts (epoch ثانیه از dt_utc) برای بازه‌های زمانی. پایگاه داده در حالت WAL باز می‌شود
+تا خواندن (تحلیل‌ها) همزمان با نوشتن ربات ممکن باشد و روی ts، symbol، ticket و
+order/deal index دارد.
+
+    store = AnalyticsStore("trading-analytics-logger/analytics.db")
+    import_history(store)                       # CSVها و فایل‌های .bin قبلی (فقط فایل‌های جدید/تغییر کرده)
+    store.events_for_ticket(123456)
+    store.signals_with_trades(since="2025-01-01", until="2025-04-01")
+
+نوشتن از hooks روی thread نویسنده CSVWriter انجام می‌شود (add و commit دسته‌ای در flush)؛
+tickهای حالت 'bin' با add_ticks روی thread همان TickRecorder.
+هر سطر همراه مسیر فایل خامی که در آن نوشته شده ثبت می‌شود و imported_files با همان
+commit به‌روز می‌شود، پس import_history سطرهای نوشته شده توسط خود ربات را دوباره وارد
+نمی‌کند.
+"""
+
+import csv
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+SCHEMA = {
+    "market": [
+        ("dt_utc", "TEXT"), ("dt_iran", "TEXT"), ("symbol", "TEXT"), ("bid", "REAL"), ("ask", "REAL"),
+        ("last", "REAL"), ("spread_points", "REAL"), ("spread_pips", "REAL"), ("point", "REAL"),
+        ("digits", "INTEGER"), ("source", "TEXT"), ("session", "TEXT"),
+    ],
+    "signals": [
+        ("dt_utc", "TEXT"), ("dt_iran", "TEXT"), ("symbol", "TEXT"), ("strategy", "TEXT"), ("direction", "TEXT"),
+        ("rr", "REAL"), ("entry", "REAL"), ("sl", "REAL"), ("tp", "REAL"), ("fib_0", "REAL"), ("fib_0705", "REAL"),
+        ("fib_09", "REAL"), ("fib_1", "REAL"), ("confidence", "REAL"), ("features_json", "TEXT"), ("note", "TEXT"),
+    ],
+    "trades": [
+        ("dt_utc", "TEXT"), ("dt_iran", "TEXT"), ("symbol", "TEXT"), ("side", "TEXT"), ("req_price", "REAL"),
+        ("req_vol", "REAL"), ("req_deviation", "INTEGER"), ("req_filling", "INTEGER"), ("retcode", "INTEGER"),
+        ("order", "INTEGER"), ("deal", "INTEGER"), ("result_price", "REAL"), ("result_comment", "TEXT"),
+        ("sl", "REAL"), ("tp", "REAL"), ("magic", "INTEGER"), ("reason", "TEXT"), ("risk_abs", "REAL"),
+    ],
+    "events": [
+        ("dt_utc", "TEXT"), ("dt_iran", "TEXT"), ("symbol", "TEXT"), ("ticket", "INTEGER"), ("event", "TEXT"),
+        ("direction", "TEXT"), ("stage", "INTEGER"), ("entry", "REAL"), ("current_price", "REAL"), ("sl", "REAL"),
+        ("tp", "REAL"), ("risk_abs", "REAL"), ("profit_R", "REAL"), ("locked_R", "REAL"), ("volume", "REAL"),
+        ("note", "TEXT"),
+    ],
+}
+
+INDEXES = {
+    "market": [("ts",), ("symbol", "ts")],
+    "signals": [("ts",), ("symbol", "ts")],
+    "trades": [("ts",), ("symbol", "ts"), ("order",), ("deal",)],
+    "events": [("ts",), ("symbol", "ts"), ("ticket", "ts")],
+}
+
+# زیرپوشه‌های RAW_DIR و الگوی نام فایل‌های هر جدول
+RAW_LAYOUT = {
+    "market": ("market", "*_ticks_*"),
+    "signals": ("signals", "*_signals_*.csv"),
+    "trades": ("trades", "*_trades_*.csv"),
+    "events": ("events", "*_position_events_*.csv"),
+}
+
+
+def _ts(dt_utc) -> Optional[float]:
+    if not dt_utc:
+        return None
+    try:
+        return datetime.strptime(dt_utc, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return None
+
+
+def _to_ts(value) -> Optional[float]:
+    """ورودی بازه زمانی query: None، epoch، datetime یا رشته تاریخ (UTC)"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp()
+
+
+class AnalyticsStore:
+    """پایگاه داده SQLite (WAL) با جدول‌های analytics و چند query آماده"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._pending = {}  # (kind, path فایل خام) -> سطرها
+        self._pending_lock = threading.Lock()
+        self._files = set()  # فایل‌های خامی که در این اجرا سطرهایشان نوشته شده
+        self._insert_sql = {}
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._create()
+
+    def _create(self):
+        for kind, columns in SCHEMA.items():
+            cols = ", ".join(f'"{name}" {type_}' for name, type_ in columns)
+            self._conn.execute(f'CREATE TABLE IF NOT EXISTS {kind} (id INTEGER PRIMARY KEY, ts REAL, {cols})')
+            for index in INDEXES[kind]:
+                name = f"ix_{kind}_{'_'.join(index)}"
+                on = ", ".join('"%s"' % c for c in index)
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {kind} ({on})")
+            names = ["ts"] + [name for name, _ in columns]
+            quoted = ", ".join('"%s"' % n for n in names)
+            self._insert_sql[kind] = f"INSERT INTO {kind} ({quoted}) VALUES ({', '.join('?' * len(names))})"
+        self._conn.execute("CREATE TABLE IF NOT EXISTS imported_files (path TEXT PRIMARY KEY, size INTEGER, rows INTEGER)")
+        self._conn.commit()
+
+    def _values(self, kind, row):
+        return [_ts(row.get("dt_utc"))] + [None if row.get(name) == "" else row.get(name) for name, _ in SCHEMA[kind]]
+
+    # --- نوشتن ---
+    def add(self, kind: str, row: dict, path=None):
+        """
+        اضافه کردن یک سطر (با ستون‌های CSV همان نوع) به بافر؛ نوشتن با flush. path فایل
+        خامی است که همین سطر در آن نوشته شده (برای imported_files).
+        """
+        values = self._values(kind, row)
+        with self._pending_lock:
+            self._pending.setdefault((kind, path), []).append(values)
+
+    def add_ticks(self, path, symbol: str, point: float, digits: int, ticks):
+        """اضافه کردن رکوردهای TICK_DTYPE نوشته شده در فایل باینری path به جدول market"""
+        values = [self._values("market", row) for row in tick_rows(symbol, point, digits, ticks)]
+        with self._pending_lock:
+            self._pending.setdefault(("market", path), []).extend(values)
+
+    def flush(self):
+        """نوشتن سطرهای بافر شده در یک transaction"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        with self._lock, self._conn:
+            return sum(self._write(kind, rows, path) for (kind, path), rows in pending.items())
+
+    def insert(self, kind: str, rows, path=None):
+        """نوشتن مستقیم چند سطر dict در یک transaction"""
+        values = [self._values(kind, row) for row in rows]
+        with self._lock, self._conn:
+            return self._write(kind, values, path)
+
+    def _write(self, kind, values, path):
+        """
+        executemany سطرها و ثبت فایل خام آن‌ها در imported_files (زیر lock و transaction).
+        فایل باید شامل همین سطرها باشد؛ اولین بار در هر اجرا سطرهای فایل که هنوز در
+        پایگاه داده نیستند (مثلا نوشته شده قبل از فعال شدن sqlite_store) از خود فایل خوانده
+        می‌شوند.
+        """
+        if path is not None:
+            path = Path(path)
+            key = str(path.resolve())
+            row = self._conn.execute("SELECT rows FROM imported_files WHERE path = ?", (key,)).fetchone()
+            done = row[0] if row else 0
+            if key in self._files:
+                total = done + len(values)
+            else:
+                rows = _read_rows(path) if path.exists() else []
+                values = [self._values(kind, r) for r in rows[done:]]
+                total = len(rows)
+                self._files.add(key)
+            size = path.stat().st_size if path.exists() else 0
+            self._conn.execute("INSERT OR REPLACE INTO imported_files VALUES (?, ?, ?)", (key, size, total))
+        self._conn.executemany(self._insert_sql[kind], values)
+        return len(values)
+
+    def imported(self, path: str) -> Optional[tuple]:
+        """(size, rows) فایلی که قبلا با import_history وارد شده"""
+        with self._lock:
+            row = self._conn.execute("SELECT size, rows FROM imported_files WHERE path = ?", (path,)).fetchone()
+        return tuple(row) if row else None
+
+    def mark_imported(self, path: str, size: int, rows: int):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO imported_files VALUES (?, ?, ?)", (path, size, rows))
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    # --- خواندن ---
+    def query(self, sql: str, params=()) -> list:
+        """اجرای SELECT دلخواه؛ خروجی لیست dict"""
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(sql, params).fetchall()]
+
+    def _range(self, kind, since=None, until=None, symbol=None, where=(), params=()):
+        clauses, args = list(where), list(params)
+        if since is not None:
+            clauses.append("ts >= ?")
+            args.append(_to_ts(since))
+        if until is not None:
+            clauses.append("ts < ?")
+            args.append(_to_ts(until))
+        if symbol is not None:
+            clauses.append("symbol = ?")
+            args.append(symbol)
+        sql = f"SELECT * FROM {kind}" + (f" WHERE {' AND '.join(clauses)}" if clauses else "") + " ORDER BY ts, id"
+        return self.query(sql, args)
+
+    def signals(self, since=None, until=None, symbol=None) -> list:
+        return self._range("signals", since, until, symbol)
+
+    def trades(self, since=None, until=None, symbol=None) -> list:
+        return self._range("trades", since, until, symbol)
+
+    def events(self, since=None, until=None, symbol=None) -> list:
+        return self._range("events", since, until, symbol)
+
+    def events_for_ticket(self, ticket: int) -> list:
+        return self._range("events", where=("ticket = ?",), params=(int(ticket),))
+
+    def signals_with_trades(self, since=None, until=None, symbol=None, window: float = 300) -> list:
+        """
+        هر سیگنال با اولین معامله هم‌جهت همان نماد تا window ثانیه بعد از آن (ستون‌های
+        معامله با پیشوند trade_؛ None اگر معامله‌ای نباشد)
+        """
+        clauses, args = [], []
+        if since is not None:
+            clauses.append("s.ts >= ?")
+            args.append(_to_ts(since))
+        if until is not None:
+            clauses.append("s.ts < ?")
+            args.append(_to_ts(until))
+        if symbol is not None:
+            clauses.append("s.symbol = ?")
+            args.append(symbol)
+        sql = f"""
+            SELECT s.*, t.dt_utc AS trade_dt_utc, t.retcode AS trade_retcode, t."order" AS trade_order,
+                   t.deal AS trade_deal, t.result_price AS trade_price, t.req_vol AS trade_volume,
+                   t.sl AS trade_sl, t.reason AS trade_reason
+            FROM signals s
+            LEFT JOIN trades t ON t.id = (
+                SELECT id FROM trades
+                WHERE symbol = s.symbol AND side = s.direction AND ts >= s.ts AND ts <= s.ts + ?
+                ORDER BY ts, id LIMIT 1)
+            {"WHERE " + " AND ".join(clauses) if clauses else ""}
+            ORDER BY s.ts, s.id"""
+        return self.query(sql, [window] + args)
+
+
+def tick_rows(symbol: str, point: float, digits: int, ticks) -> list:
+    """سطرهای جدول market (ستون‌های CSV قبلی log_market) از رکوردهای TICK_DTYPE"""
+    import pandas as pd
+
+    if not len(ticks):
+        return []
+    utc = pd.to_datetime(ticks["time_msc"], unit="ms", utc=True)
+    iran = utc + pd.Timedelta(hours=3, minutes=30)
+    pip = 0.01 if digits in (2, 3) else 0.0001
+    return [
+        {"dt_utc": u, "dt_iran": i, "symbol": symbol, "bid": b, "ask": a,
+         "last": None if l != l else l, "spread_points": (a - b) / point if point else None,
+         "spread_pips": (a - b) / pip, "point": point, "digits": digits, "source": "mt5", "session": "bot"}
+        for u, i, b, a, l in zip(utc.strftime("%Y-%m-%d %H:%M:%S"), iran.strftime("%Y-%m-%d %H:%M:%S"),
+                                 ticks["bid"].tolist(), ticks["ask"].tolist(), ticks["last"].tolist())
+    ]
+
+
+def _read_rows(fp: Path):
+    if fp.suffix == ".bin":
+        from analytics.tick_recorder import read_ticks
+
+        tf = read_ticks(fp)
+        return tick_rows(tf.symbol, tf.point, tf.digits, tf.ticks)
+    with fp.open(newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def import_history(store: AnalyticsStore, raw_dir=None, kinds=None) -> dict:
+    """
+    وارد کردن CSVها (و فایل‌های باینری tick) زیر raw_dir. فایلی که با همان اندازه قبلا
+    وارد شده رد می‌شود؛ فایلی که بزرگ‌تر شده (روز جاری) فقط سطرهای جدیدش وارد می‌شود.
+    خروجی تعداد سطرهای وارد شده برای هر جدول.
+    """
+    if raw_dir is None:
+        from analytics.hooks import RAW_DIR as raw_dir
+    raw_dir = Path(raw_dir)
+    counts = {}
+    for kind in kinds or SCHEMA:
+        subdir, pattern = RAW_LAYOUT[kind]
+        counts[kind] = 0
+        for fp in sorted((raw_dir / subdir).glob(pattern)):
+            if fp.suffix not in (".csv", ".bin"):
+                continue
+            if fp.suffix == ".csv" and fp.with_suffix(".bin").exists():
+                continue  # خروجی to_csv همان فایل باینری
+            key, size = str(fp.resolve()), fp.stat().st_size
+            done = store.imported(key)
+            if done and done[0] == size:
+                continue
+            rows = _read_rows(fp)
+            skip = done[1] if done else 0
+            store.insert(kind, rows[skip:])
+            store.mark_imported(key, size, len(rows))
+            counts[kind] += len(rows) - skip
+    return counts
+
+
+if __name__ == "__main__":
+    import sys
+
+    db = sys.argv[1] if len(sys.argv) > 1 else Path(__file__).resolve().parent / "trading-analytics-logger" / "analytics.db"
+    print(import_history(AnalyticsStore(db)))
@@ -0,0 +1,204 @@
+"""
+ضبط باینری tickها به جای یک سطر CSV برای هر tick
+
+هر فایل روزانه ({symbol}_ticks_{YYYY-MM-DD}.bin، تاریخ UTC زمان tick) یک header ثابت
+64 بایتی (symbol، point، digits) و بعد رکوردهای هم‌اندازه TICK_DTYPE دارد
+(time_msc، bid، ask، last، flags). TickRecorder رکوردها را در حافظه جمع می‌کند و یک
+thread پس‌زمینه آن‌ها را هر flush_interval ثانیه (یا با پر شدن بافر) با یک write به
+انتهای فایل اضافه می‌کند؛ هزینه record فقط یک append به لیست است.
+
+read_ticks فایل را با np.memmap و بدون کپی به صورت آرایه‌های NumPy می‌خواند و
+to_csv همان ستون‌های CSV قبلی log_market را می‌سازد. sinks (مثلا AnalyticsStore) بعد
+از هر write رکوردهای همان فایل را با add_ticks(path, symbol, point, digits, ticks) دریافت
+می‌کنند:
+
+    python -m analytics.tick_recorder trading-analytics-logger/data/raw/market/XAUUSD_ticks_2025-01-06.bin
+"""
+
+import sys
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+MAGIC = b"GTBTICK1"
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"), ("version", "<u4"), ("digits", "<i4"), ("point", "<f8"),
+    ("symbol", "S32"), ("reserved", "S8"),
+])  # 64 بایت
+
+TICK_DTYPE = np.dtype([
+    ("time_msc", "<i8"), ("bid", "<f8"), ("ask", "<f8"), ("last", "<f8"), ("flags", "<u4"),
+])  # 36 بایت، بدون padding
+
+CSV_HEADERS = [
+    "dt_utc", "dt_iran", "symbol", "bid", "ask", "last",
+    "spread_points", "spread_pips", "point", "digits", "source", "session",
+]
+
+
+def tick_file(directory: Path, symbol: str, time_msc: int) -> Path:
+    day = datetime.fromtimestamp(time_msc // 1000, tz=timezone.utc)
+    return Path(directory) / f"{symbol}_ticks_{day:%Y-%m-%d}.bin"
+
+
+class TickRecorder:
+    """بافر tickها و نوشتن دسته‌ای آن‌ها در فایل‌های باینری روزانه روی thread جدا"""
+
+    def __init__(self, directory: Path, flush_interval: float = 1.0, buffer_records: int = 4096):
+        self.directory = Path(directory)
+        self.flush_interval = flush_interval
+        self.buffer_records = buffer_records
+        self._pending = {}  # (symbol, day) -> لیست رکوردها
+        self._meta = {}     # symbol -> (point, digits)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.sinks = []  # اشیای با add_ticks(path, symbol, point, digits, ticks) و flush()
+        self.records = 0
+        self.flushes = 0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="tick-recorder", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """توقف thread و نوشتن رکوردهای باقی‌مانده"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[analytics.tick_recorder] flush failed: {e}")
+
+    def record(self, symbol: str, time_msc: int, bid: float, ask: float, last: Optional[float],
+               flags: int = 0, point: float = 0.0, digits: int = 0):
+        """اضافه کردن یک tick به بافر (نوشتن در فایل با flush بعدی)"""
+        key = (symbol, time_msc // 86400000)
+        row = (time_msc, bid, ask, np.nan if last is None else last, flags)
+        with self._lock:
+            rows = self._pending.get(key)
+            if rows is None:
+                rows = self._pending[key] = []
+                self._meta[symbol] = (point, digits)
+            rows.append(row)
+            self.records += 1
+            full = len(rows) >= self.buffer_records
+        if full:
+            self._wake.set()
+        if not self.running and not self._stop.is_set():
+            self.start()
+
+    def flush(self):
+        """نوشتن همه رکوردهای بافر شده (هر فایل روزانه با یک write)"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            meta = dict(self._meta)
+        if not pending:
+            return 0
+        written = 0
+        with self._write_lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for (symbol, _), rows in pending.items():
+                fp = tick_file(self.directory, symbol, rows[0][0])
+                data = np.array(rows, dtype=TICK_DTYPE)
+                point, digits = meta.get(symbol, (0.0, 0))
+                with fp.open("ab") as f:
+                    if f.tell() == 0:
+                        header = np.zeros(1, dtype=HEADER_DTYPE)
+                        header[0] = (MAGIC, 1, digits, point, symbol.encode(), b"")
+                        f.write(header.tobytes())
+                    f.write(data.tobytes())
+                written += len(data)
+                for sink in self.sinks:
+                    try:
+                        sink.add_ticks(fp, symbol, point, digits, data)
+                    except Exception as e:
+                        print(f"[analytics.tick_recorder] Sink {type(sink).__name__} failed: {e}")
+            for sink in self.sinks:
+                try:
+                    sink.flush()
+                except Exception as e:
+                    print(f"[analytics.tick_recorder] Sink {type(sink).__name__} flush failed: {e}")
+            self.flushes += 1
+        return written
+
+
+class TickFile:
+    """فایل باینری tickها به صورت آرایه‌های NumPy (memmap، فقط خواندنی)"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        header = np.fromfile(self.path, dtype=HEADER_DTYPE, count=1)
+        if len(header) != 1 or header["magic"][0] != MAGIC:
+            raise ValueError(f"{self.path} is not a tick recorder file")
+        self.symbol = header["symbol"][0].decode()
+        self.point = float(header["point"][0])
+        self.digits = int(header["digits"][0])
+        # رکورد ناقص انتهای فایل (قطع برنامه وسط write) نادیده گرفته می‌شود
+        count = (self.path.stat().st_size - HEADER_DTYPE.itemsize) // TICK_DTYPE.itemsize
+        if count > 0:
+            self.ticks = np.memmap(self.path, dtype=TICK_DTYPE, mode="r",
+                                   offset=HEADER_DTYPE.itemsize, shape=(count,))
+        else:
+            self.ticks = np.zeros(0, dtype=TICK_DTYPE)
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def __getitem__(self, field):
+        return self.ticks[field]
+
+
+def read_ticks(path) -> TickFile:
+    return TickFile(path)
+
+
+def to_csv(path, csv_path=None, source: str = "mt5", session: str = "bot") -> Path:
+    """تبدیل فایل باینری به CSV با همان ستون‌های log_market قبلی"""
+    import pandas as pd
+
+    tf = TickFile(path)
+    csv_path = Path(csv_path) if csv_path else tf.path.with_suffix(".csv")
+    ticks = tf.ticks
+    utc = pd.to_datetime(ticks["time_msc"], unit="ms", utc=True)
+    pip = 0.01 if tf.digits in (2, 3) else 0.0001
+    spread = ticks["ask"] - ticks["bid"]
+    df = pd.DataFrame({
+        "dt_utc": utc.strftime("%Y-%m-%d %H:%M:%S"),
+        "dt_iran": (utc + pd.Timedelta(hours=3, minutes=30)).strftime("%Y-%m-%d %H:%M:%S"),
+        "symbol": tf.symbol,
+        "bid": ticks["bid"], "ask": ticks["ask"], "last": ticks["last"],
+        "spread_points": spread / tf.point if tf.point else np.nan,
+        "spread_pips": spread / pip,
+        "point": tf.point, "digits": tf.digits,
+        "source": source, "session": session,
+    }, columns=CSV_HEADERS)
+    df.to_csv(csv_path, index=False)
+    return csv_path
+
+
+if __name__ == "__main__":
+    for arg in sys.argv[1:]:
+        print(to_csv(arg))
@@ -0,0 +1,340 @@
+"""
+موتور بک‌تست ربات طلا
+
+کندل‌های تاریخی M15 را کندل به کندل همان‌طور که ربات زنده می‌بیند بازپخش می‌کند:
+در هر کندل جدید پنجره window_size * 2 کندل آخر (شامل کندل در حال شکل‌گیری)
+ساخته می‌شود و همان get_legs، get_swing_points و توابع strategy_gold که
+main_metatrader_gold استفاده می‌کند اجرا می‌شوند. ورود و Trailing Stop در
+open کندل جدید (لحظه پردازش ربات) انجام می‌شود و SL در طول کندل بررسی می‌شود.
+"""
+
+import numpy as np
+import pandas as pd
+
+from barframe_gold import BarFrame
+from get_legs_gold import precompute_leg_features, get_legs_window
+from swing_gold import get_swing_points
+from strategy_gold import (update_fibonacci_setup, update_fibonacci_touches, can_enter_trade,
+                           swing_key, entry_stop_loss, trailing_stop_level)
+from utils_gold import BotState, is_within_trading_hours, is_weekday
+from metatrader5_config_gold import MT5_CONFIG, TRADING_CONFIG, EXIT_MANAGEMENT_CONFIG, BACKTEST_CONFIG
+
+# سقف ریسک هر معامله مثل MT5ConnectorGold.calculate_volume_by_risk
+MAX_LEVERAGE_FACTOR = 0.02
+
+
+def _no_log(msg, **kwargs):
+    pass
+
+
+def default_params(overrides=None):
+    """پارامترهای بک‌تست از روی تنظیمات ربات زنده (قابل override برای sweep)"""
+    trailing = EXIT_MANAGEMENT_CONFIG.get('trailing_stop', {})
+    params = {
+        'threshold': TRADING_CONFIG['threshold'],
+        'fib_705': TRADING_CONFIG.get('fib_705', 0.705),
+        'window_size': TRADING_CONFIG['window_size'],
+        'min_swing_size': TRADING_CONFIG.get('min_swing_size', 2),
+        'min_dist': TRADING_CONFIG.get('min_dist', 0.5),
+        'use_first_touch': TRADING_CONFIG.get('use_first_touch', True),
+        'prevent_multiple_positions': TRADING_CONFIG.get('prevent_multiple_positions', False),
+        'max_daily_trades': MT5_CONFIG['max_daily_trades'],
+        'trading_hours': MT5_CONFIG['trading_hours'],
+        'risk_percent': MT5_CONFIG['risk_percent'],
+        'trailing_enable': EXIT_MANAGEMENT_CONFIG.get('enable', False) and trailing.get('enable', False),
+        'start_r': trailing.get('start_r', 1.5),
+        'gap_r': trailing.get('gap_r', 0.5),
+        'initial_balance': BACKTEST_CONFIG['initial_balance'],
+        'spread': BACKTEST_CONFIG['spread'],
+        'slippage': BACKTEST_CONFIG['slippage'],
+    }
+    if overrides:
+        unknown = set(overrides) - set(params)
+        if unknown:
+            raise KeyError(f"Unknown backtest params: {sorted(unknown)}")
+        params.update(overrides)
+    return params
+
+
+def load_bars(path):
+    """
+    خواندن کندل‌ها از CSV: خروجی MT5 (ستون‌های <DATE> <TIME> <OPEN> ...) یا
+    فایلی با ستون time (epoch ثانیه یا رشته تاریخ) و open/high/low/close.
+    زمان‌ها مثل get_historical_data زمان سرور بروکر هستند که UTC فرض می‌شود.
+    """
+    with open(path, encoding='utf-8') as f:
+        header = f.readline()
+    df = pd.read_csv(path, sep='\t' if '\t' in header else ',')
+    df.columns = [col.strip().strip('<>').lower() for col in df.columns]
+    if 'date' in df.columns and 'time' in df.columns:
+        times = pd.to_datetime(df['date'].astype(str) + ' ' + df['time'].astype(str), utc=True)
+    elif pd.api.types.is_numeric_dtype(df['time']):
+        times = pd.to_datetime(df['time'], unit='s', utc=True)
+    else:
+        times = pd.to_datetime(df['time'], utc=True)
+    bars = df[['open', 'high', 'low', 'close']].astype(np.float64)
+    bars.index = pd.DatetimeIndex(times, name='time')
+    return bars
+
+
+def first_step(window_size):
+    """اولین کندل بسته شده‌ای که یک پنجره کامل window_size * 2 پشت آن هست"""
+    return 2 * window_size - 2
+
+
+def compute_step_legs(features, open_, threshold, window_size, start, stop):
+    """
+    legs هر گام بک‌تست برای کندل‌های بسته شده t در [start, stop)
+
+    پنجره گام t مثل cache_data در ربات زنده است: 2 * window_size - 1 کندل بسته شده
+    تا t به علاوه کندل t + 1 که در لحظه پردازش تازه باز شده (open = high = low = close).
+    خروجی برای هر t: (تعداد کل legs، دو یا سه leg آخر). این نتایج فقط به
+    threshold و window_size بستگی دارند و بین اجراها قابل استفاده مجدد هستند.
+    """
+    span = 2 * window_size - 1
+    out = []
+    for t in range(start, stop):
+        o = open_[t + 1]
+        legs = get_legs_window(features, t - span + 1, t + 1, threshold, forming=(o, o, o, o))
+        out.append((len(legs), legs[-3:]))
+    return out
+
+
+class Position:
+    """پوزیشن شبیه‌سازی شده"""
+
+    __slots__ = ('is_buy', 'entry_step', 'entry_price', 'sl', 'initial_sl', 'units', 'trailed')
+
+    def __init__(self, is_buy, entry_step, entry_price, sl, units):
+        self.is_buy = is_buy
+        self.entry_step = entry_step
+        self.entry_price = entry_price
+        self.sl = sl
+        self.initial_sl = sl
+        self.units = units
+        self.trailed = False
+
+
+class BacktestResult:
+    """نتیجه بک‌تست: لیست معاملات و منحنی equity"""
+
+    def __init__(self, trades, equity, params):
+        self.trades = trades
+        self.equity = equity
+        self.params = params
+
+    def trades_frame(self):
+        df = pd.DataFrame(self.trades)
+        for col in ('entry_time', 'exit_time'):
+            if col in df:
+                df[col] = pd.to_datetime(df[col], unit='s', utc=True)
+        return df
+
+    def summary(self):
+        r = np.array([t['r_multiple'] for t in self.trades], dtype=np.float64)
+        pnl = np.array([t['pnl'] for t in self.trades], dtype=np.float64)
+        equity = self.equity.to_numpy() if len(self.equity) else np.array([self.params['initial_balance']], dtype=np.float64)
+        peak = np.maximum.accumulate(equity)
+        gross_loss = -pnl[pnl < 0].sum()
+        initial = self.params['initial_balance']
+        return {
+            'trades': int(len(r)),
+            'win_rate': float((r > 0).mean()) if len(r) else 0.0,
+            'expectancy_R': float(r.mean()) if len(r) else 0.0,
+            'total_R': float(r.sum()),
+            'profit_factor': float(pnl[pnl > 0].sum() / gross_loss) if gross_loss > 0 else float('inf') if len(r) else 0.0,
+            'return_pct': float((equity[-1] - initial) / initial * 100.0),
+            'max_drawdown_pct': float(((peak - equity) / peak).max() * 100.0),
+        }
+
+
+def run_backtest(data, params=None, log_fn=_no_log):
+    """اجرای بک‌تست روی DataFrame کندل‌ها (index زمانی UTC و ستون‌های open/high/low/close)"""
+    times = data.index.as_unit('s').asi8 if isinstance(data.index, pd.DatetimeIndex) else np.asarray(data.index)
+    return run_backtest_arrays(
+        times, data['open'].to_numpy(), data['high'].to_numpy(),
+        data['low'].to_numpy(), data['close'].to_numpy(),
+        params=params, log_fn=log_fn,
+    )
+
+
+def run_backtest_arrays(times, open_, high, low, close, params=None, step_legs=None,
+                        start=None, stop=None, log_fn=_no_log):
+    """
+    هسته بک‌تست روی آرایه‌ها؛ times زمان epoch (ثانیه) هر کندل است.
+
+    start/stop بازه کندل‌های بسته شده‌ای است که پردازش می‌شوند (پیش‌فرض کل داده).
+    step_legs خروجی compute_step_legs برای همین بازه است (اختیاری، برای استفاده مجدد).
+    """
+    p = default_params(params)
+    times = np.asarray(times, dtype=np.int64)
+    o = np.ascontiguousarray(open_, dtype=np.float64)
+    h = np.ascontiguousarray(high, dtype=np.float64)
+    l = np.ascontiguousarray(low, dtype=np.float64)
+    c = np.ascontiguousarray(close, dtype=np.float64)
+    n = len(c)
+
+    lo_step = first_step(p['window_size'])
+    start = lo_step if start is None else max(start, lo_step)
+    stop = n - 1 if stop is None else min(stop, n - 1)
+    if start >= stop:
+        return BacktestResult([], pd.Series(dtype=np.float64), p)
+
+    if step_legs is None:
+        features = precompute_leg_features(o, h, l, c)
+        step_legs = compute_step_legs(features, o, p['threshold'], p['window_size'], start, stop)
+
+    # ساعت ایران هر کندل برای شرایط can_trade و شمارش معاملات روزانه
+    iran = pd.to_datetime(times[start + 1:stop + 1], unit='s', utc=True).tz_convert('Asia/Tehran')
+    iran_dates = iran.date
+    tradable = [
+        is_weekday(ts.weekday()) and is_within_trading_hours(ts.time(), p['trading_hours'])
+        for ts in iran
+    ]
+
+    # get_swing_points روی موقعیت‌های مطلق کندل‌ها کار می‌کند
+    swing_data = BarFrame(times, o, h, l, c)
+    ol, hl, ll, cl = o.tolist(), h.tolist(), l.tolist(), c.tolist()
+
+    spread = p['spread']
+    slippage = p['slippage']
+    fib_705 = p['fib_705']
+    min_candles = p['min_swing_size']
+    risk_pct = p['risk_percent'] / 100.0
+
+    state = BotState()
+    last_swing_type = None
+    is_first_run = True
+    trade_count = 0
+    trades_today = 0
+    last_trade_date = None
+    traded_swings = set()
+
+    balance = float(p['initial_balance'])
+    positions = []
+    trades = []
+    equity = np.empty(stop - start, dtype=np.float64)
+
+    def close_position(pos, k, price, reason):
+        nonlocal balance
+        move = (price - pos.entry_price) if pos.is_buy else (pos.entry_price - price)
+        risk = abs(pos.entry_price - pos.initial_sl)
+        pnl = move * pos.units
+        balance += pnl
+        trades.append({
+            'direction': 'buy' if pos.is_buy else 'sell',
+            'entry_time': int(times[pos.entry_step]),
+            'entry_price': pos.entry_price,
+            'initial_sl': pos.initial_sl,
+            'exit_time': int(times[k]),
+            'exit_price': price,
+            'exit_reason': reason,
+            'r_multiple': move / risk if risk > 0 else 0.0,
+            'pnl': pnl,
+            'units': pos.units,
+        })
+
+    for step, t in enumerate(range(start, stop)):
+        k = t + 1  # کندلی که در open آن ربات کندل t را پردازش می‌کند
+        bar_open = ol[k]
+        bid_open, ask_open = bar_open, bar_open + spread
+
+        # SL هایی که با gap در open کندل رد شده‌اند
+        for pos in positions[:]:
+            if pos.is_buy and bid_open <= pos.sl:
+                close_position(pos, k, bid_open - slippage, 'gap')
+                positions.remove(pos)
+            elif not pos.is_buy and ask_open >= pos.sl:
+                close_position(pos, k, ask_open + slippage, 'gap')
+                positions.remove(pos)
+
+        current_date = iran_dates[step]
+        if last_trade_date != current_date:
+            trades_today = 0
+            last_trade_date = current_date
+
+        if tradable[step] and trades_today < p['max_daily_trades']:
+            # مدیریت Trailing Stop با قیمت لحظه پردازش
+            if p['trailing_enable']:
+                for pos in positions:
+                    new_sl, _ = trailing_stop_level(
+                        pos.is_buy, pos.entry_price, pos.sl, bid_open if pos.is_buy else ask_open,
+                        start_r=p['start_r'], gap_r=p['gap_r'],
+                    )
+                    if new_sl is not None:
+                        pos.sl = new_sl
+                        pos.trailed = True
+
+            leg_count, legs = step_legs[step]
+            last_closed = {'timestamp': t, 'open': ol[t], 'high': hl[t], 'low': ll[t], 'close': cl[t]}
+
+            if leg_count >= 2:
+                swing_type, is_swing = get_swing_points(data=swing_data, legs=legs, min_candles=min_candles)
+                last_swing_type = update_fibonacci_setup(
+                    state, legs, swing_type, is_swing, last_swing_type, last_closed,
+                    fib_705=fib_705, log_fn=log_fn,
+                )
+            if state.fib_levels:
+                last_swing_type = update_fibonacci_touches(
+                    state, legs, last_swing_type, last_closed, fib_705=fib_705, log_fn=log_fn,
+                )
+
+            can_enter = can_enter_trade(state, is_first_run, trade_count, p['use_first_touch'])
+            is_first_run = False
+
+            if state.fib_levels and last_swing_type and can_enter:
+                is_buy = last_swing_type == 'bullish'
+                key = swing_key(last_swing_type, state.fib_levels)
+                entry_quote = ask_open if is_buy else bid_open
+                sl = None
+                if key not in traded_swings and not (p['prevent_multiple_positions'] and positions):
+                    sl = entry_stop_loss(is_buy, entry_quote, state.fib_levels['1.0'], min_dist=p['min_dist'])
+                if sl is not None:
+                    # حجم بر اساس ریسک با احتساب هزینه اسپرد، مثل calculate_volume_by_risk
+                    price_risk = abs(entry_quote - sl)
+                    units = min(balance * risk_pct / (price_risk + spread),
+                                balance * MAX_LEVERAGE_FACTOR / price_risk)
+                    fill = entry_quote + slippage if is_buy else entry_quote - slippage
+                    positions.append(Position(is_buy, k, fill, sl, units))
+                    traded_swings.add(key)
+                    trade_count += 1
+                    trades_today += 1
+                    log_fn(f"{'BUY' if is_buy else 'SELL'} @ {fill:.2f} SL={sl:.2f}")
+                # بعد از ورود یا رد سیگنال، setup ریست می‌شود
+                state.reset()
+                last_swing_type = None
+
+        # برخورد قیمت به SL در طول کندل k
+        for pos in positions[:]:
+            if pos.is_buy and ll[k] <= pos.sl:
+                close_position(pos, k, pos.sl - slippage, 'trailing_stop' if pos.trailed else 'stop_loss')
+                positions.remove(pos)
+            elif not pos.is_buy and hl[k] + spread >= pos.sl:
+                close_position(pos, k, pos.sl + slippage, 'trailing_stop' if pos.trailed else 'stop_loss')
+                positions.remove(pos)
+
+        open_pnl = 0.0
+        for pos in positions:
+            if pos.is_buy:
+                open_pnl += (cl[k] - pos.entry_price) * pos.units
+            else:
+                open_pnl += (pos.entry_price - cl[k] - spread) * pos.units
+        equity[step] = balance + open_pnl
+
+    for pos in positions:
+        close_position(pos, stop, cl[stop] if pos.is_buy else cl[stop] + spread, 'end')
+
+    equity_index = pd.to_datetime(times[start + 1:stop + 1], unit='s', utc=True)
+    return BacktestResult(trades, pd.Series(equity, index=equity_index, name='equity'), p)
+
+
+if __name__ == "__main__":
+    import time as _time
+
+    bars = load_bars(BACKTEST_CONFIG['data_file'])
+    t0 = _time.perf_counter()
+    result = run_backtest(bars)
+    elapsed = _time.perf_counter() - t0
+    print(f"Backtest: {len(bars)} bars in {elapsed:.2f}s")
+    for name, value in result.summary().items():
+        print(f"  {name}: {value}")
@@ -0,0 +1,73 @@
+"""
+بافر حلقوی کندل‌ها برای دریافت افزایشی داده از MT5
+
+کندل‌ها در یک structured array با همان dtype خروجی copy_rates_* نگه داشته می‌شوند.
+آرایه دو برابر ظرفیت است و هنگام پر شدن فقط capacity کندل آخر به ابتدای آن منتقل
+می‌شود؛ بنابراین view آخرین N کندل همیشه پیوسته و بدون کپی است و هزینه هر append
+(به طور سرشکن) به اندازه داده جدید است.
+"""
+
+import numpy as np
+
+
+class BarBuffer:
+    """نگهداری آخرین capacity کندل؛ کندل آخر کندل در حال شکل‌گیری است و در جا به‌روز می‌شود"""
+
+    def __init__(self, capacity, dtype):
+        self.capacity = int(capacity)
+        self._data = np.zeros(2 * self.capacity, dtype=dtype)
+        self._start = 0
+        self._stop = 0
+
+    def __len__(self):
+        return self._stop - self._start
+
+    @property
+    def dtype(self):
+        return self._data.dtype
+
+    @property
+    def last_time(self):
+        """زمان باز شدن آخرین کندل ذخیره شده (None اگر خالی باشد)"""
+        return int(self._data['time'][self._stop - 1]) if self._stop > self._start else None
+
+    def clear(self):
+        self._start = self._stop = 0
+
+    def append(self, rates):
+        """
+        اضافه کردن کندل‌های خروجی copy_rates_* (به ترتیب زمانی). کندلی که زمانش با
+        آخرین کندل ذخیره شده یکی است آن را بازنویسی می‌کند؛ کندل‌های قدیمی‌تر نادیده
+        گرفته می‌شوند. خروجی تعداد کندل‌های جدید.
+        """
+        if rates is None or len(rates) == 0:
+            return 0
+        last = self.last_time
+        if last is not None:
+            times = rates['time']
+            first_new = int(np.searchsorted(times, last, side='left'))
+            if first_new < len(rates) and times[first_new] == last:
+                self._data[self._stop - 1] = rates[first_new]
+                first_new += 1
+            rates = rates[first_new:]
+        n = len(rates)
+        if n == 0:
+            return 0
+        if n >= self.capacity:
+            self._data[:self.capacity] = rates[-self.capacity:]
+            self._start, self._stop = 0, self.capacity
+            return n
+        if self._stop + n > len(self._data):
+            keep = min(len(self), self.capacity - n)
+            self._data[:keep] = self._data[self._stop - keep:self._stop]
+            self._start, self._stop = 0, keep
+        self._data[self._stop:self._stop + n] = rates
+        self._stop += n
+        if len(self) > self.capacity:
+            self._start = self._stop - self.capacity
+        return n
+
+    def view(self, count=None):
+        """view بدون کپی از آخرین count کندل (قدیمی به جدید)؛ تا append بعدی معتبر است"""
+        start = self._start if count is None else max(self._start, self._stop - count)
+        return self._data[start:self._stop]
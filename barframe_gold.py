@@ -0,0 +1,96 @@
+"""
+BarFrame: ظرف سبک کندل‌ها روی آرایه‌های numpy
+
+مستقیما از structured array خروجی copy_rates_* ساخته می‌شود (view بدون کپی) و
+به جای DataFrame به get_legs، get_swing_points و توابع strategy_gold داده می‌شود.
+زمان‌ها epoch ثانیه (int64) هستند و legs با همین زمان‌ها برچسب می‌خورند؛ pandas
+فقط برای لاگ و گزارش (timestamp و to_frame) استفاده می‌شود.
+"""
+
+import numpy as np
+import pandas as pd
+
+_COLUMNS = ('time', 'open', 'high', 'low', 'close', 'volume', 'bullish')
+
+
+class BarFrame:
+    """کندل‌ها به صورت آرایه: time (int64)، open/high/low/close (float64)، bullish (bool)"""
+
+    __slots__ = ('time', 'open', 'high', 'low', 'close', 'volume', 'bullish', 'tz')
+
+    def __init__(self, time, open_, high, low, close, volume=None, tz=None):
+        self.time = np.asarray(time, dtype=np.int64)
+        self.open = np.asarray(open_, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.volume = None if volume is None else np.asarray(volume)
+        # همان تعریف status قبلی: open > close نزولی و بقیه صعودی
+        self.bullish = self.close >= self.open
+        self.tz = tz
+
+    @classmethod
+    def from_rates(cls, rates, tz=None):
+        """ساخت از خروجی copy_rates_* (یا view از BarBuffer) بدون کپی ستون‌ها"""
+        volume = rates['tick_volume'] if 'tick_volume' in rates.dtype.names else None
+        return cls(rates['time'], rates['open'], rates['high'], rates['low'], rates['close'], volume, tz)
+
+    @classmethod
+    def from_frame(cls, data):
+        """ساخت از DataFrame با index زمانی و ستون‌های open/high/low/close"""
+        index = data.index
+        if isinstance(index, pd.DatetimeIndex):
+            times, tz = index.as_unit('s').asi8, index.tz
+        else:
+            times, tz = np.asarray(index), None
+        volume = data['volume'].to_numpy() if 'volume' in data else None
+        return cls(times, data['open'].to_numpy(), data['high'].to_numpy(), data['low'].to_numpy(),
+                   data['close'].to_numpy(), volume, tz)
+
+    def __len__(self):
+        return len(self.time)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in _COLUMNS:
+                raise KeyError(key)
+            return getattr(self, key)
+        if isinstance(key, slice):
+            out = object.__new__(BarFrame)
+            for name in self.__slots__[:-1]:
+                column = getattr(self, name)
+                setattr(out, name, None if column is None else column[key])
+            out.tz = self.tz
+            return out
+        raise TypeError(f"BarFrame indices must be column names or slices, not {type(key).__name__}")
+
+    @property
+    def index(self):
+        """برچسب کندل‌ها برای get_legs: زمان epoch هر کندل"""
+        return self.time
+
+    def row(self, i):
+        """یک کندل به صورت dict (ورودی last_closed در strategy_gold)"""
+        return {
+            'timestamp': int(self.time[i]),
+            'open': float(self.open[i]),
+            'high': float(self.high[i]),
+            'low': float(self.low[i]),
+            'close': float(self.close[i]),
+        }
+
+    def timestamp(self, i):
+        """زمان کندل i به صورت pandas.Timestamp (در منطقه زمانی tz) برای لاگ"""
+        ts = pd.Timestamp(int(self.time[i]), unit='s', tz='UTC')
+        return ts.tz_convert(self.tz) if self.tz is not None else ts
+
+    def to_frame(self):
+        """DataFrame برای لاگ و گزارش"""
+        index = pd.to_datetime(self.time, unit='s', utc=True)
+        if self.tz is not None:
+            index = index.tz_convert(self.tz)
+        columns = {'open': self.open, 'high': self.high, 'low': self.low, 'close': self.close}
+        if self.volume is not None:
+            columns['volume'] = self.volume
+        columns['bullish'] = self.bullish
+        return pd.DataFrame(columns, index=index.rename('time'))
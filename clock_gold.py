@@ -0,0 +1,116 @@
+"""
+ساعت قابل تعویض برای ربات
+
+همه دسترسی‌ها به زمان فعلی و sleep از این ماژول عبور می‌کنند. در حالت عادی
+SystemClock همان datetime.now و time.sleep است. با set_clock(SimulatedClock(...))
+حلقه زنده main بدون تغییر روی داده ضبط شده با حداکثر سرعت CPU اجرا می‌شود و
+زمان لاگ‌ها برابر زمان شبیه‌سازی شده بازار است.
+
+request_stop() (مثلا از handler سیگنال SIGTERM) sleepهای SystemClock را فورا تمام می‌کند
+تا حلقه main بدون صبر تا کندل بعدی به مسیر عادی خاموش شدن برسد.
+"""
+
+import threading
+import time as _time
+from datetime import datetime, timezone
+
+
+class ClockStopped(BaseException):
+    """پایان زمان شبیه‌سازی (مثلا تمام شدن داده)؛ از except Exception حلقه main عبور می‌کند"""
+
+
+class SystemClock:
+    """ساعت واقعی سیستم"""
+
+    def now(self, tz=None):
+        return datetime.now(tz)
+
+    def utcnow(self):
+        """زمان UTC بدون tzinfo (جایگزین datetime.utcnow)"""
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def time(self):
+        return _time.time()
+
+    def monotonic(self):
+        return _time.monotonic()
+
+    def sleep(self, seconds):
+        _stop.wait(max(0.0, seconds))
+
+
+class SimulatedClock:
+    """
+    ساعت شبیه‌سازی شده: زمان فقط با sleep/advance جلو می‌رود و sleep منتظر نمی‌ماند.
+
+    on_advance(epoch) بعد از هر جلو رفتن صدا زده می‌شود (مثلا SimBroker.advance_to)؛
+    اگر False برگرداند یا زمان از end بگذرد ClockStopped پرتاب می‌شود.
+    local_tz منطقه زمانی خروجی now() بدون tz است (پیش‌فرض UTC).
+    """
+
+    def __init__(self, start, end=None, on_advance=None, local_tz=timezone.utc):
+        self._t = float(start.timestamp() if isinstance(start, datetime) else start)
+        self.end = None if end is None else float(end.timestamp() if isinstance(end, datetime) else end)
+        self.on_advance = on_advance
+        self.local_tz = local_tz
+
+    def now(self, tz=None):
+        if tz is None:
+            return datetime.fromtimestamp(self._t, self.local_tz).replace(tzinfo=None)
+        return datetime.fromtimestamp(self._t, tz)
+
+    def utcnow(self):
+        return datetime.fromtimestamp(self._t, timezone.utc).replace(tzinfo=None)
+
+    def time(self):
+        return self._t
+
+    def monotonic(self):
+        return self._t
+
+    def advance(self, seconds):
+        self._t += seconds
+        if self.end is not None and self._t > self.end:
+            raise ClockStopped(f"Simulated clock reached end ({self.end:.0f})")
+        if self.on_advance is not None and self.on_advance(self._t) is False:
+            raise ClockStopped("Simulation data exhausted")
+
+    def sleep(self, seconds):
+        self.advance(max(0.0, seconds))
+
+
+_clock = SystemClock()
+_stop = threading.Event()
+
+
+def get_clock():
+    return _clock
+
+
+def set_clock(clock):
+    """تعویض ساعت سراسری؛ خروجی ساعت قبلی (برای برگرداندن بعد از شبیه‌سازی)"""
+    global _clock
+    previous = _clock
+    _clock = clock
+    return previous
+
+
+def now(tz=None):
+    return _clock.now(tz)
+
+
+def utcnow():
+    return _clock.utcnow()
+
+
+def sleep(seconds):
+    _clock.sleep(seconds)
+
+
+def request_stop():
+    """درخواست توقف حلقه main؛ از handler سیگنال هم قابل صدا زدن است"""
+    _stop.set()
+
+
+def stop_requested():
+    return _stop.is_set()
@@ -1,11 +1,421 @@
+import numpy as np
 from metatrader5_config_gold import TRADING_CONFIG
 
-def get_legs(data, custom_threshold=None, verbose: bool=False):
+LEG_ENGINES = ('numpy', 'pandas')
+
+# جهت leg به صورت عدد (به جای رشته‌های 'up'/'down')
+UP = 1
+DOWN = -1
+
+# رکورد فشرده برای نگهداری تاریخچه طولانی legs (int8 برای جهت، int64 برای موقعیت کندل)
+LEG_DTYPE = np.dtype([
+    ('start_pos', np.int64),
+    ('end_pos', np.int64),
+    ('start_value', np.float64),
+    ('end_value', np.float64),
+    ('length', np.float64),
+    ('direction', np.int8),
+])
+
+
+class Leg:
+    """یک leg قیمتی؛ start/end زمان (یا موقعیت) کندل و direction برابر UP یا DOWN است"""
+
+    __slots__ = ('start', 'start_value', 'end', 'end_value', 'length', 'direction', 'start_pos', 'end_pos')
+
+    def __init__(self, start, start_value, end, end_value, length, direction, start_pos, end_pos):
+        self.start = start
+        self.start_value = start_value
+        self.end = end
+        self.end_value = end_value
+        self.length = length
+        self.direction = direction
+        self.start_pos = start_pos
+        self.end_pos = end_pos
+
+    @property
+    def is_up(self):
+        return self.direction == UP
+
+    @property
+    def direction_name(self):
+        return 'up' if self.direction == UP else 'down'
+
+    def _key(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        if not isinstance(other, Leg):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __repr__(self):
+        return (f"Leg({self.direction_name} {self.start}@{self.start_value} -> "
+                f"{self.end}@{self.end_value}, length={self.length})")
+
+
+def legs_to_array(legs):
+    """تبدیل لیست Leg به آرایه ساخت‌یافته NumPy با LEG_DTYPE (زمان‌ها از روی index[pos] قابل بازیابی‌اند)"""
+    out = np.empty(len(legs), dtype=LEG_DTYPE)
+    for k, leg in enumerate(legs):
+        out[k] = (leg.start_pos, leg.end_pos, leg.start_value, leg.end_value, leg.length, leg.direction)
+    return out
+
+
+def get_legs(data, custom_threshold=None, verbose: bool=False, engine: str='numpy'):
+    """
+    شناسایی legs روی داده‌های OHLC
+
+    Parameters:
+    -----------
+    data: DataFrame یا BarFrame
+        داده با ستون‌های open/high/low/close و index زمانی مرتب؛ برچسب legs همان
+        index است (زمان epoch برای BarFrame). موتور 'pandas' فقط DataFrame می‌پذیرد.
+    custom_threshold: float
+        حداقل اندازه leg بر حسب دلار (پیش‌فرض TRADING_CONFIG['threshold'])
+    engine: str
+        'numpy' (پیش‌فرض): هسته آرایه‌ای get_legs_arrays
+        'pandas': پیاده‌سازی قدیمی ردیف به ردیف (برای مقایسه)
+    """
     threshold = custom_threshold if custom_threshold else TRADING_CONFIG['threshold']
     if verbose:
         print(f'Using threshold: {threshold}')
         print('len(data): ', len(data))
         print(f'Start time: {data.index[0]}, End time: {data.index[-1]}')
+
+    if engine == 'numpy':
+        legs = get_legs_arrays(
+            np.asarray(data['open']), np.asarray(data['high']),
+            np.asarray(data['low']), np.asarray(data['close']),
+            threshold,
+        )
+        index = data.index
+        for leg in legs:
+            leg.start = index[leg.start_pos]
+            leg.end = index[leg.end_pos]
+        return legs
+    if engine == 'pandas':
+        get_loc = data.index.get_loc
+        return [
+            Leg(leg['start'], leg['start_value'], leg['end'], leg['end_value'], leg['length'],
+                UP if leg['direction'] == 'up' else DOWN, get_loc(leg['start']), get_loc(leg['end']))
+            for leg in _get_legs_pandas(data, threshold)
+        ]
+    raise ValueError(f"Unknown get_legs engine: {engine!r} (expected one of {LEG_ENGINES})")
+
+
+def get_legs_multi(data, thresholds):
+    """
+    شناسایی legs برای چند threshold در یک پیمایش داده (برای sweep روی threshold)
+
+    خروجی: dict از threshold به لیست legs، هر کدام دقیقاً برابر get_legs(data, threshold)
+
+    فقط ویژگی‌های کندل‌ها مشترک است و state machine هر threshold جدا اجرا می‌شود؛ هزینه
+    K threshold حدود 0.7 برابر K فراخوانی get_legs است، نه یک پیمایش (README).
+    """
+    states = [_LegScanState(t) for t in thresholds]
+    _scan_legs(
+        states, range(len(data)), 0, None,
+        np.asarray(data['open']), np.asarray(data['high']),
+        np.asarray(data['low']), np.asarray(data['close']),
+    )
+    index = data.index
+    result = {}
+    for state in states:
+        for leg in state.legs:
+            leg.start = index[leg.start_pos]
+            leg.end = index[leg.end_pos]
+        result[state.threshold] = state.legs
+    return result
+
+
+def get_legs_arrays(open_, high, low, close, threshold):
+    """
+    هسته آرایه‌ای get_legs: همان منطق نسخه pandas ولی روی آرایه‌های NumPy
+    و با موقعیت عددی کندل‌ها به جای timestamp.
+
+    خروجی دقیقاً همان legs نسخه pandas است، با این تفاوت که start و end
+    هم مثل start_pos و end_pos موقعیت کندل (int) هستند. فرض بر این است
+    که index داده مرتب و یکتاست (داده MT5 همیشه این‌طور است).
+    """
+    state = _LegScanState(threshold)
+    _scan_legs((state,), range(len(close)), 0, None, open_, high, low, close)
+    return state.legs
+
+
+def precompute_leg_features(open_, high, low, close):
+    """
+    محاسبه یک‌باره ویژگی‌های کندل‌ها برای کل تاریخچه، برای استفاده مکرر در get_legs_window
+    """
+    return _bar_features(open_, high, low, close)
+
+
+def get_legs_window(features, start, stop, threshold, times=None, forming=None):
+    """
+    معادل get_legs روی کندل‌های [start, stop) از تاریخچه‌ای که features آن با
+    precompute_leg_features ساخته شده، بدون برش دادن داده در هر فراخوانی.
+    start_pos و end_pos موقعیت مطلق در تاریخچه هستند.
+
+    forming: (open, high, low, close) کندل در حال شکل‌گیری در موقعیت stop، مثل
+    آخرین ردیف cache_data در ربات زنده (اختیاری).
+    """
+    h, l, bar_price = features[:3]
+    if times is None:
+        times = range(len(h) + 1)
+    state = _LegScanState(threshold)
+    state.start = (times[start], start, h[start], l[start])
+    state.start_price = bar_price[start]
+    _scan_state(state, times, 0, start + 1, stop, features)
+    if forming is not None:
+        o, hi, lo, c = forming
+        _scan_legs((state,), (times[stop],), stop, (h[stop - 1], l[stop - 1]), (o,), (hi,), (lo,), (c,))
+    return state.legs
+
+
+class LegTracker:
+    """
+    تشخیص افزایشی legs: هر کندل بسته شده جدید با update اضافه می‌شود و
+    legs با هزینه O(1) به‌روز می‌شوند. نتیجه همیشه با اجرای کامل get_legs روی
+    همه کندل‌هایی که از زمان reset به tracker داده شده‌اند یکسان است.
+    start_pos و end_pos از اولین کندل داده شده به tracker شمرده می‌شوند.
+
+    فقط داده‌های کندل شروع، کندل قبلی و کندل پایان دو leg آخر نگه داشته
+    می‌شود، پس حافظه به اندازه پنجره بستگی ندارد.
+    """
+
+    def __init__(self, threshold=None, max_legs=None):
+        self.threshold = threshold if threshold else TRADING_CONFIG['threshold']
+        # اگر تعیین شود، فقط حداکثر max_legs leg آخر نگه داشته می‌شود
+        self.max_legs = max(2, max_legs) if max_legs else None
+        self.reset()
+
+    def reset(self):
+        self._state = _LegScanState(self.threshold)
+        self._prev = None  # (high, low) کندل قبلی
+        self.last_time = None
+        self.bar_count = 0
+
+    @property
+    def legs(self):
+        return self._state.legs
+
+    @classmethod
+    def from_history(cls, data, threshold=None, max_legs=None):
+        """ساخت tracker از داده تاریخی (فقط کندل‌های بسته شده را بدهید)"""
+        tracker = cls(threshold, max_legs)
+        tracker.rebuild(data)
+        return tracker
+
+    def rebuild(self, data):
+        """بازسازی کامل state از یک DataFrame تاریخی"""
+        self.reset()
+        self.extend(
+            data.index, np.asarray(data['open']), np.asarray(data['high']),
+            np.asarray(data['low']), np.asarray(data['close']),
+        )
+        return self.legs
+
+    def update(self, time, open_, high, low, close):
+        """اضافه کردن یک کندل بسته شده؛ legs به‌روز شده را برمی‌گرداند"""
+        if self.last_time is not None and time <= self.last_time:
+            return self.legs
+        return self.extend((time,), (open_,), (high,), (low,), (close,))
+
+    def extend(self, times, open_, high, low, close):
+        """اضافه کردن چند کندل پشت سر هم (times باید صعودی باشد)"""
+        n = len(times)
+        if n == 0:
+            return self.legs
+        self._prev = _scan_legs((self._state,), times, self.bar_count, self._prev, open_, high, low, close)
+        self.last_time = times[n - 1]
+        self.bar_count += n
+
+        legs = self._state.legs
+        if self.max_legs and len(legs) > 2 * self.max_legs:
+            excess = len(legs) - self.max_legs
+            del legs[:excess]
+            del self._state.end_hl[:excess]
+        return legs
+
+
+# دسته‌های کوچک‌تر از این (مثل update تک کندلی) بدون NumPy پردازش می‌شوند
+_SMALL_CHUNK = 8
+
+
+class _LegScanState:
+    """state یک threshold در _scan_legs"""
+
+    __slots__ = ('threshold', 'legs', 'end_hl', 'start', 'start_price', 'gap', 'direction')
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.legs = []
+        self.end_hl = []  # (high, low) کندل پایان هر leg
+        self.start = None  # (label, pos, high, low) کندل شروع
+        self.start_price = None
+        self.gap = 0  # تعداد کندل‌ها از کندل شروع تا آخرین کندل
+        self.direction = None  # مثل نسخه pandas، آخرین direction محاسبه شده حفظ می‌شود
+
+
+def _bar_features(open_, high, low, close, prev=None):
+    """
+    ویژگی‌های هر کندل که همه thresholdها لازم دارند، به صورت list پایتون:
+    (high, low, قیمت کندل, صعودی با high بالاتر, high >= high قبلی, low <= low قبلی)
+
+    prev مقدار (high, low) کندل قبل از اولین کندل است؛ اگر None باشد ویژگی‌های
+    وابسته به کندل قبلی برای اولین کندل بی‌معنی‌اند (اولین کندل فقط نقطه شروع است).
+    """
+    n = len(close)
+    if n <= _SMALL_CHUNK:
+        # برای update تک کندلی، هزینه ساخت آرایه NumPy از خود محاسبه بیشتر است
+        o, h, l, c = (list(map(float, x)) for x in (open_, high, low, close))
+        if prev is None:
+            prev = (h[0], l[0])
+        prev_h = [prev[0]] + h[:-1]
+        prev_l = [prev[1]] + l[:-1]
+        return (
+            h, l,
+            [hi if ci >= oi else lo for oi, hi, lo, ci in zip(o, h, l, c)],
+            [hi > ph and ci > oi for hi, ph, ci, oi in zip(h, prev_h, c, o)],
+            [hi >= ph for hi, ph in zip(h, prev_h)],
+            [lo <= pl for lo, pl in zip(l, prev_l)],
+        )
+
+    o = np.ascontiguousarray(open_, dtype=np.float64)
+    h = np.ascontiguousarray(high, dtype=np.float64)
+    l = np.ascontiguousarray(low, dtype=np.float64)
+    c = np.ascontiguousarray(close, dtype=np.float64)
+    if prev is None:
+        prev = (h[0], l[0])
+    prev_h = np.concatenate(([prev[0]], h[:-1]))
+    prev_l = np.concatenate(([prev[1]], l[:-1]))
+    # حلقه روی list پایتون سریع‌تر از دسترسی عنصر به عنصر به آرایه NumPy است
+    return (
+        h.tolist(), l.tolist(), np.where(c >= o, h, l).tolist(),
+        ((h > prev_h) & (c > o)).tolist(),
+        (h >= prev_h).tolist(),
+        (l <= prev_l).tolist(),
+    )
+
+
+def _scan_legs(states, times, base, prev, open_, high, low, close):
+    """
+    حلقه اصلی تشخیص legs. ویژگی‌های مشترک هر کندل (قیمت جاری کندل و مقایسه با
+    کندل قبلی) یک بار و به صورت برداری برای همه stateها (هر threshold یک state)
+    محاسبه می‌شود و سپس هر state روی همین لیست‌ها پیش می‌رود.
+
+    times برچسب کندل‌ها (timestamp یا موقعیت)، base موقعیت اولین کندل و prev
+    مقدار (high, low) کندل قبل از این دسته است. (high, low) آخرین کندل برگردانده می‌شود.
+    """
+    n = len(close)
+    if n == 0:
+        return prev
+    bars = _bar_features(open_, high, low, close, prev)
+    first = 0
+    if prev is None:
+        # اولین کندل فقط نقطه شروع است
+        h, l, bar_price = bars[:3]
+        for state in states:
+            state.start = (times[0], base, h[0], l[0])
+            state.start_price = bar_price[0]
+        first = 1
+
+    for state in states:
+        _scan_state(state, times, base, first, n, bars)
+    return bars[0][-1], bars[1][-1]
+
+
+def _scan_state(state, times, base, first, n, bars):
+    """پیشروی یک state روی کندل‌های first تا n؛ منطق دقیقاً مطابق _get_legs_pandas"""
+    h, l, bar_price, up_bar, higher_high, lower_low = bars
+    threshold = state.threshold
+    legs = state.legs
+    end_hl = state.end_hl
+    s_label, s_pos, s_high, s_low = state.start
+    start_price = state.start_price
+    gap = state.gap
+    direction = state.direction
+    last = legs[-1] if legs else None
+
+    for i in range(first, n):
+        gap += 1
+
+        # Current Price
+        if last is not None and last.direction == UP and higher_high[i]:
+            current_price = h[i]
+        elif last is not None and last.direction == DOWN and lower_low[i]:
+            current_price = l[i]
+        else:
+            current_price = bar_price[i]
+
+        price_diff = abs(current_price - start_price)
+
+        # نسخه pandas یک mydirection هم محاسبه می‌کند ولی هر دو شاخه‌ای که از آن
+        # استفاده می‌کنند start_price یکسانی می‌دهند، پس اینجا حذف شده است
+
+        if price_diff >= threshold and price_diff < threshold * 5:
+
+            direction = UP if h[i] > s_high or up_bar[i] else DOWN
+            if last is not None and last.direction == direction:
+                last.end = times[i]
+                last.end_pos = base + i
+                last.end_value = current_price
+                last.length = price_diff + last.length
+                end_hl[-1] = (h[i], l[i])
+
+            elif gap >= 2:  # معادل len(data.loc[start_index:data.index[i]]) >= 3
+                leg_start = start_price
+                if last is not None:
+                    e_high, e_low = end_hl[-1]
+                    leg_start = e_high if last.direction == UP else e_low
+                last = Leg(s_label, leg_start, times[i], current_price,
+                           abs(current_price - leg_start), direction, s_pos, base + i)
+                legs.append(last)
+                end_hl.append((h[i], l[i]))
+
+            else:
+                continue
+
+        elif last is not None and last.direction == UP and h[i] >= s_high and price_diff < threshold:
+            if len(legs) > 1:
+                e_high, e_low = end_hl[-2]
+                price_diff = abs(current_price - (e_high if legs[-2].direction == UP else e_low))
+            else:
+                price_diff += last.length
+            last.end = times[i]
+            last.end_pos = base + i
+            last.end_value = current_price
+            last.length = price_diff
+            last.direction = direction
+            end_hl[-1] = (h[i], l[i])
+
+        elif last is not None and last.direction == DOWN and l[i] <= s_low and price_diff < threshold:
+            if len(legs) > 1:
+                e_high, e_low = end_hl[-2]
+                price_diff = abs(current_price - (e_high if legs[-2].direction == UP else e_low))
+            else:
+                price_diff += last.length
+            last.end = times[i]
+            last.end_pos = base + i
+            last.end_value = current_price
+            last.length = price_diff
+            end_hl[-1] = (h[i], l[i])
+
+        else:
+            continue
+
+        # کندل جاری نقطه شروع جدید است
+        s_label, s_pos, s_high, s_low = times[i], base + i, h[i], l[i]
+        start_price = bar_price[i]
+        gap = 0
+
+    state.start = (s_label, s_pos, s_high, s_low)
+    state.start_price = start_price
+    state.gap = gap
+    state.direction = direction
+
+
+def _get_legs_pandas(data, threshold):
     legs = []
     start_index = data.index[0]
     j = 0
@@ -0,0 +1,145 @@
+"""
+ورود با سفارش limit روی سطح fib 0.705
+
+در حالت market ورود بعد از بسته شدن کندلی انجام می‌شود که touch را نشان داده است؛
+یعنی تا یک کندل کامل M15 بعد از رسیدن قیمت به سطح. در حالت limit به محض فعال شدن
+setup فیبوناچی یک سفارش BUY_LIMIT/SELL_LIMIT روی fib 0.705 با SL روی fib 1.0 گذاشته
+می‌شود و با هر محاسبه دوباره fibonacci_retracement قیمت آن به‌روز (reprice) و با ریست
+setup حذف می‌شود. LimitEntryManager فقط چرخه عمر سفارش را نگه می‌دارد؛ حساب‌داری
+معاملات (traded_swings، شمارنده‌ها، لاگ و ایمیل) در main انجام می‌شود.
+"""
+
+from clock_gold import get_clock
+from metatrader5_config_gold import MT5_CONFIG, TRADING_CONFIG
+from mt5_gateway_gold import mt5
+from save_file_gold import log
+
+
+class PendingEntry:
+    """سفارش limit ورود که ربات نگه می‌دارد"""
+
+    __slots__ = ('ticket', 'is_buy', 'price', 'sl', 'volume', 'key', 'placed_at')
+
+    def __init__(self, ticket, is_buy, price, sl, volume, key, placed_at):
+        self.ticket = ticket
+        self.is_buy = is_buy
+        self.price = price
+        self.sl = sl
+        self.volume = volume
+        self.key = key
+        self.placed_at = placed_at
+
+    @property
+    def side(self):
+        return 'buy' if self.is_buy else 'sell'
+
+
+class LimitEntryManager:
+    """نگه‌داری حداکثر یک سفارش limit ورود هم‌راستا با setup فعلی"""
+
+    def __init__(self, mt5_conn, reprice_tolerance=None, risk_pct=None, comment=None, fill_poll_interval=None):
+        self.mt5_conn = mt5_conn
+        self.reprice_tolerance = (TRADING_CONFIG.get('limit_reprice_tolerance', 0.05)
+                                  if reprice_tolerance is None else reprice_tolerance)
+        self.fill_poll_interval = (TRADING_CONFIG.get('limit_fill_poll_interval', 2.0)
+                                   if fill_poll_interval is None else fill_poll_interval)
+        self._last_poll = None
+        self.risk_pct = MT5_CONFIG['risk_percent'] / 100.0 if risk_pct is None else risk_pct
+        self.comment = comment or f"Gold Swing Fib Limit {MT5_CONFIG['win_ratio']}R"
+        self.order = None
+
+    def cancel_orphans(self):
+        """حذف سفارش‌های pending ربات که از اجرای قبلی باقی مانده‌اند"""
+        orders = self.mt5_conn.get_pending_orders() or []
+        for o in orders:
+            if self.order is not None and o.ticket == self.order.ticket:
+                continue
+            res = self.mt5_conn.cancel_pending_order(o.ticket)
+            ok = res and res.retcode == mt5.TRADE_RETCODE_DONE
+            log(f"🧹 Orphan pending order {o.ticket} removed: {'ok' if ok else getattr(res, 'comment', 'No result')}",
+                color='magenta')
+
+    def check_fill(self):
+        """
+        بررسی وضعیت سفارش فعلی. خروجی PendingEntry اگر سفارش فعال شده باشد (پوزیشن ممکن است
+        در همین فاصله بسته هم شده باشد)، در غیر این صورت None. سفارشی که بیرون از ربات حذف
+        شده باشد فراموش می‌شود.
+        """
+        entry = self.order
+        if entry is None:
+            return None
+        orders = self.mt5_conn.get_pending_orders()
+        if orders is None or any(o.ticket == entry.ticket for o in orders):
+            return None
+        self.order = None
+        history = mt5.history_orders_get(ticket=entry.ticket)
+        if history and history[0].state == mt5.ORDER_STATE_FILLED:
+            return entry
+        state = history[0].state if history else None
+        log(f"⚠️ Pending {entry.side.upper()} LIMIT {entry.ticket} disappeared (state={state})", color='yellow')
+        return None
+
+    def poll_fill(self):
+        """check_fill حداکثر یک بار در هر fill_poll_interval ثانیه (برای صبر بین دو کندل)"""
+        if self.order is None:
+            return None
+        now_mono = get_clock().monotonic()
+        if self._last_poll is not None and now_mono - self._last_poll < self.fill_poll_interval:
+            return None
+        self._last_poll = now_mono
+        return self.check_fill()
+
+    def cancel(self, reason):
+        """حذف سفارش فعلی (ریست setup، خارج از ساعات معاملاتی و ...)"""
+        entry = self.order
+        if entry is None:
+            return True
+        res = self.mt5_conn.cancel_pending_order(entry.ticket)
+        if res and res.retcode == mt5.TRADE_RETCODE_DONE:
+            log(f"🗑️ Pending {entry.side.upper()} LIMIT {entry.ticket} cancelled: {reason}", color='magenta')
+            self.order = None
+            return True
+        # ممکن است همین لحظه فعال شده باشد؛ check_fill بعدی وضعیت را مشخص می‌کند
+        log(f"❌ Failed to cancel pending order {entry.ticket}: {res.comment if res else 'No result'}", color='red')
+        return False
+
+    def sync(self, is_buy, price, sl, key):
+        """
+        هم‌راستا کردن سفارش با setup فعلی: گذاشتن سفارش جدید، reprice (تغییر قیمت/SL) یا
+        جایگزینی اگر جهت یا حجم تغییر کرده باشد. خروجی یکی از
+        'placed'، 'repriced'، 'kept'، 'waiting' (قیمت از سطح عبور کرده) یا 'failed'.
+        """
+        tick = self.mt5_conn.snapshot().tick
+        if not tick:
+            return 'failed'
+        # limit خرید باید پایین‌تر از ask و limit فروش بالاتر از bid باشد
+        if (is_buy and tick.ask <= price) or (not is_buy and tick.bid >= price):
+            if self.order is not None and (self.order.is_buy != is_buy or abs(self.order.price - price) > self.reprice_tolerance):
+                self.cancel("price already beyond the new entry level")
+            return 'kept' if self.order is not None else 'waiting'
+
+        entry = self.order
+        volume = self.mt5_conn.calculate_volume_by_risk(price, sl, tick, self.risk_pct)
+        if entry is not None and entry.is_buy == is_buy and entry.volume == volume:
+            if (abs(entry.price - price) <= self.reprice_tolerance
+                    and abs(entry.sl - sl) <= self.reprice_tolerance):
+                entry.key = key
+                return 'kept'
+            res = self.mt5_conn.modify_pending_order(entry.ticket, price, sl)
+            if res and res.retcode in (mt5.TRADE_RETCODE_DONE, mt5.TRADE_RETCODE_NO_CHANGES):
+                log(f"🔁 Pending {entry.side.upper()} LIMIT {entry.ticket} repriced: "
+                    f"{entry.price:.2f}/{entry.sl:.2f} -> {price:.2f}/{sl:.2f}", color='cyan')
+                entry.price, entry.sl, entry.key = price, sl, key
+                return 'repriced'
+            log(f"❌ Failed to reprice pending order {entry.ticket}: {res.comment if res else 'No result'}", color='red')
+        if entry is not None and not self.cancel("replaced by new setup"):
+            return 'failed'
+
+        res = self.mt5_conn.place_limit_order(is_buy, price, sl, tp=None, comment=self.comment, volume=volume)
+        if res and res.retcode in (mt5.TRADE_RETCODE_DONE, mt5.TRADE_RETCODE_PLACED):
+            self.order = PendingEntry(res.order, is_buy, price, sl, volume, key, get_clock().time())
+            log(f"📌 Pending {self.order.side.upper()} LIMIT placed: Ticket={res.order}, Price={price:.2f}, "
+                f"SL={sl:.2f}, Volume={volume}", color='green')
+            return 'placed'
+        log(f"❌ Failed to place {'BUY' if is_buy else 'SELL'} LIMIT: {res.comment if res else 'No result'}", color='red')
+        return 'failed'
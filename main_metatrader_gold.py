@@ -3,30 +3,35 @@
 استراتژی: Swing + Fibonacci Retracement + Trailing Stop
 """
 
-import MetaTrader5 as mt5
-from datetime import datetime
-from fibo_calculate_gold import fibonacci_retracement
-import numpy as np
+import signal
+from mt5_gateway_gold import mt5
 import pandas as pd
-from time import sleep
+from clock_gold import now, sleep, ClockStopped, request_stop, stop_requested
 from colorama import init, Fore
 from get_legs_gold import get_legs
 from mt5_connector_gold import MT5ConnectorGold
+from scheduler_gold import BarScheduler
+from trailing_engine_gold import TrailingEngine
+from sl_modify_gold import SLModifyScheduler
+from limit_entry_gold import LimitEntryManager
+from touch_gold import TickTouchTracker
+from tick_bars_gold import TickBarFeed
 from swing_gold import get_swing_points
+from strategy_gold import (update_fibonacci_setup, update_fibonacci_touches, can_enter_trade,
+                           swing_key, entry_stop_loss, trailing_stop_level)
 from utils_gold import BotState
 from save_file_gold import log
-from metatrader5_config_gold import MT5_CONFIG, TRADING_CONFIG, EXIT_MANAGEMENT_CONFIG
+from metatrader5_config_gold import MT5_CONFIG, TRADING_CONFIG, EXIT_MANAGEMENT_CONFIG, TRAILING_ENGINE_CONFIG, TICK_BARS_CONFIG
 from email_notifier_gold import send_trade_email_async
-from analytics.hooks import log_signal, log_trade, log_position_event, log_market
+from analytics.hooks import log_signal, log_trade, log_position_event, log_market, shutdown_analytics
 
 init(autoreset=True)
 
-def has_open_positions():
+def has_open_positions(snapshot):
     """بررسی وجود پوزیشن باز"""
-    positions = mt5.positions_get(symbol=MT5_CONFIG['symbol'])
-    return positions is not None and len(positions) > 0
+    return len(snapshot.positions) > 0
 
-def manage_trailing_stop(position, tick, mt5_conn):
+def manage_trailing_stop(position, tick, mt5_conn, sl_modifier=None):
     """
     مدیریت Trailing Stop برای پوزیشن باز
     
@@ -35,6 +40,7 @@ def manage_trailing_stop(position, tick, mt5_conn):
     position: MT5 position object
     tick: MT5 tick object
     mt5_conn: MT5ConnectorGold instance
+    sl_modifier: SLModifyScheduler (حداقل گام، cooldown و محدودیت نرخ)؛ None یعنی ارسال مستقیم
     
     Returns:
     --------
@@ -50,63 +56,99 @@ def manage_trailing_stop(position, tick, mt5_conn):
     start_r = trailing_config.get('start_r', 1.5)
     gap_r = trailing_config.get('gap_r', 0.5)
     
-    # محاسبه ریسک اولیه
-    entry = position.price_open
-    original_sl = position.sl
-    risk = abs(entry - original_sl)
-    
-    if risk <= 0:
+    is_buy = position.type == mt5.POSITION_TYPE_BUY
+    if not is_buy and position.type != mt5.POSITION_TYPE_SELL:
         return False
     
-    # محاسبه سود فعلی بر حسب R
-    if position.type == mt5.POSITION_TYPE_BUY:
-        current_price = tick.bid
-        current_profit = current_price - entry
-        current_profit_R = current_profit / risk if risk > 0 else 0
-        
-        # اگر سود به start_r رسید، Trailing Stop را فعال کن
-        if current_profit_R >= start_r:
-            # محاسبه SL جدید
-            new_sl = current_price - (gap_r * risk)
-            
-            # فقط اگر SL جدید بالاتر از SL فعلی باشد، به‌روزرسانی کن
-            if new_sl > position.sl:
-                result = mt5_conn.modify_sl_tp(position.ticket, new_sl=new_sl, new_tp=None)
-                if result and result.retcode == 10009:  # TRADE_RETCODE_DONE
-                    log(f"📈 Trailing Stop updated: Ticket={position.ticket}, Old SL={position.sl:.2f}, New SL={new_sl:.2f}, Profit={current_profit_R:.2f}R", color='green')
-                    return True
-                else:
-                    log(f"❌ Failed to update Trailing Stop: {result.comment if result else 'No result'}", color='red')
-    
-    elif position.type == mt5.POSITION_TYPE_SELL:
-        current_price = tick.ask
-        current_profit = entry - current_price
-        current_profit_R = current_profit / risk if risk > 0 else 0
-        
-        # اگر سود به start_r رسید، Trailing Stop را فعال کن
-        if current_profit_R >= start_r:
-            # محاسبه SL جدید
-            new_sl = current_price + (gap_r * risk)
-            
-            # فقط اگر SL جدید پایین‌تر از SL فعلی باشد، به‌روزرسانی کن
-            if new_sl < position.sl:
-                result = mt5_conn.modify_sl_tp(position.ticket, new_sl=new_sl, new_tp=None)
-                if result and result.retcode == 10009:  # TRADE_RETCODE_DONE
-                    log(f"📉 Trailing Stop updated: Ticket={position.ticket}, Old SL={position.sl:.2f}, New SL={new_sl:.2f}, Profit={current_profit_R:.2f}R", color='green')
-                    return True
-                else:
-                    log(f"❌ Failed to update Trailing Stop: {result.comment if result else 'No result'}", color='red')
+    # برای BUY با bid و برای SELL با ask محاسبه می‌شود
+    current_price = tick.bid if is_buy else tick.ask
+    new_sl, current_profit_R = trailing_stop_level(
+        is_buy, position.price_open, position.sl, current_price, start_r=start_r, gap_r=gap_r
+    )
+    if new_sl is None:
+        return False
     
+    if sl_modifier is None:
+        result = mt5_conn.modify_sl_tp(position.ticket, new_sl=new_sl, new_tp=None)
+    else:
+        risk = abs(position.price_open - position.sl)
+        if not sl_modifier.propose(position.ticket, is_buy, new_sl, position.sl, risk):
+            return False
+        sent = sl_modifier.flush(position.ticket)
+        if not sent:
+            return False  # در cooldown یا بیرون از بودجه؛ در فراخوانی بعدی ارسال می‌شود
+        result = sent[0][2]
+    if result and result.retcode == 10009:  # TRADE_RETCODE_DONE
+        icon = "📈" if is_buy else "📉"
+        log(f"{icon} Trailing Stop updated: Ticket={position.ticket}, Old SL={position.sl:.2f}, New SL={new_sl:.2f}, Profit={current_profit_R:.2f}R", color='green')
+        return True
+    log(f"❌ Failed to update Trailing Stop: {result.comment if result else 'No result'}", color='red')
     return False
 
-def get_open_positions():
+def report_limit_fill(filled):
+    """لاگ، ثبت analytics و ایمیل فعال شدن سفارش limit ورود (PendingEntry)"""
+    log(f"✅ {filled.side.upper()} Position opened (limit): Ticket={filled.ticket}, "
+        f"Entry={filled.price:.2f}, SL={filled.sl:.2f}", color='green')
+    try:
+        request_dict = {
+            "price": filled.price,
+            "volume": filled.volume,
+            "deviation": None,
+            "type_filling": None,
+            "sl": filled.sl,
+            "tp": None,
+            "magic": MT5_CONFIG['magic_number']
+        }
+        log_trade(
+            symbol=MT5_CONFIG['symbol'],
+            side=filled.side,
+            request=request_dict,
+            result=None,
+            reason="swing_fib_limit_filled"
+        )
+        log_position_event(
+            symbol=MT5_CONFIG['symbol'],
+            ticket=filled.ticket,
+            event='open',
+            direction=filled.side,
+            entry=filled.price,
+            current_price=filled.price,
+            sl=filled.sl,
+            tp=None,
+            profit_R=0.0,
+            stage=0,
+            risk_abs=abs(filled.price - filled.sl),
+            locked_R=None,
+            volume=filled.volume,
+            note='limit order filled'
+        )
+    except Exception as e:
+        log(f'Trade logging failed: {e}', color='red')
+    try:
+        send_trade_email_async(
+            subject=f"{filled.side.upper()} LIMIT FILLED {MT5_CONFIG['symbol']}",
+            body=(
+                f"✅ LIMIT ORDER FILLED\n\n"
+                f"Time: {now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                f"Symbol: {MT5_CONFIG['symbol']}\n"
+                f"Type: {filled.side.upper()} LIMIT\n"
+                f"Ticket: {filled.ticket}\n"
+                f"Entry: ${filled.price:.2f}\n"
+                f"SL: ${filled.sl:.2f}\n"
+                f"Volume: {filled.volume}\n"
+                f"Exit Strategy: Trailing Stop\n"
+            )
+        )
+    except Exception as e:
+        log(f'Email dispatch failed: {e}', color='red')
+
+def get_open_positions(snapshot):
     """دریافت پوزیشن‌های باز"""
-    positions = mt5.positions_get(symbol=MT5_CONFIG['symbol'], magic=MT5_CONFIG['magic_number'])
-    return positions if positions else []
+    return snapshot.own_positions(MT5_CONFIG['magic_number'])
 
-def get_positions_summary():
+def get_positions_summary(snapshot):
     """دریافت خلاصه‌ای از پوزیشن‌های باز برای ایمیل"""
-    positions = get_open_positions()
+    positions = get_open_positions(snapshot)
     if not positions:
         return "No open positions"
     
@@ -117,8 +159,14 @@ def get_positions_summary():
     
     return f"{len(positions)} open position(s):\n" + "\n".join(summary)
 
+def _on_sigterm(signum, frame):
+    # فقط علامت توقف (بدون لاگ یا exit داخل handler)؛ چرخه جاری (مثلا order_send) تمام
+    # می‌شود و main مسیر عادی خاموش شدن را می‌رود
+    request_stop()
+
 def main():
     """تابع اصلی ربات"""
+    signal.signal(signal.SIGTERM, _on_sigterm)
     mt5_conn = MT5ConnectorGold()
 
     if not mt5_conn.initialize():
@@ -129,6 +177,7 @@ def main():
     state.reset()
 
     threshold = TRADING_CONFIG['threshold']
+    fib_705 = TRADING_CONFIG.get('fib_705', 0.705)
     window_size = TRADING_CONFIG['window_size']
     win_ratio = MT5_CONFIG['win_ratio']
     risk_percent = MT5_CONFIG['risk_percent']
@@ -143,6 +192,21 @@ def main():
     last_trade_date = None  # تاریخ آخرین معامله
     is_first_run = True  # Flag برای تشخیص اولین اجرا
     traded_swings = set()  # مجموعه swing هایی که برای آن‌ها معامله شده (با استفاده از fib 1.0)
+    scheduler = BarScheduler()  # بیدار شدن بعد از بسته شدن کندل به جای polling هر 5 ثانیه
+    sl_modifier = SLModifyScheduler(mt5_conn)  # hysteresis و محدودیت نرخ تغییر SL
+    # Trailing Stop روی هر tick (thread جدا با connector و snapshot خودش)
+    trailing_engine = TrailingEngine(MT5ConnectorGold(), sl_modifier)
+    entry_mode = TRADING_CONFIG.get('entry_mode', 'market')
+    # در حالت limit ورود با سفارش pending روی fib 0.705 انجام می‌شود
+    limit_entry = LimitEntryManager(mt5_conn) if entry_mode == 'limit' else None
+    touch_tracker = TickTouchTracker(fib_705=fib_705)  # Phase 2 روی tick (حالت 'tick') یا کندل بسته شده ('bar')
+    pending_events = set()  # رویدادهای intrabar که در چرخه بعد (بعد از بررسی شرایط) پردازش می‌شوند
+    pending_fill = None     # سفارش limit فعال شده بین دو کندل (PendingEntry)
+    # کندل‌های M15 از tickها (بدون copy_rates در هر کندل)؛ تاریخچه یک بار از بروکر گرفته می‌شود
+    bar_feed = None
+    if TICK_BARS_CONFIG.get('enable', False):
+        bar_feed = TickBarFeed(mt5_conn, capacity=max(TICK_BARS_CONFIG['capacity'], window_size * 2))
+        bar_feed.seed()
 
     log("🚀 Gold Trading Bot Started...", color='green')
     trailing_config = EXIT_MANAGEMENT_CONFIG.get('trailing_stop', {})
@@ -152,30 +216,94 @@ def main():
         log(f"📊 Config: Symbol={MT5_CONFIG['symbol']}, Risk={risk_percent}%, TP={win_ratio}R", color='cyan')
     log(f"⏰ Trading Hours (Iran): {MT5_CONFIG['trading_hours']['start']} - {MT5_CONFIG['trading_hours']['end']}", color='cyan')
     log(f"🇮🇷 Current Iran Time: {mt5_conn.get_iran_time().strftime('%Y-%m-%d %H:%M:%S')}", color='cyan')
+    if TRAILING_ENGINE_CONFIG.get('enable', False):
+        trailing_engine.start()
+        log(f"⚡ Tick trailing engine started (poll: {trailing_engine.poll_interval}s, budget: {trailing_engine.latency_budget_ms}ms)", color='cyan')
+    log(f"🎯 Touch detection: {touch_tracker.mode}", color='cyan')
+    if limit_entry is not None:
+        log(f"📌 Entry mode: limit order at fib {fib_705} (SL at fib 1.0)", color='cyan')
+        limit_entry.cancel_orphans()
 
-    while True:
+    while not stop_requested():
         try:
+            # یک snapshot از terminal/account/positions/tick برای کل چرخه
+            mt5_conn.invalidate_snapshot()
+            # رویدادهای touch/ریست دیده شده روی tick بین دو کندل (از صبر چرخه قبل)؛
+            # قبل از پردازش آن‌ها شرایط معاملاتی پایین دوباره بررسی می‌شوند
+            intrabar_events, pending_events = pending_events, set()
+
+            current_date = mt5_conn.get_iran_time().date()
+            if last_trade_date != current_date:
+                trades_today = 0
+                last_trade_date = current_date
+
+            # حالت limit: سفارش pending ممکن است هر لحظه فعال شود؛ قبل از بررسی شرایط
+            # (محدودیت معاملات روزانه و traded_swings) ثبت می‌شود
+            filled, pending_fill = pending_fill, None
+            if filled is None and limit_entry is not None:
+                filled = limit_entry.check_fill()
+            if filled is not None:
+                report_limit_fill(filled)
+                traded_swings.add(filled.key)
+                trade_count += 1
+                trades_today += 1
+                state.reset()
+                last_swing_type = None
+                touch_tracker.disarm()
+                log(f"🧹 State reset after limit order filled", color='magenta')
+
             # بررسی ساعات معاملاتی
             can_trade, trade_message = mt5_conn.can_trade()
             
             if not can_trade:
                 log(f"⏰ {trade_message}", color='yellow', save_to_file=False)
+                if limit_entry is not None:
+                    limit_entry.cancel(trade_message)
                 sleep(60)
                 continue
             
             # بررسی تعداد معاملات روزانه
-            current_date = mt5_conn.get_iran_time().date()
-            if last_trade_date != current_date:
-                trades_today = 0
-                last_trade_date = current_date
-            
             if trades_today >= MT5_CONFIG['max_daily_trades']:
                 log(f"⚠️ Max daily trades reached ({MT5_CONFIG['max_daily_trades']})", color='yellow', save_to_file=False)
+                if limit_entry is not None:
+                    limit_entry.cancel("max daily trades reached")
                 sleep(300)  # 5 دقیقه صبر
                 continue
 
+            # صبر تا بسته شدن کندل جاری (یا تلاش مجدد کوتاه اگر کندل جدید هنوز نرسیده)؛
+            # بعد از بیدار شدن شرایط معاملاتی بالا دوباره بررسی می‌شوند
+            if last_data_time is not None and not intrabar_events:
+                delay = scheduler.delay_for(last_data_time)
+                if delay > 0:
+                    limit_working = limit_entry is not None and limit_entry.order is not None
+                    if not touch_tracker.armed and not limit_working:
+                        sleep(delay)
+                        continue
+                    # setup فعال یا سفارش limit در انتظار: تا بسته شدن کندل tickها برای touch و
+                    # ابطال fib 1.0 و خود سفارش برای فعال شدن بررسی می‌شوند
+                    while delay > 0 and not pending_events and pending_fill is None and not stop_requested():
+                        poll = touch_tracker.poll_interval if touch_tracker.armed else limit_entry.fill_poll_interval
+                        sleep(min(delay, poll))
+                        if touch_tracker.armed:
+                            events = touch_tracker.process(state, mt5_conn.get_ticks_since(*touch_tracker.cursor))
+                            pending_events = events & {'first_touch', 'second_touch', 'reset'}
+                        if limit_entry is not None:
+                            pending_fill = limit_entry.poll_fill()
+                        delay = scheduler.delay_for(last_data_time)
+                    if 'reset' in pending_events:
+                        last_swing_type = None
+                    continue
+
             # دریافت داده از MT5
-            cache_data = mt5_conn.get_historical_data(timeframe=mt5.TIMEFRAME_M15, count=window_size * 2)
+            if bar_feed is not None:
+                bar_feed.update()
+                # کندل تمام شده‌ای که هنوز tick بعدی‌اش نرسیده (بازار آرام) هم بسته می‌شود
+                scheduler.observe_tick(mt5_conn.snapshot().tick)
+                bar_feed.aggregator.advance_to(scheduler.server_now())
+                cache_data = bar_feed.bar_frame('M15', window_size * 2)
+            else:
+                cache_data = mt5_conn.get_bar_frame(timeframe=mt5.TIMEFRAME_M15, count=window_size * 2)
+            scheduler.mark_fetch()
             
             if cache_data is None:
                 log("❌ Failed to get data from MT5", color='red')
@@ -184,9 +312,10 @@ def main():
             
             # ثبت داده‌های بازار (ticks)
             try:
-                tick = mt5.symbol_info_tick(MT5_CONFIG['symbol'])
+                tick = mt5_conn.snapshot().tick
+                scheduler.observe_tick(tick)
                 if tick:
-                    symbol_info = mt5.symbol_info(MT5_CONFIG['symbol'])
+                    symbol_info = mt5_conn.get_symbol_spec()
                     if symbol_info:
                         log_market(
                             symbol=MT5_CONFIG['symbol'],
@@ -196,16 +325,15 @@ def main():
                             point=symbol_info.point,
                             digits=symbol_info.digits,
                             source="mt5",
-                            session="bot"
+                            session="bot",
+                            time_msc=tick.time_msc,
+                            flags=tick.flags
                         )
             except Exception as e:
                 pass  # خطا در ثبت بازار را نادیده بگیر
             
-            cache_data['status'] = np.where(cache_data['open'] > cache_data['close'], 'bearish', 'bullish')
-            cache_data['timestamp'] = cache_data.index
-            
             # بررسی تغییر داده
-            current_time = cache_data.index[-1]
+            current_time = cache_data.timestamp(-1)
             process_data = False
             
             if last_data_time is None:
@@ -221,39 +349,52 @@ def main():
                 if is_first_run:
                     is_first_run = False
                     log(f"✅ First run completed - now ready to enter trades", color='green')
+            elif intrabar_events:
+                log(f"⚡ Intrabar touch event(s): {', '.join(sorted(intrabar_events))}", color='cyan')
+                process_data = True
             else:
                 wait_count += 1
-                if wait_count % 12 == 0:  # هر 60 ثانیه یک بار (12 * 5)
+                if wait_count % 12 == 0:
                     log(f"⏳ Waiting for new data... Current: {current_time} (wait cycles: {wait_count})", color='yellow', save_to_file=False)
-                sleep(5)
                 continue
             
             if process_data:
                 log(f'📊 Processing {len(cache_data)} data points | Window: {window_size}', color='cyan')
-                log(f'Current time: {cache_data.index[-1]}', color='yellow')
+                log(f'Current time: {current_time}', color='yellow')
                 
                 # بررسی پوزیشن‌های باز و مدیریت Trailing Stop
-                open_positions = get_open_positions()
+                open_positions = get_open_positions(mt5_conn.snapshot())
                 if open_positions:
                     log(f"📌 {len(open_positions)} open position(s) detected", color='yellow')
-                    tick = mt5.symbol_info_tick(MT5_CONFIG['symbol'])
+                    tick = mt5_conn.snapshot().tick
                     if tick:
                         for pos in open_positions:
                             tp_display = f"{pos.tp:.2f}" if pos.tp > 0 else "Trailing Stop"
                             log(f"   Ticket: {pos.ticket}, Type: {'BUY' if pos.type == 0 else 'SELL'}, "
                                 f"Entry: {pos.price_open:.2f}, SL: {pos.sl:.2f}, TP: {tp_display}, "
                                 f"Profit: {pos.profit:.2f}", color='yellow')
-                            # مدیریت Trailing Stop
-                            manage_trailing_stop(pos, tick, mt5_conn)
+                            # مدیریت Trailing Stop (اگر موتور tick فعال نباشد)
+                            if not trailing_engine.running:
+                                manage_trailing_stop(pos, tick, mt5_conn, sl_modifier)
+                        if trailing_engine.running:
+                            log(f"⚡ Trailing engine: {trailing_engine.summary()}", color='cyan')
                 else:
                     log(f"📌 No open positions", color='cyan')
                 
+                # حالت tick: tickهای بعد از آخرین بررسی با Fibonacci فعلی (قبل از Phase 1)
+                if touch_tracker.armed:
+                    if 'reset' in touch_tracker.process(state, mt5_conn.get_ticks_since(*touch_tracker.cursor)):
+                        last_swing_type = None
+                fib_before = state.fib_levels
+                
                 # محاسبه legs
                 legs = get_legs(cache_data, threshold)
                 log(f'📊 Legs identified: {len(legs)}', color='cyan')
                 
                 # استفاده از 2 یا 3 leg (Optimized)
-                if len(legs) >= 2:
+                if intrabar_events:
+                    pass  # رویداد بین دو کندل: کندل بسته شده جدیدی برای Phase 1 وجود ندارد
+                elif len(legs) >= 2:
                     if len(legs) >= 3:
                         legs = legs[-3:]
                     else:
@@ -265,167 +406,32 @@ def main():
 
                     # Phase 1: ایجاد Fibonacci (Optimized)
                     # فقط اگر Fibonacci وجود نداشته باشد یا Swing جدید شناسایی شده باشد، Fibonacci ایجاد می‌شود
-                    if is_swing:
-                        # بررسی اینکه آیا باید Fibonacci جدید ایجاد شود
-                        should_create_fib = False
-                        
-                        if swing_type == 'bullish':
-                            # شرایط آسان‌تر: فقط بررسی کنیم که قیمت بالاتر از نقطه pullback باشد
-                            if len(legs) >= 3:
-                                check_price = legs[1]['start_value']
-                            else:
-                                check_price = legs[0]['start_value']
-                            
-                            # فقط اگر Fibonacci وجود نداشته باشد یا Swing جدید باشد، ایجاد کن
-                            if not state.fib_levels or last_swing_type != swing_type:
-                                if cache_data.iloc[-2]['close'] > check_price * 0.99:  # 1% tolerance
-                                    should_create_fib = True
-                            # اگر Fibonacci وجود دارد و Swing همان است، بررسی کن که آیا باید به‌روزرسانی شود
-                            elif state.fib_levels and last_swing_type == swing_type:
-                                # اگر Swing جدیدی شناسایی شده (legs تغییر کرده)، Fibonacci جدید ایجاد کن
-                                if len(legs) >= 3:
-                                    new_fib1_time = legs[2]['end']
-                                else:
-                                    new_fib1_time = legs[1]['end']
-                                # اگر زمان fib1 تغییر کرده، Fibonacci جدید ایجاد کن
-                                if state.fib1_time != new_fib1_time:
-                                    if cache_data.iloc[-2]['close'] > check_price * 0.99:
-                                        should_create_fib = True
-
-                        elif swing_type == 'bearish':
-                            if len(legs) >= 3:
-                                check_price = legs[1]['start_value']
-                            else:
-                                check_price = legs[0]['start_value']
-                            
-                            # فقط اگر Fibonacci وجود نداشته باشد یا Swing جدید باشد، ایجاد کن
-                            if not state.fib_levels or last_swing_type != swing_type:
-                                if cache_data.iloc[-2]['close'] < check_price * 1.01:  # 1% tolerance
-                                    should_create_fib = True
-                            # اگر Fibonacci وجود دارد و Swing همان است، بررسی کن که آیا باید به‌روزرسانی شود
-                            elif state.fib_levels and last_swing_type == swing_type:
-                                # اگر Swing جدیدی شناسایی شده (legs تغییر کرده)، Fibonacci جدید ایجاد کن
-                                if len(legs) >= 3:
-                                    new_fib1_time = legs[2]['end']
-                                else:
-                                    new_fib1_time = legs[1]['end']
-                                # اگر زمان fib1 تغییر کرده، Fibonacci جدید ایجاد کن
-                                if state.fib1_time != new_fib1_time:
-                                    if cache_data.iloc[-2]['close'] < check_price * 1.01:
-                                        should_create_fib = True
-                        
-                        # ایجاد Fibonacci جدید
-                        if should_create_fib:
-                            state.reset()
-                            if swing_type == 'bullish':
-                                if len(legs) >= 3:
-                                    state.fib_levels = fibonacci_retracement(
-                                        start_price=legs[2]['end_value'],
-                                        end_price=legs[2]['start_value']
-                                    )
-                                    state.fib0_time = legs[2]['start']
-                                    state.fib1_time = legs[2]['end']
-                                else:
-                                    state.fib_levels = fibonacci_retracement(
-                                        start_price=legs[1]['end_value'],
-                                        end_price=legs[0]['start_value']
-                                    )
-                                    state.fib0_time = legs[0]['start']
-                                    state.fib1_time = legs[1]['end']
-                                last_swing_type = swing_type
-                                log(f"📈 New bullish fibonacci created: fib1:{state.fib_levels['1.0']:.2f} "
-                                    f"fib0.705:{state.fib_levels['0.705']:.2f} fib0:{state.fib_levels['0.0']:.2f}", 
-                                    color='green')
-                            elif swing_type == 'bearish':
-                                if len(legs) >= 3:
-                                    state.fib_levels = fibonacci_retracement(
-                                        start_price=legs[2]['end_value'],
-                                        end_price=legs[2]['start_value']
-                                    )
-                                    state.fib0_time = legs[2]['start']
-                                    state.fib1_time = legs[2]['end']
-                                else:
-                                    state.fib_levels = fibonacci_retracement(
-                                        start_price=legs[1]['end_value'],
-                                        end_price=legs[0]['start_value']
-                                    )
-                                    state.fib0_time = legs[0]['start']
-                                    state.fib1_time = legs[1]['end']
-                                last_swing_type = swing_type
-                                log(f"📉 New bearish fibonacci created: fib1:{state.fib_levels['1.0']:.2f} "
-                                    f"fib0.705:{state.fib_levels['0.705']:.2f} fib0:{state.fib_levels['0.0']:.2f}", 
-                                    color='green')
+                    last_swing_type = update_fibonacci_setup(
+                        state, legs, swing_type, is_swing, last_swing_type, cache_data.row(-2), fib_705=fib_705
+                    )
 
                 else:
                     log(f'⚠️ Not enough legs ({len(legs)}) - need at least 2 for swing analysis', color='yellow')
                 
                 # Phase 2: به‌روزرسانی Fibonacci
-                if state.fib_levels:
-                    log(f'📊 Fibonacci levels active: fib0={state.fib_levels.get("0.0", "N/A"):.2f}, fib705={state.fib_levels.get("0.705", "N/A"):.2f}, fib1={state.fib_levels.get("1.0", "N/A"):.2f}', color='cyan')
-                    if len(legs) > 2:
-                        if last_swing_type == 'bullish':
-                            if cache_data.iloc[-2]['high'] > state.fib_levels['0.0']:
-                                state.fib_levels = fibonacci_retracement(
-                                    start_price=cache_data.iloc[-2]['high'],
-                                    end_price=state.fib_levels['1.0']
-                                )
-                                state.fib0_time = cache_data.iloc[-2]['timestamp']
-                                state.first_touch = False
-                                state.first_touch_value = None
-                                log(f"📈 Updated fibonacci: fib0:{state.fib_levels['0.0']:.2f} "
-                                    f"fib1:{state.fib_levels['1.0']:.2f}", color='green')
-                            elif cache_data.iloc[-2]['low'] < state.fib_levels['1.0']:
-                                state.reset()
-                                last_swing_type = None
-                                log(f"📈 Price dropped below fib1 - reset", color='red')
-                            # شرایط touch آسان‌تر (Optimized): tolerance 1%
-                            elif cache_data.iloc[-2]['low'] <= state.fib_levels['0.705'] * 1.01:
-                                current_candle_time = cache_data.iloc[-2]['timestamp']
-                                # بررسی اینکه آیا این کندل قبلاً پردازش شده است یا نه
-                                if not state.first_touch:
-                                    state.first_touch_value = cache_data.iloc[-2]
-                                    state.first_touch = True
-                                    log(f"📈 First touch on fib0.705", color='yellow')
-                                elif state.first_touch and not state.second_touch:
-                                    # بررسی اینکه آیا این کندل جدید است (نه همان کندل First Touch)
-                                    if state.first_touch_value['timestamp'] != current_candle_time:
-                                        # دومین touch: فقط بررسی کنیم که قیمت دوباره به سطح نزدیک شده
-                                        if abs(cache_data.iloc[-2]['low'] - state.fib_levels['0.705']) < abs(state.first_touch_value['low'] - state.fib_levels['0.705']) * 1.5:
-                                            state.second_touch_value = cache_data.iloc[-2]
-                                            state.second_touch = True
-                                            log(f"📈 Second touch detected - signal ready!", color='green')
-
-                        elif last_swing_type == 'bearish':
-                            if cache_data.iloc[-2]['low'] < state.fib_levels['0.0']:
-                                state.fib_levels = fibonacci_retracement(
-                                    start_price=cache_data.iloc[-2]['low'],
-                                    end_price=state.fib_levels['1.0']
-                                )
-                                state.fib0_time = cache_data.iloc[-2]['timestamp']
-                                state.first_touch = False
-                                state.first_touch_value = None
-                                log(f"📉 Updated fibonacci: fib0:{state.fib_levels['0.0']:.2f} "
-                                    f"fib1:{state.fib_levels['1.0']:.2f}", color='green')
-                            elif cache_data.iloc[-2]['high'] > state.fib_levels['1.0']:
-                                state.reset()
+                if touch_tracker.enabled:
+                    # حالت tick: touchها و ابطال روی tickها بررسی می‌شوند؛ اینجا setup فقط دنبال می‌شود
+                    if state.fib_levels and last_swing_type and len(legs) > 2:
+                        log(f'📊 Fibonacci levels active: fib0={state.fib_levels.get("0.0", "N/A"):.2f}, fib705={state.fib_levels.get("0.705", "N/A"):.2f}, fib1={state.fib_levels.get("1.0", "N/A"):.2f}', color='cyan')
+                        if state.fib_levels is not fib_before or not touch_tracker.armed:
+                            # setup جدید: tickهای کندل در حال شکل‌گیری از ابتدای آن بررسی می‌شوند
+                            touch_tracker.arm(last_swing_type, from_msc=int(cache_data.time[-1]) * 1000)
+                            if 'reset' in touch_tracker.process(state, mt5_conn.get_ticks_since(*touch_tracker.cursor)):
                                 last_swing_type = None
-                                log(f"📉 Price rose above fib1 - reset", color='red')
-                            # شرایط touch آسان‌تر (Optimized): tolerance 1%
-                            elif cache_data.iloc[-2]['high'] >= state.fib_levels['0.705'] * 0.99:
-                                current_candle_time = cache_data.iloc[-2]['timestamp']
-                                # بررسی اینکه آیا این کندل قبلاً پردازش شده است یا نه
-                                if not state.first_touch:
-                                    state.first_touch_value = cache_data.iloc[-2]
-                                    state.first_touch = True
-                                    log(f"📉 First touch on fib0.705", color='yellow')
-                                elif state.first_touch and not state.second_touch:
-                                    # بررسی اینکه آیا این کندل جدید است (نه همان کندل First Touch)
-                                    if state.first_touch_value['timestamp'] != current_candle_time:
-                                        # دومین touch: فقط بررسی کنیم که قیمت دوباره به سطح نزدیک شده
-                                        if abs(cache_data.iloc[-2]['high'] - state.fib_levels['0.705']) < abs(state.first_touch_value['high'] - state.fib_levels['0.705']) * 1.5:
-                                            state.second_touch_value = cache_data.iloc[-2]
-                                            state.second_touch = True
-                                            log(f"📉 Second touch detected - signal ready!", color='green')
+                    else:
+                        touch_tracker.disarm()
+                        if not state.fib_levels and len(legs) <= 2:
+                            log(f'📊 No fibonacci levels active - waiting for swing formation', color='yellow')
+                elif state.fib_levels:
+                    log(f'📊 Fibonacci levels active: fib0={state.fib_levels.get("0.0", "N/A"):.2f}, fib705={state.fib_levels.get("0.705", "N/A"):.2f}, fib1={state.fib_levels.get("1.0", "N/A"):.2f}', color='cyan')
+                    last_swing_type = update_fibonacci_touches(
+                        state, legs, last_swing_type, cache_data.row(-2), fib_705=fib_705
+                    )
                 else:
                     if len(legs) <= 2:
                         log(f'📊 No fibonacci levels active - waiting for swing formation', color='yellow')
@@ -436,19 +442,40 @@ def main():
                 # در اولین اجرا، از باز کردن پوزیشن جلوگیری می‌کنیم (حتی اگر second_touch وجود داشته باشد)
                 # باید منتظر اولین کندل جدید بمانیم تا از داده‌های تاریخی استفاده نکنیم
                 if is_first_run:
-                    can_enter = False  # در اولین اجرا، هیچ پوزیشنی باز نمی‌کنیم
                     if state.second_touch:
                         log(f"⏸️ First run: Second touch detected in historical data, but waiting for new candle before entering", color='yellow')
                     elif state.first_touch:
                         log(f"⏸️ First run: First touch detected in historical data, waiting for second touch", color='yellow')
-                else:
-                    can_enter = state.second_touch or (use_first_touch and state.first_touch and trade_count == 0)
+                can_enter = can_enter_trade(state, is_first_run, trade_count, use_first_touch)
                 
-                if state.fib_levels and last_swing_type:
+                if limit_entry is not None:
+                    # Phase 3 (حالت limit): سفارش pending روی fib 0.705 با SL روی fib 1.0 به محض
+                    # فعال شدن setup؛ با محاسبه دوباره Fibonacci قیمت آن به‌روز و با ریست حذف می‌شود
+                    if state.fib_levels and last_swing_type and not is_first_run:
+                        is_buy = last_swing_type == 'bullish'
+                        key = swing_key(last_swing_type, state.fib_levels)
+                        if key in traded_swings:
+                            log(f"🚫 Skip limit entry: Already traded this swing (fib 1.0: {state.fib_levels['1.0']:.2f})", color='yellow')
+                            limit_entry.cancel("swing already traded")
+                            state.reset()
+                            last_swing_type = None
+                        elif TRADING_CONFIG.get('prevent_multiple_positions', False) and has_open_positions(mt5_conn.snapshot()):
+                            limit_entry.cancel("position already open")
+                        else:
+                            entry_price = state.fib_levels[str(fib_705)]
+                            sl = entry_stop_loss(is_buy, entry_price, state.fib_levels['1.0'], min_dist=TRADING_CONFIG.get('min_dist', 0.5))
+                            if sl is None:
+                                limit_entry.cancel("invalid SL")
+                            else:
+                                status = limit_entry.sync(is_buy, entry_price, sl, key)
+                                log(f"📌 Limit entry {status}: {'BUY' if is_buy else 'SELL'} @ {entry_price:.2f}, SL={sl:.2f}", color='cyan')
+                    else:
+                        limit_entry.cancel("no active fibonacci setup")
+                elif state.fib_levels and last_swing_type:
                     if last_swing_type == 'bullish' and can_enter:
                         # بررسی اینکه آیا برای این swing قبلاً معامله شده یا نه
-                        swing_key = (last_swing_type, round(state.fib_levels['1.0'], 2))
-                        if swing_key in traded_swings:
+                        key = swing_key(last_swing_type, state.fib_levels)
+                        if key in traded_swings:
                             log(f"🚫 Skip BUY signal: Already traded this swing (fib 1.0: {state.fib_levels['1.0']:.2f})", color='yellow')
                             state.reset()
                             last_swing_type = None
@@ -456,16 +483,16 @@ def main():
                         
                         # با توجه به تایم‌فریم M15، اجازه باز کردن چند پوزیشن همزمان داده می‌شود
                         # اگر می‌خواهید فقط یک پوزیشن باز باشد، prevent_multiple_positions را True کنید
-                        if TRADING_CONFIG.get('prevent_multiple_positions', False) and has_open_positions():
+                        if TRADING_CONFIG.get('prevent_multiple_positions', False) and has_open_positions(mt5_conn.snapshot()):
                             log(f"🚫 Skip BUY signal: Position already open", color='yellow')
                             # ارسال ایمیل اطلاع‌رسانی skip شدن سیگنال BUY
                             try:
-                                positions_summary = get_positions_summary()
+                                positions_summary = get_positions_summary(mt5_conn.snapshot())
                                 send_trade_email_async(
                                     subject=f"SIGNAL SKIPPED - BUY {MT5_CONFIG['symbol']}",
                                     body=(
                                         f"🚫 TRADING SIGNAL SKIPPED 🚫\n\n"
-                                        f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                                        f"Time: {now().strftime('%Y-%m-%d %H:%M:%S')}\n"
                                         f"Symbol: {MT5_CONFIG['symbol']}\n"
                                         f"Signal Type: BUY (Bullish Swing)\n"
                                         f"Action: SKIPPED\n"
@@ -484,30 +511,20 @@ def main():
                             last_swing_type = None
                             continue
                         
-                        tick = mt5.symbol_info_tick(MT5_CONFIG['symbol'])
+                        tick = mt5_conn.snapshot().tick
                         if not tick:
                             log("❌ No tick data", color='red')
                             continue
                         
                         entry_price = tick.ask
-                        candidate_sl = state.fib_levels['1.0']
+                        sl = entry_stop_loss(True, entry_price, state.fib_levels['1.0'], min_dist=TRADING_CONFIG.get('min_dist', 0.5))
                         
-                        if candidate_sl >= entry_price:
+                        if sl is None:
                             log("❌ Invalid SL for BUY", color='red')
                             state.reset()
                             last_swing_type = None
                             continue
                         
-                        min_dist = 0.5
-                        if (entry_price - candidate_sl) < min_dist:
-                            adj = entry_price - min_dist
-                            if adj <= 0:
-                                state.reset()
-                                last_swing_type = None
-                                continue
-                            candidate_sl = adj
-                        
-                        sl = candidate_sl
                         risk = abs(entry_price - sl)
                         # بدون TP ثابت - فقط Trailing Stop
                         tp = None
@@ -538,7 +555,7 @@ def main():
                             send_trade_email_async(
                                 subject=f"NEW BUY ORDER {MT5_CONFIG['symbol']}",
                                 body=(
-                                    f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                                    f"Time: {now().strftime('%Y-%m-%d %H:%M:%S')}\n"
                                     f"Symbol: {MT5_CONFIG['symbol']}\n"
                                     f"Type: BUY (Bullish Swing)\n"
                                     f"Entry: ${entry_price:.2f}\n"
@@ -583,8 +600,8 @@ def main():
                         if result and result.retcode == 10009:  # TRADE_RETCODE_DONE
                             log(f"✅ BUY Position opened: Ticket={result.order}", color='green')
                             # ثبت این swing به عنوان معامله شده
-                            swing_key = (last_swing_type, round(state.fib_levels['1.0'], 2))
-                            traded_swings.add(swing_key)
+                            key = swing_key(last_swing_type, state.fib_levels)
+                            traded_swings.add(key)
                             trade_count += 1
                             trades_today += 1
                             
@@ -616,7 +633,7 @@ def main():
                                     subject=f"BUY ORDER EXECUTED {MT5_CONFIG['symbol']}",
                                     body=(
                                         f"✅ ORDER EXECUTED SUCCESSFULLY\n\n"
-                                        f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                                        f"Time: {now().strftime('%Y-%m-%d %H:%M:%S')}\n"
                                         f"Symbol: {MT5_CONFIG['symbol']}\n"
                                         f"Type: BUY\n"
                                         f"Ticket: {result.order}\n"
@@ -640,8 +657,8 @@ def main():
 
                     elif last_swing_type == 'bearish' and can_enter:
                         # بررسی اینکه آیا برای این swing قبلاً معامله شده یا نه
-                        swing_key = (last_swing_type, round(state.fib_levels['1.0'], 2))
-                        if swing_key in traded_swings:
+                        key = swing_key(last_swing_type, state.fib_levels)
+                        if key in traded_swings:
                             log(f"🚫 Skip SELL signal: Already traded this swing (fib 1.0: {state.fib_levels['1.0']:.2f})", color='yellow')
                             state.reset()
                             last_swing_type = None
@@ -649,16 +666,16 @@ def main():
                         
                         # با توجه به تایم‌فریم M15، اجازه باز کردن چند پوزیشن همزمان داده می‌شود
                         # اگر می‌خواهید فقط یک پوزیشن باز باشد، prevent_multiple_positions را True کنید
-                        if TRADING_CONFIG.get('prevent_multiple_positions', False) and has_open_positions():
+                        if TRADING_CONFIG.get('prevent_multiple_positions', False) and has_open_positions(mt5_conn.snapshot()):
                             log(f"🚫 Skip SELL signal: Position already open", color='yellow')
                             # ارسال ایمیل اطلاع‌رسانی skip شدن سیگنال SELL
                             try:
-                                positions_summary = get_positions_summary()
+                                positions_summary = get_positions_summary(mt5_conn.snapshot())
                                 send_trade_email_async(
                                     subject=f"SIGNAL SKIPPED - SELL {MT5_CONFIG['symbol']}",
                                     body=(
                                         f"🚫 TRADING SIGNAL SKIPPED 🚫\n\n"
-                                        f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                                        f"Time: {now().strftime('%Y-%m-%d %H:%M:%S')}\n"
                                         f"Symbol: {MT5_CONFIG['symbol']}\n"
                                         f"Signal Type: SELL (Bearish Swing)\n"
                                         f"Action: SKIPPED\n"
@@ -677,26 +694,20 @@ def main():
                             last_swing_type = None
                             continue
                         
-                        tick = mt5.symbol_info_tick(MT5_CONFIG['symbol'])
+                        tick = mt5_conn.snapshot().tick
                         if not tick:
                             log("❌ No tick data", color='red')
                             continue
                         
                         entry_price = tick.bid
-                        candidate_sl = state.fib_levels['1.0']
+                        sl = entry_stop_loss(False, entry_price, state.fib_levels['1.0'], min_dist=TRADING_CONFIG.get('min_dist', 0.5))
                         
-                        if candidate_sl <= entry_price:
+                        if sl is None:
                             log("❌ Invalid SL for SELL", color='red')
                             state.reset()
                             last_swing_type = None
                             continue
                         
-                        min_dist = 0.5
-                        if (candidate_sl - entry_price) < min_dist:
-                            adj = entry_price + min_dist
-                            candidate_sl = adj
-                        
-                        sl = candidate_sl
                         risk = abs(entry_price - sl)
                         # بدون TP ثابت - فقط Trailing Stop
                         tp = None
@@ -727,7 +738,7 @@ def main():
                             send_trade_email_async(
                                 subject=f"NEW SELL ORDER {MT5_CONFIG['symbol']}",
                                 body=(
-                                    f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                                    f"Time: {now().strftime('%Y-%m-%d %H:%M:%S')}\n"
                                     f"Symbol: {MT5_CONFIG['symbol']}\n"
                                     f"Type: SELL (Bearish Swing)\n"
                                     f"Entry: ${entry_price:.2f}\n"
@@ -772,8 +783,8 @@ def main():
                         if result and result.retcode == 10009:  # TRADE_RETCODE_DONE
                             log(f"✅ SELL Position opened: Ticket={result.order}", color='green')
                             # ثبت این swing به عنوان معامله شده
-                            swing_key = (last_swing_type, round(state.fib_levels['1.0'], 2))
-                            traded_swings.add(swing_key)
+                            key = swing_key(last_swing_type, state.fib_levels)
+                            traded_swings.add(key)
                             trade_count += 1
                             trades_today += 1
                             
@@ -805,7 +816,7 @@ def main():
                                     subject=f"SELL ORDER EXECUTED {MT5_CONFIG['symbol']}",
                                     body=(
                                         f"✅ ORDER EXECUTED SUCCESSFULLY\n\n"
-                                        f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                                        f"Time: {now().strftime('%Y-%m-%d %H:%M:%S')}\n"
                                         f"Symbol: {MT5_CONFIG['symbol']}\n"
                                         f"Type: SELL\n"
                                         f"Ticket: {result.order}\n"
@@ -833,16 +844,23 @@ def main():
                     f'SwingType={last_swing_type}', color='cyan')
                 log(f'{"="*80}', color='cyan')
 
-            sleep(5)
-
         except KeyboardInterrupt:
             log("🛑 Bot stopped by user", color='yellow')
             break
+        except ClockStopped as e:
+            log(f"🏁 Simulation finished: {e}", color='yellow')
+            break
         except Exception as e:
             log(f"❌ Error: {e}", color='red')
             sleep(10)
 
+    if stop_requested():
+        log("🛑 Bot stopped by SIGTERM", color='yellow')
+    trailing_engine.stop(timeout=5)
+    if limit_entry is not None:
+        limit_entry.cancel("bot stopped")
     mt5_conn.shutdown()
+    log(f"🗂️ Analytics writers: {shutdown_analytics()}", color='cyan')
 
 if __name__ == "__main__":
     main()
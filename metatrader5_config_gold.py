@@ -60,6 +60,8 @@ MT5_CONFIG = {
     'min_balance': 1,
     'max_daily_trades': 5,  # کاهش از 10 به 5 (Optimized)
     'trading_hours': MY_CUSTOM_TIME_IRAN,
+    'symbol_spec_ttl': 300,  # اعتبار cache مشخصات نماد (ثانیه)
+    'filling_cache_file': 'trading-analytics-logger/state/filling_modes.json',  # filling mode یادگرفته شده
 }
 
 # تنظیمات استراتژی Optimized برای طلا
@@ -76,6 +78,39 @@ TRADING_CONFIG = {
     'prevent_multiple_positions': True,  # جلوگیری از چند پوزیشن همزمان (Optimized)
     'position_check_mode': 'all',
     'use_first_touch': True,  # امکان ورود با first touch در اولین معامله (Optimized)
+    'entry_mode': 'market',  # 'market': ورود بعد از کندل touch | 'limit': سفارش pending روی fib 0.705 (limit_entry_gold.py)
+    'limit_reprice_tolerance': 0.05,  # تغییر کمتر از این (دلار) در قیمت/SL سفارش limit نادیده گرفته می‌شود
+    'limit_fill_poll_interval': 2.0,  # فاصله بررسی فعال شدن سفارش limit بین دو کندل (ثانیه)
+}
+
+# تشخیص touch سطح fib 0.705 (touch_gold.py)
+TOUCH_CONFIG = {
+    'mode': 'bar',          # 'bar': فقط کندل بسته شده (مثل بک‌تست) | 'tick': روی هر tick بین دو کندل
+    'poll_interval': 0.25,  # فاصله دریافت tickهای جدید وقتی setup فعال است (ثانیه)
+}
+
+# ساخت کندل از tick برای چند تایم‌فریم (tick_bars_gold.py)
+TICK_BARS_CONFIG = {
+    'enable': False,                      # True یعنی کندل‌های M15 حلقه main از tickها ساخته می‌شوند
+    'timeframes': ('M1', 'M5', 'M15', 'H1'),
+    'capacity': 500,                      # تعداد کندل نگه‌داری شده برای هر تایم‌فریم
+}
+
+# thread اختصاصی فراخوانی‌های MetaTrader5 (mt5_gateway_gold.py)
+MT5_GATEWAY_CONFIG = {
+    'timeout': 10.0,          # حداکثر انتظار برای فراخوانی‌های خواندنی (ثانیه)
+    'order_timeout': 30.0,    # حداکثر انتظار برای order_send
+    'coalesce_window': 0.005, # درخواست خواندنی یکسان در این بازه دوباره اجرا نمی‌شود
+    'reinit_interval': 5.0,   # حداقل فاصله تلاش‌های initialize مجدد بعد از قطع اتصال
+}
+
+# زمان‌بندی دریافت داده هم‌تراز با بسته شدن کندل (scheduler_gold.py)
+BAR_SCHEDULER_CONFIG = {
+    'timeframe_seconds': 15 * 60,  # M15
+    'wake_delay': 0.25,            # بیدار شدن 0.25 ثانیه بعد از بسته شدن کندل
+    'retry_interval': 0.5,         # فاصله تلاش مجدد اگر کندل جدید هنوز نرسیده
+    'max_retry': 10.0,             # حداکثر مدت تلاش‌های کوتاه بعد از بسته شدن کندل
+    'idle_interval': 5.0,          # polling عادی وقتی کندل جدید دیر کرده (مثلا بازار بسته)
 }
 
 # مدیریت خروج با Trailing Stop - تنظیم شده برای طلا
@@ -97,6 +132,56 @@ EXIT_MANAGEMENT_CONFIG = {
     }
 }
 
+# Trailing Stop در سطح tick روی thread جدا (trailing_engine_gold.py)
+TRAILING_ENGINE_CONFIG = {
+    'enable': False,             # False یعنی Trailing فقط با هر کندل جدید (حلقه main، مثل بک‌تست)
+    'poll_interval': 0.05,       # فاصله خواندن symbol_info_tick (ثانیه)
+    'positions_refresh': 1.0,    # فاصله خواندن دوباره positions_get (ثانیه)
+    'latency_budget_ms': 250,    # حداکثر مجاز دریافت tick تا پایان order_send
+    'metrics_window': 1000,      # تعداد تغییرات اخیر برای آمار latency
+}
+
+# hysteresis و محدودیت نرخ درخواست‌های تغییر SL (sl_modify_gold.py)
+SL_MODIFY_CONFIG = {
+    'min_step_price': 0.10,  # حداقل بهبود SL نسبت به آخرین SL ارسال شده (دلار)
+    'min_step_r': 0.05,      # حداقل بهبود بر حسب R (بیشینه این دو اعمال می‌شود)
+    'cooldown': 1.0,         # حداقل فاصله دو درخواست برای یک ticket (ثانیه)
+    'max_per_second': 2,     # بودجه سراسری درخواست‌های TRADE_ACTION_SLTP در ثانیه
+}
+
+# تنظیمات بک‌تست (backtest_gold.py)
+BACKTEST_CONFIG = {
+    'data_file': 'data/XAUUSD_M15.csv',  # خروجی CSV کندل‌های M15 از MT5
+    'initial_balance': 10000,
+    'spread': 0.30,      # اسپرد ثابت بر حسب دلار
+    'slippage': 0.05,    # لغزش نامطلوب در هر ورود و خروج (دلار)
+}
+
+# شبکه پارامترهای sweep (sweep_gold.py)
+SWEEP_CONFIG = {
+    'grid': {
+        'threshold': [8, 10, 12, 14, 16, 20],
+        'fib_705': [0.618, 0.705, 0.786],
+        'min_swing_size': [2, 3],
+        'window_size': [60, 100],
+        'start_r': [1.0, 1.5, 2.0],
+        'gap_r': [0.4, 0.5, 0.75],
+    },
+    'results_file': 'sweep_results.csv',
+    'processes': None,  # None یعنی همه هسته‌های CPU
+}
+
+# Walk-forward: بهینه‌سازی روی بازه train و ارزیابی روی بازه test بعدی (walkforward_gold.py)
+# تعداد کندل‌ها بر حسب M15 است (حدود 96 کندل در روز معاملاتی)
+WALKFORWARD_CONFIG = {
+    'train_bars': 96 * 60,       # حدود 3 ماه
+    'test_bars': 96 * 20,        # حدود 1 ماه
+    'step_bars': None,           # None یعنی برابر test_bars (بازه‌های test بدون هم‌پوشانی)
+    'objective': 'expectancy_R', # معیار انتخاب بهترین پارامترها روی train
+    'min_trades': 10,            # حداقل معامله در train برای معتبر بودن یک نقطه شبکه
+    'results_file': 'walkforward_results.csv',
+}
+
 # مدیریت پویا چند مرحله‌ای - DISABLED
 DYNAMIC_RISK_CONFIG = {
     'enable': False,
@@ -112,5 +197,12 @@ LOG_CONFIG = {
     'log_level': 'INFO',
     'save_to_file': True,
     'max_log_size': 10,
+    'market_format': 'csv',      # tickهای log_market: 'csv' یا 'bin' (analytics/tick_recorder.py، README)
+    'tick_flush_interval': 1.0,  # فاصله نوشتن tickهای بافر شده در فایل باینری (ثانیه)
+    'async_csv': True,           # سیگنال/معامله/رویدادها با صف و thread جدا (analytics/csv_writer.py)
+    'csv_queue_size': 10000,     # ظرفیت صف؛ سطرهای اضافه دور ریخته و شمرده می‌شوند
+    'csv_flush_interval': 1.0,   # حداکثر فاصله flush فایل‌ها (ثانیه)
+    'csv_batch_rows': 256,       # flush بعد از این تعداد سطر
+    'sqlite_store': False,       # نوشتن همزمان در analytics/trading-analytics-logger/analytics.db (analytics/store.py)
 }
 
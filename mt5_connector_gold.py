@@ -1,10 +1,156 @@
-import MetaTrader5 as mt5
+from mt5_gateway_gold import mt5, is_unknown_outcome
+import json
+import os
 import pandas as pd
 import pytz
-from datetime import datetime, time
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
 from metatrader5_config_gold import MT5_CONFIG
+from clock_gold import now, get_clock
+from bar_buffer_gold import BarBuffer
+from barframe_gold import BarFrame
+from utils_gold import is_within_trading_hours, is_weekday
 
 RET_OK = 10009  # mt5.TRADE_RETCODE_DONE
+# retcodeهایی که ممکن است به خاطر مشخصات قدیمی نماد باشند (cache دوباره خوانده می‌شود)
+SPEC_RETCODES = (
+    10014,  # TRADE_RETCODE_INVALID_VOLUME
+    10015,  # TRADE_RETCODE_INVALID_PRICE
+    10016,  # TRADE_RETCODE_INVALID_STOPS
+    10030,  # TRADE_RETCODE_INVALID_FILL
+)
+
+
+class FillingModeCache:
+    """
+    آخرین filling mode پذیرفته شده توسط بروکر برای هر (symbol, action) و آمار هر mode
+    (تعداد تلاش، تعداد پذیرش، latency و retcodeها). در فایل JSON ذخیره می‌شود تا بعد از
+    راه‌اندازی مجدد هم اولین تلاش با mode درست انجام شود.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self.data = {}
+        if self.path and self.path.exists():
+            try:
+                self.data = json.loads(self.path.read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                print(f"[filling cache] ignored unreadable {self.path}: {e}")
+
+    def _entry(self, symbol, action):
+        return self.data.setdefault(symbol, {}).setdefault(str(action), {'preferred': None, 'stats': {}})
+
+    def preferred(self, symbol, action):
+        """mode ترجیحی (عدد، 'auto' یا None)"""
+        entry = self.data.get(symbol, {}).get(str(action))
+        return entry['preferred'] if entry else None
+
+    def record(self, symbol, action, mode, retcode, latency_ms, accepted):
+        """ثبت نتیجه یک تلاش؛ خروجی True اگر mode ترجیحی تغییر کرده باشد (نیاز به save)"""
+        entry = self._entry(symbol, action)
+        before = entry['preferred']
+        stats = entry['stats'].setdefault(str(mode), {
+            'attempts': 0, 'accepted': 0, 'latency_ms_total': 0.0, 'latency_ms_max': 0.0, 'retcodes': {},
+        })
+        stats['attempts'] += 1
+        stats['latency_ms_total'] += latency_ms
+        stats['latency_ms_max'] = max(stats['latency_ms_max'], latency_ms)
+        key = str(retcode)
+        stats['retcodes'][key] = stats['retcodes'].get(key, 0) + 1
+        if accepted:
+            stats['accepted'] += 1
+            entry['preferred'] = mode
+        elif entry['preferred'] == mode and retcode == 10030:  # TRADE_RETCODE_INVALID_FILL
+            entry['preferred'] = None
+        return entry['preferred'] != before
+
+    def stats(self, symbol, action):
+        entry = self.data.get(symbol, {}).get(str(action))
+        return entry['stats'] if entry else {}
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(self.path.suffix + '.tmp')
+            tmp.write_text(json.dumps(self.data, indent=2), encoding='utf-8')
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"[filling cache] save failed: {e}")
+
+
+class MarketSnapshot:
+    """
+    نمای یک چرخه از terminal/account/positions/tick؛ هر بخش در اولین دسترسی یک بار
+    از MT5 خوانده می‌شود و تا باطل شدن snapshot (چرخه بعد یا سفارش خود ربات) ثابت می‌ماند.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.time = get_clock().time()
+        self._terminal = self._account = self._positions = self._tick = self._MISSING
+
+    @property
+    def terminal(self):
+        if self._terminal is self._MISSING:
+            self._terminal = mt5.terminal_info()
+        return self._terminal
+
+    @property
+    def account(self):
+        if self._account is self._MISSING:
+            self._account = mt5.account_info()
+        return self._account
+
+    @property
+    def positions(self):
+        """همه پوزیشن‌های باز نماد (tuple)"""
+        if self._positions is self._MISSING:
+            positions = mt5.positions_get(symbol=self.symbol)
+            self._positions = tuple(positions) if positions else ()
+        return self._positions
+
+    @property
+    def tick(self):
+        if self._tick is self._MISSING:
+            self._tick = mt5.symbol_info_tick(self.symbol)
+        return self._tick
+
+    def loaded_tick(self):
+        """tick اگر در همین snapshot خوانده شده باشد (بدون فراخوانی MT5)؛ در غیر این صورت None"""
+        return None if self._tick is self._MISSING else self._tick
+
+    def loaded_positions(self):
+        """پوزیشن‌ها اگر در همین snapshot خوانده شده باشند (بدون فراخوانی MT5)؛ در غیر این صورت None"""
+        return None if self._positions is self._MISSING else self._positions
+
+    def own_positions(self, magic):
+        """پوزیشن‌های باز شده توسط همین ربات (magic number)"""
+        return tuple(p for p in self.positions if p.magic == magic)
+
+
+class SymbolSpec:
+    """مشخصات ثابت نماد که از symbol_info خوانده و cache می‌شود"""
+
+    __slots__ = ('name', 'visible', 'digits', 'point', 'tick_size', 'tick_value',
+                 'volume_min', 'volume_max', 'volume_step', 'filling_mode')
+
+    def __init__(self, info, tick_size, tick_value):
+        self.name = info.name
+        self.visible = info.visible
+        self.digits = info.digits
+        self.point = info.point
+        self.tick_size = tick_size
+        self.tick_value = tick_value
+        self.volume_step = info.volume_step or 0.01
+        self.volume_min = info.volume_min or self.volume_step
+        self.volume_max = info.volume_max or 100.0
+        self.filling_mode = getattr(info, 'filling_mode', 0)
 
 class MT5ConnectorGold:
     def __init__(self):
@@ -18,33 +164,46 @@ class MT5ConnectorGold:
         self.trading_hours = cfg['trading_hours']
         self.iran_tz = pytz.timezone('Asia/Tehran')
         self.utc_tz = pytz.UTC
+        self._bar_buffers = {}  # (symbol, timeframe) -> BarBuffer
+        self.spec_ttl = cfg.get('symbol_spec_ttl', 300)
+        self._specs = {}  # symbol -> (SymbolSpec, زمان دریافت)
+        cache_file = cfg.get('filling_cache_file')
+        if cache_file and not os.path.isabs(cache_file):
+            cache_file = Path(__file__).resolve().parent / cache_file
+        self.filling_cache = FillingModeCache(cache_file)
+        self._snapshot = None
 
     def get_iran_time(self):
-        return datetime.now(self.utc_tz).astimezone(self.iran_tz)
+        return now(self.utc_tz).astimezone(self.iran_tz)
 
     def is_trading_time(self):
-        start = time.fromisoformat(self.trading_hours['start'])
-        end = time.fromisoformat(self.trading_hours['end'])
-        now_t = self.get_iran_time().time()
-        if start <= end:
-            return start <= now_t <= end
-        return now_t >= start or now_t <= end
+        return is_within_trading_hours(self.get_iran_time().time(), self.trading_hours)
 
     def check_weekend(self):
-        wd = self.get_iran_time().weekday()
-        return wd not in (5, 6)
+        return is_weekday(self.get_iran_time().weekday())
+
+    def snapshot(self):
+        """snapshot چرخه جاری (در صورت نبودن ساخته می‌شود)"""
+        if self._snapshot is None:
+            self._snapshot = MarketSnapshot(self.symbol)
+        return self._snapshot
+
+    def invalidate_snapshot(self):
+        """شروع چرخه جدید یا بعد از سفارش/تغییر SL خود ربات"""
+        self._snapshot = None
 
     def can_trade(self):
         if not self.check_weekend():
             return False, "Weekend - trading disabled"
         if not self.is_trading_time():
             return False, "Outside configured trading hours"
-        ti = mt5.terminal_info()
+        snap = self.snapshot()
+        ti = snap.terminal
         if not ti:
             return False, "Terminal info unavailable"
         if not ti.trade_allowed:
             return False, "Terminal AutoTrading disabled"
-        acc = mt5.account_info()
+        acc = snap.account
         if not acc:
             return False, "Account info unavailable"
         if acc.balance < self.min_balance:
@@ -63,6 +222,7 @@ class MT5ConnectorGold:
         return True
 
     def shutdown(self):
+        self.filling_cache.save()
         mt5.shutdown()
 
     def get_live_price(self):
@@ -81,22 +241,94 @@ class MT5ConnectorGold:
             'utc_time': utc_time
         }
 
+    def get_bars(self, timeframe=mt5.TIMEFRAME_M15, count=500):
+        """
+        آخرین count کندل به صورت view بدون کپی روی structured array خروجی MT5.
+        بار اول count کندل دریافت می‌شود؛ بعد از آن فقط کندل در حال شکل‌گیری و
+        کندل‌های جدیدتر با copy_rates_range گرفته و در BarBuffer به‌روز می‌شوند.
+        view تا فراخوانی بعدی معتبر است.
+        """
+        key = (self.symbol, timeframe)
+        buf = self._bar_buffers.get(key)
+        if buf is None or buf.capacity < count or not len(buf):
+            rates = mt5.copy_rates_from_pos(self.symbol, timeframe, 0, count)
+            if rates is None or len(rates) == 0:
+                return None
+            buf = BarBuffer(count, rates.dtype)
+            buf.append(rates)
+            self._bar_buffers[key] = buf
+        else:
+            date_from = datetime.fromtimestamp(buf.last_time, tz=self.utc_tz)
+            date_to = now(self.utc_tz) + timedelta(days=1)  # بیشتر از هر اختلاف ساعت سرور
+            rates = mt5.copy_rates_range(self.symbol, timeframe, date_from, date_to)
+            if rates is None:
+                return None
+            buf.append(rates)
+        return buf.view(count)
+
+    def get_bar_frame(self, timeframe=mt5.TIMEFRAME_M15, count=500):
+        """آخرین count کندل به صورت BarFrame (زمان‌ها برای لاگ در ساعت ایران)"""
+        rates = self.get_bars(timeframe, count)
+        if rates is None:
+            return None
+        return BarFrame.from_rates(rates, tz=self.iran_tz)
+
+    def get_ticks_since(self, time_msc, seen=0, count=100000):
+        """
+        همه tickهای از time_msc (میلی‌ثانیه زمان سرور) به بعد به صورت structured array
+        خروجی copy_ticks_from، بدون seen tick اول با همان time_msc که قبلا خوانده شده‌اند
+        (چند tick می‌توانند در یک میلی‌ثانیه و در دو خواندن پشت سر هم برسند)؛ None در صورت خطا
+        """
+        ticks = mt5.copy_ticks_from(self.symbol, int(time_msc // 1000), count, mt5.COPY_TICKS_ALL)
+        if ticks is None:
+            return None
+        times = ticks['time_msc']
+        first = int(times.searchsorted(time_msc, side='left'))
+        boundary = int(times.searchsorted(time_msc, side='right'))
+        return ticks[min(first + seen, boundary):]
+
     def get_historical_data(self, timeframe=mt5.TIMEFRAME_M15, count=500):
-        rates = mt5.copy_rates_from_pos(self.symbol, timeframe, 0, count)
+        rates = self.get_bars(timeframe, count)
         if rates is None:
             return None
-        df = pd.DataFrame(rates)
-        df['time'] = pd.to_datetime(df['time'], unit='s', utc=True).dt.tz_convert(self.iran_tz)
-        df.set_index('time', inplace=True)
-        df = df.rename(columns={'tick_volume': 'volume'})
+        index = pd.to_datetime(rates['time'], unit='s', utc=True).tz_convert(self.iran_tz).rename('time')
+        df = pd.DataFrame({
+            ('volume' if name == 'tick_volume' else name): rates[name]
+            for name in rates.dtype.names if name != 'time'
+        }, index=index)
         df['timestamp'] = df.index
         return df
 
-    def get_supported_filling_modes(self):
+    def get_symbol_spec(self, refresh=False):
+        """
+        مشخصات نماد از cache؛ بعد از spec_ttl ثانیه یا با refresh=True دوباره خوانده می‌شود.
+        اگر symbol_info در دسترس نباشد آخرین مقدار cache شده (در صورت وجود) برگردانده می‌شود.
+        """
+        entry = self._specs.get(self.symbol)
+        t = get_clock().monotonic()
+        if entry is not None and not refresh and t - entry[1] < self.spec_ttl:
+            return entry[0]
         info = mt5.symbol_info(self.symbol)
         if not info:
+            return entry[0] if entry else None
+        tick_size, tick_value = self._get_tick_specs(info)
+        spec = SymbolSpec(info, tick_size, tick_value)
+        self._specs[self.symbol] = (spec, t)
+        return spec
+
+    def invalidate_symbol_spec(self):
+        self._specs.pop(self.symbol, None)
+
+    def _check_result(self, res):
+        """بعد از خطاهای مربوط به مشخصات نماد، cache در درخواست بعدی دوباره خوانده شود"""
+        if res is not None and res.retcode in SPEC_RETCODES:
+            self.invalidate_symbol_spec()
+
+    def get_supported_filling_modes(self):
+        spec = self.get_symbol_spec()
+        if not spec:
             return []
-        fm = getattr(info, 'filling_mode', 0)
+        fm = spec.filling_mode
         modes = []
         for m in (mt5.ORDER_FILLING_IOC, mt5.ORDER_FILLING_FOK, mt5.ORDER_FILLING_RETURN):
             try:
@@ -107,45 +339,126 @@ class MT5ConnectorGold:
                     modes.append(m)
         return modes
 
-    def try_all_filling_modes(self, request):
-        tried = []
+    def _filling_mode_order(self, action):
+        """
+        ترتیب تلاش filling modeها: modeهای پشتیبانی شده، سپس auto (بدون type_filling)،
+        سپس بقیه modeها؛ آخرین mode پذیرفته شده برای این symbol/action اول امتحان می‌شود.
+        """
         modes = self.get_supported_filling_modes()
-
-        for m in modes:
-            req = dict(request)
-            req["type_filling"] = m
-            res = mt5.order_send(req)
-            tried.append((m, getattr(res, 'retcode', None)))
-            if res and res.retcode in (RET_OK, mt5.TRADE_RETCODE_PLACED):
-                return res
-
-        req = dict(request)
-        req.pop("type_filling", None)
-        res = mt5.order_send(req)
-        tried.append(("auto", getattr(res, 'retcode', None)))
-        if res and res.retcode in (RET_OK, mt5.TRADE_RETCODE_PLACED):
+        order = list(modes) + ["auto"]
+        order += [m for m in (mt5.ORDER_FILLING_IOC, mt5.ORDER_FILLING_FOK, mt5.ORDER_FILLING_RETURN)
+                  if m not in modes]
+        preferred = self.filling_cache.preferred(self.symbol, action)
+        if preferred in order:
+            order.remove(preferred)
+            order.insert(0, preferred)
+        return order
+
+    def _own_orders(self, action):
+        """پوزیشن‌ها (یا برای TRADE_ACTION_PENDING سفارش‌های pending) ربات روی این نماد: ticket -> شیء"""
+        if action == mt5.TRADE_ACTION_PENDING:
+            items = mt5.orders_get(symbol=self.symbol)
+        else:
+            items = mt5.positions_get(symbol=self.symbol)
+        if items is None:
+            return None
+        return {i.ticket: i for i in items if i.magic == self.magic}
+
+    def _send_marker(self):
+        """
+        وضعیت قبل از order_send فقط از snapshot فعلی (بدون فراخوانی MT5): (time_msc سرور
+        آخرین tick یا None، ticketهای پوزیشن‌های دیده شده). فقط اگر نتیجه نامعلوم بماند
+        در _resolve_unknown_outcome استفاده می‌شود.
+        """
+        snap = self._snapshot
+        if snap is None:
+            return None, frozenset()
+        tick = snap.loaded_tick()
+        since = (getattr(tick, 'time_msc', 0) or tick.time * 1000) if tick else None
+        return since, frozenset(p.ticket for p in snap.loaded_positions() or ())
+
+    @staticmethod
+    def _opened_msc(item):
+        """زمان باز شدن پوزیشن یا ثبت سفارش pending (میلی‌ثانیه زمان سرور)"""
+        return (getattr(item, 'time_setup_msc', 0) or getattr(item, 'time_msc', 0)
+                or (getattr(item, 'time_setup', 0) or getattr(item, 'time', 0)) * 1000)
+
+    def _resolve_unknown_outcome(self, request, res, marker):
+        """
+        بعد از OrderOutcomeUnknown (timeout یا قطع IPC وسط order_send) تلاش دیگری ارسال
+        نمی‌شود؛ اگر پوزیشن/سفارش ربات با همان type و comment که بعد از marker (_send_marker)
+        باز شده پیدا شود درخواست اجرا شده است و نتیجه‌ای مثل پذیرش برگردانده می‌شود، در غیر
+        این صورت همان نتیجه نامعلوم.
+        """
+        action = request.get("action")
+        pending = action == mt5.TRADE_ACTION_PENDING
+        print(f"⚠️ [order_send] {res.comment} - checking {'orders' if pending else 'positions'} before any retry")
+        # gateway تک thread است: این خواندن بعد از پایان order_send در حال اجرا انجام می‌شود
+        current = self._own_orders(action)
+        if current is None:
             return res
+        since, seen = marker
+        comment = request.get("comment") or ""
+        new = [
+            item for ticket, item in current.items()
+            if ticket not in seen and item.type == request.get("type")
+            # بروکر ممکن است comment را کوتاه کند
+            and comment.startswith(item.comment or "")
+            and (since is None or self._opened_msc(item) >= since)
+        ]
+        if not new:
+            print("⚠️ [order_send] no new position/order found; request treated as not executed")
+            return res
+        item = max(new, key=self._opened_msc)
+        print(f"✅ [order_send] request was executed: ticket {item.ticket}")
+        return SimpleNamespace(
+            retcode=mt5.TRADE_RETCODE_PLACED if pending else RET_OK, deal=0, order=item.ticket,
+            volume=getattr(item, 'volume_current', None) or getattr(item, 'volume', 0.0),
+            price=item.price_open, comment="executed (confirmed after unknown outcome)", request=request,
+        )
 
-        for m in (mt5.ORDER_FILLING_IOC, mt5.ORDER_FILLING_FOK, mt5.ORDER_FILLING_RETURN):
-            if m in modes:
-                continue
-            req = dict(request)
-            req["type_filling"] = m
-            res = mt5.order_send(req)
-            tried.append((m, getattr(res, 'retcode', None)))
-            if res and res.retcode in (RET_OK, mt5.TRADE_RETCODE_PLACED):
-                return res
+    def try_all_filling_modes(self, request):
+        action = request.get("action")
+        # وضعیت قبل از ارسال (از snapshot، بدون round-trip) برای درخواستی که نتیجه‌اش نامعلوم بماند
+        marker = self._send_marker()
+        self.invalidate_snapshot()
+        tried = []
+        res = None
+        changed = False
+        try:
+            for m in self._filling_mode_order(action):
+                req = dict(request)
+                if m == "auto":
+                    req.pop("type_filling", None)
+                else:
+                    req["type_filling"] = m
+                t0 = time.perf_counter()
+                res = mt5.order_send(req)
+                latency_ms = (time.perf_counter() - t0) * 1000.0
+                if is_unknown_outcome(res):
+                    # تلاش با mode بعدی ممکن است پوزیشن دوم باز کند
+                    return self._resolve_unknown_outcome(req, res, marker)
+                retcode = getattr(res, 'retcode', None)
+                accepted = bool(res) and retcode in (RET_OK, mt5.TRADE_RETCODE_PLACED)
+                changed |= self.filling_cache.record(self.symbol, action, m, retcode, latency_ms, accepted)
+                tried.append((m, retcode))
+                if accepted:
+                    return res
+        finally:
+            # فایل فقط با تغییر mode ترجیحی نوشته می‌شود (آمار در shutdown ذخیره می‌شود)
+            if changed:
+                self.filling_cache.save()
 
         print(f"[order_send] filling mode attempts: {tried}")
+        self._check_result(res)
         return res
 
     def calculate_valid_stops(self, entry_price, sl_price, tp_price, order_type):
-        info = mt5.symbol_info(self.symbol)
+        info = self.get_symbol_spec()
         if not info:
             print("Symbol info unavailable")
             return None, None
         
-        point = info.point
         min_distance = 0.5  # حداقل 0.5 دلار برای طلا
 
         if order_type == mt5.ORDER_TYPE_BUY and sl_price >= entry_price:
@@ -176,12 +489,12 @@ class MT5ConnectorGold:
         return norm(sl_price), norm(tp_price)
 
     def _normalize_volume(self, vol: float) -> float:
-        info = mt5.symbol_info(self.symbol)
+        info = self.get_symbol_spec()
         if not info:
             return vol
-        step = info.volume_step or 0.01
-        vmin = info.volume_min or step
-        vmax = info.volume_max or 100.0
+        step = info.volume_step
+        vmin = info.volume_min
+        vmax = info.volume_max
         steps = round(vol / step)
         vol_rounded = steps * step
         return max(vmin, min(vmax, vol_rounded))
@@ -196,12 +509,12 @@ class MT5ConnectorGold:
         return tick_size, tick_value
 
     def calculate_volume_by_risk(self, entry: float, sl: float, tick, risk_pct: float = 0.01) -> float:
-        acc = mt5.account_info()
-        info = mt5.symbol_info(self.symbol)
+        acc = self.snapshot().account
+        info = self.get_symbol_spec()
         if not acc or not info:
             return self.lot
 
-        tick_size, tick_value = self._get_tick_specs(info)
+        tick_size, tick_value = info.tick_size, info.tick_value
         if not tick_size or not tick_value:
             return self.lot
 
@@ -290,7 +603,7 @@ class MT5ConnectorGold:
         return result
 
     def get_positions(self):
-        return mt5.positions_get(symbol=self.symbol)
+        return self.snapshot().positions
 
     def modify_sl_tp(self, ticket: int, new_sl=None, new_tp=None):
         req = {
@@ -303,10 +616,76 @@ class MT5ConnectorGold:
         if new_tp is not None:
             req["tp"] = new_tp
         res = mt5.order_send(req)
+        self.invalidate_snapshot()
+        self._check_result(res)
+        return res
+
+    # --- سفارش‌های pending (ورود limit) ---
+    def get_pending_orders(self):
+        orders = mt5.orders_get(symbol=self.symbol)
+        if orders is None:
+            return None
+        return [o for o in orders if o.magic == self.magic]
+
+    def place_limit_order(self, is_buy, price, sl, tp=None, comment="", volume=None, risk_pct=None):
+        tick = self.snapshot().tick
+        if not tick:
+            print("No tick data")
+            return None
+        order_type = mt5.ORDER_TYPE_BUY if is_buy else mt5.ORDER_TYPE_SELL
+        sl_adj, tp_adj = self.calculate_valid_stops(price, sl, tp, order_type)
+        if sl_adj is None:
+            return None
+        info = self.get_symbol_spec()
+        price = round(price, info.digits) if info else price
+        vol = self._resolve_volume(volume, price, sl_adj, tick, risk_pct)
+        request = {
+            "action": mt5.TRADE_ACTION_PENDING,
+            "symbol": self.symbol,
+            "volume": vol,
+            "type": mt5.ORDER_TYPE_BUY_LIMIT if is_buy else mt5.ORDER_TYPE_SELL_LIMIT,
+            "price": price,
+            "sl": sl_adj,
+            "magic": self.magic,
+            "comment": comment,
+            "type_time": mt5.ORDER_TIME_GTC,
+            # سفارش pending فقط یک بار ارسال می‌شود (چرخش filling modeها ممکن است آن را دوباره بفرستد)
+            "type_filling": mt5.ORDER_FILLING_RETURN,
+        }
+        if tp_adj is not None:
+            request["tp"] = tp_adj
+        print(f"📤 {'BUY' if is_buy else 'SELL'} LIMIT {self.symbol} @ {price} VOL={vol} SL={sl_adj} TP={tp_adj if tp_adj else 'None'}")
+        marker = self._send_marker()
+        res = mt5.order_send(request)
+        if is_unknown_outcome(res):
+            return self._resolve_unknown_outcome(request, res, marker)
+        self._check_result(res)
+        return res
+
+    def modify_pending_order(self, ticket: int, price, sl, tp=None):
+        info = self.get_symbol_spec()
+        digits = info.digits if info else 2
+        req = {
+            "action": mt5.TRADE_ACTION_MODIFY,
+            "order": ticket,
+            "symbol": self.symbol,
+            "price": round(price, digits),
+            "sl": round(sl, digits),
+            "type_time": mt5.ORDER_TIME_GTC,
+        }
+        if tp is not None:
+            req["tp"] = round(tp, digits)
+        res = mt5.order_send(req)
+        self._check_result(res)
+        return res
+
+    def cancel_pending_order(self, ticket: int):
+        res = mt5.order_send({"action": mt5.TRADE_ACTION_REMOVE, "order": ticket, "symbol": self.symbol})
+        self._check_result(res)
         return res
 
     def check_symbol_properties(self):
-        info = mt5.symbol_info(self.symbol)
+        info = self.get_symbol_spec(refresh=True)
         if not info:
             print("Symbol info not found")
             return
@@ -314,7 +693,7 @@ class MT5ConnectorGold:
             mt5.symbol_select(self.symbol, True)
 
     def test_filling_modes(self):
-        info = mt5.symbol_info(self.symbol)
+        info = self.get_symbol_spec()
         if not info:
             print("Symbol info not available")
             return None
@@ -0,0 +1,254 @@
+"""
+Gateway ماژول MetaTrader5 روی یک thread اختصاصی
+
+API پایتون MetaTrader5 یک کلاینت IPC سراسری و blocking است؛ اگر چند thread همزمان
+از آن استفاده کنند اتصال ترمینال خراب می‌شود. MT5Gateway همه فراخوانی‌های mt5.* را
+روی یک thread اجرا می‌کند و Future برمی‌گرداند:
+
+- درخواست‌های خواندنی یکسان (مثلا چند مصرف‌کننده symbol_info_tick) که در صف یا در
+  حال اجرا هستند یا در coalesce_window ثانیه اخیر (ساعت clock_gold) تمام شده‌اند یک بار
+  اجرا می‌شوند؛ هر فراخوانی غیرخواندنی نتایج اخیر را باطل می‌کند.
+- هر فراخوانی timeout دارد (خواندن: timeout، سفارش: order_timeout) و در صورت
+  تمام شدن زمان None برمی‌گرداند (مثل خطای خود MT5). فراخوانی در thread ادامه پیدا می‌کند.
+- بعد از خطای IPC (اتصال قطع یا initialize ناموفق) initialize با همان آرگومان‌ها
+  دوباره اجرا و فراخوانی خواندنی یک بار تکرار می‌شود (حداکثر هر reinit_interval ثانیه).
+- order_send هیچ‌وقت تکرار نمی‌شود: اگر timeout شود یا وسط آن اتصال قطع شود ممکن است
+  سفارش به بروکر رسیده باشد، پس به جای None یک OrderOutcomeUnknown (retcode
+  RETCODE_UNKNOWN_OUTCOME) برگردانده می‌شود و فراخوان باید پوزیشن‌ها/سفارش‌ها را بررسی کند.
+
+ماژول‌های ربات به جای import MetaTrader5 از پروکسی همین ماژول استفاده می‌کنند:
+
+    from mt5_gateway_gold import mt5
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import MetaTrader5 as _mt5
+
+from clock_gold import get_clock
+from metatrader5_config_gold import MT5_GATEWAY_CONFIG
+
+# فراخوانی‌های بدون اثر جانبی که قابل ادغام هستند
+READ_CALLS = frozenset({
+    'terminal_info', 'account_info', 'symbol_info', 'symbol_info_tick', 'positions_get',
+    'positions_total', 'orders_get', 'orders_total', 'copy_rates_from_pos', 'copy_rates_from',
+    'copy_rates_range', 'copy_ticks_from', 'copy_ticks_range', 'history_orders_get', 'history_deals_get',
+    'version',
+})
+# فراخوانی‌هایی که ممکن است اثر معاملاتی داشته باشند (timeout طولانی‌تر)
+ORDER_CALLS = frozenset({'order_send'})
+
+# کدهای last_error مربوط به قطع ارتباط IPC با ترمینال
+IPC_ERRORS = frozenset({-10001, -10002, -10003, -10004, -10005})
+
+# retcode نتیجه order_send با وضعیت نامعلوم (کدهای MT5 همه مثبت هستند)
+RETCODE_UNKNOWN_OUTCOME = -1
+
+_STOP = object()
+
+
+class OrderOutcomeUnknown:
+    """نتیجه order_send وقتی معلوم نیست درخواست به بروکر رسیده یا نه (timeout یا قطع IPC)"""
+
+    __slots__ = ('request', 'comment', 'retcode', 'order', 'deal', 'volume', 'price')
+
+    def __init__(self, request, comment):
+        self.request = request
+        self.comment = comment
+        self.retcode = RETCODE_UNKNOWN_OUTCOME
+        self.order = self.deal = 0
+        self.volume = self.price = 0.0
+
+    def __repr__(self):
+        return f"OrderOutcomeUnknown({self.comment!r})"
+
+
+def is_unknown_outcome(result):
+    return getattr(result, 'retcode', None) == RETCODE_UNKNOWN_OUTCOME
+
+
+class MT5Gateway:
+    """اجرای همه فراخوانی‌های MetaTrader5 روی یک thread با ادغام، timeout و اتصال مجدد"""
+
+    def __init__(self, module=None, timeout=None, order_timeout=None, coalesce_window=None,
+                 reinit_interval=None):
+        cfg = MT5_GATEWAY_CONFIG
+        self.module = module or _mt5
+        self.timeout = timeout or cfg['timeout']
+        self.order_timeout = order_timeout or cfg['order_timeout']
+        self.coalesce_window = cfg['coalesce_window'] if coalesce_window is None else coalesce_window
+        self.reinit_interval = cfg['reinit_interval'] if reinit_interval is None else reinit_interval
+        self.stats = Counter()
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._pending = {}  # key -> Future (در صف یا در حال اجرا)
+        self._recent = {}   # key -> (زمان پایان، نتیجه)
+        self._thread = None
+        self._init_call = None
+        self._last_reinit = float('-inf')
+
+    # --- چرخه عمر thread ---
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='mt5-gateway', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+        self._thread = None
+
+    @property
+    def on_gateway_thread(self):
+        return threading.current_thread() is self._thread
+
+    # --- ارسال درخواست ---
+    def submit(self, name, *args, **kwargs):
+        """ارسال فراخوانی mt5.<name> و برگرداندن Future"""
+        if name in READ_CALLS:
+            key = (name, args, tuple(sorted(kwargs.items())))
+            with self._lock:
+                future = self._pending.get(key)
+                if future is not None:
+                    self.stats['coalesced'] += 1
+                    return future
+                recent = self._recent.get(key)
+                if recent is not None and get_clock().monotonic() - recent[0] <= self.coalesce_window:
+                    self.stats['coalesced'] += 1
+                    future = Future()
+                    future.set_result(recent[1])
+                    return future
+                future = Future()
+                self._pending[key] = future
+        else:
+            key = None
+            future = Future()
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        self._queue.put((future, key, name, args, kwargs))
+        return future
+
+    def call(self, name, *args, **kwargs):
+        """
+        فراخوانی blocking با timeout؛ در صورت timeout مثل خطای MT5 مقدار None برمی‌گردد
+        (برای order_send یک OrderOutcomeUnknown چون سفارش هنوز روی thread در حال اجراست)
+        """
+        if self.on_gateway_thread:
+            return self._execute(name, args, kwargs)
+        future = self.submit(name, *args, **kwargs)
+        timeout = self.order_timeout if name in ORDER_CALLS else self.timeout
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            with self._lock:
+                self.stats['timeouts'] += 1
+                if name in ORDER_CALLS:
+                    self._recent.clear()  # خواندن‌های بعدی باید بعد از همین سفارش اجرا شوند
+            print(f"[mt5 gateway] {name} timed out after {timeout}s")
+            if name in ORDER_CALLS:
+                return OrderOutcomeUnknown(args[0] if args else kwargs.get('request'),
+                                           f"{name} timed out after {timeout}s")
+            return None
+
+    async def acall(self, name, *args, **kwargs):
+        """نسخه async برای مصرف‌کننده‌های asyncio"""
+        return await asyncio.wrap_future(self.submit(name, *args, **kwargs))
+
+    # --- thread اجرا ---
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            future, key, name, args, kwargs = item
+            try:
+                result = self._execute(name, args, kwargs)
+            except BaseException as e:
+                with self._lock:
+                    self._pending.pop(key, None)
+                future.set_exception(e)
+                continue
+            with self._lock:
+                if key is None:
+                    # بعد از هر فراخوانی غیرخواندنی (مثلا order_send) نتایج قبلی معتبر نیستند
+                    self._recent.clear()
+                else:
+                    self._pending.pop(key, None)
+                    if len(self._recent) > 256:
+                        self._recent.clear()
+                    self._recent[key] = (get_clock().monotonic(), result)
+            future.set_result(result)
+
+    def _execute(self, name, args, kwargs):
+        with self._lock:
+            self.stats[name] += 1
+        func = getattr(self.module, name)
+        if name == 'initialize':
+            self._init_call = (args, kwargs)
+            return func(*args, **kwargs)
+        result = func(*args, **kwargs)
+        if result is None:
+            error = self.module.last_error()
+            if error and error[0] in IPC_ERRORS:
+                reconnected = self._reinitialize(error)
+                if name in ORDER_CALLS:
+                    # ممکن است درخواست قبل از قطع اتصال به بروکر رسیده باشد؛ تکرار = سفارش دوم
+                    # (چه اتصال مجدد موفق باشد، چه محدود شده با reinit_interval یا ناموفق)
+                    return OrderOutcomeUnknown(args[0] if args else kwargs.get('request'),
+                                               f"{name} interrupted by IPC error {error[0]}")
+                if reconnected:
+                    result = func(*args, **kwargs)
+        return result
+
+    def _reinitialize(self, error):
+        """اتصال مجدد به ترمینال بعد از خطای IPC (با همان آرگومان‌های initialize)"""
+        if self._init_call is None:
+            return False
+        now = time.monotonic()
+        if now - self._last_reinit < self.reinit_interval:
+            return False
+        self._last_reinit = now
+        with self._lock:
+            self.stats['reinitialize'] += 1
+        args, kwargs = self._init_call
+        self.module.shutdown()
+        ok = bool(self.module.initialize(*args, **kwargs))
+        print(f"[mt5 gateway] reinitialize after IPC error {error}: {'ok' if ok else 'failed'}")
+        return ok
+
+
+class MT5Proxy:
+    """جایگزین ماژول MetaTrader5: ثابت‌ها مستقیم و توابع از طریق gateway"""
+
+    def __init__(self, gateway):
+        self._gateway = gateway
+
+    @property
+    def gateway(self):
+        return self._gateway
+
+    def __getattr__(self, name):
+        value = getattr(self._gateway.module, name)
+        if callable(value) and not isinstance(value, type):
+            gateway = self._gateway
+
+            def call(*args, **kwargs):
+                return gateway.call(name, *args, **kwargs)
+
+            call.__name__ = name
+            setattr(self, name, call)
+            return call
+        return value
+
+
+gateway = MT5Gateway()
+mt5 = MT5Proxy(gateway)
@@ -0,0 +1,863 @@
+"""
+شبیه‌ساز محلی ماژول MetaTrader5 به همراه بروکر با موتور تطبیق سفارش
+
+با install() این ماژول به جای MetaTrader5 در sys.modules ثبت می‌شود، بنابراین
+main_metatrader_gold و MT5ConnectorGold بدون ترمینال ویندوز (مثلا روی CI) اجرا می‌شوند.
+install باید قبل از import کردن ماژول‌های ربات صدا زده شود (مقادیر پیش‌فرض مثل
+mt5.TIMEFRAME_M15 هنگام import خوانده می‌شوند):
+
+    import mt5_sim_gold
+    broker = mt5_sim_gold.install(mt5_sim_gold.SimBroker.from_file('data/XAUUSD_M15.csv'))
+    import main_metatrader_gold
+
+داده بازار از کندل‌ها (مسیر O -> L/H -> H/L -> C با چهار tick در هر کندل) یا از
+فایل tick با ستون‌های time/bid/ask ساخته می‌شود. زمان فقط با broker.advance()
+و broker.advance_to() جلو می‌رود؛ در هر tick جدید سفارش‌های pending (limit/stop) و
+SL/TP پوزیشن‌ها بررسی می‌شوند.
+مقادیر ثابت‌ها و retcodeها همان مقادیر ماژول اصلی MetaTrader5 هستند.
+
+برای اجرای حلقه زنده روی داده ضبط شده ساعت شبیه‌سازی شده را هم نصب کنید:
+
+    clock_gold.set_clock(mt5_sim_gold.simulated_clock(broker))
+    main_metatrader_gold.main()
+"""
+
+import sys
+import time as _time
+from collections import Counter, namedtuple
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+# --- ثابت‌های MetaTrader5 ---
+TIMEFRAME_M1 = 1
+TIMEFRAME_M5 = 5
+TIMEFRAME_M15 = 15
+TIMEFRAME_M30 = 30
+TIMEFRAME_H1 = 16385
+TIMEFRAME_H4 = 16388
+TIMEFRAME_D1 = 16408
+TIMEFRAME_SECONDS = {
+    TIMEFRAME_M1: 60, TIMEFRAME_M5: 300, TIMEFRAME_M15: 900, TIMEFRAME_M30: 1800,
+    TIMEFRAME_H1: 3600, TIMEFRAME_H4: 14400, TIMEFRAME_D1: 86400,
+}
+
+ORDER_TYPE_BUY = 0
+ORDER_TYPE_SELL = 1
+ORDER_TYPE_BUY_LIMIT = 2
+ORDER_TYPE_SELL_LIMIT = 3
+ORDER_TYPE_BUY_STOP = 4
+ORDER_TYPE_SELL_STOP = 5
+
+POSITION_TYPE_BUY = 0
+POSITION_TYPE_SELL = 1
+
+TRADE_ACTION_DEAL = 1
+TRADE_ACTION_PENDING = 5
+TRADE_ACTION_SLTP = 6
+TRADE_ACTION_MODIFY = 7
+TRADE_ACTION_REMOVE = 8
+
+ORDER_FILLING_FOK = 0
+ORDER_FILLING_IOC = 1
+ORDER_FILLING_RETURN = 2
+
+# بیت‌های symbol_info().filling_mode
+SYMBOL_FILLING_FOK = 1
+SYMBOL_FILLING_IOC = 2
+
+ORDER_TIME_GTC = 0
+
+COPY_TICKS_ALL = -1
+COPY_TICKS_INFO = 1
+COPY_TICKS_TRADE = 2
+
+ORDER_STATE_PLACED = 1
+ORDER_STATE_CANCELED = 2
+ORDER_STATE_FILLED = 4
+ORDER_STATE_REJECTED = 5
+
+TRADE_RETCODE_REQUOTE = 10004
+TRADE_RETCODE_REJECT = 10006
+TRADE_RETCODE_PLACED = 10008
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_INVALID = 10013
+TRADE_RETCODE_INVALID_VOLUME = 10014
+TRADE_RETCODE_INVALID_PRICE = 10015
+TRADE_RETCODE_INVALID_STOPS = 10016
+TRADE_RETCODE_MARKET_CLOSED = 10018
+TRADE_RETCODE_NO_MONEY = 10019
+TRADE_RETCODE_NO_CHANGES = 10025
+TRADE_RETCODE_INVALID_FILL = 10030
+TRADE_RETCODE_INVALID_ORDER = 10035
+TRADE_RETCODE_POSITION_CLOSED = 10036
+
+RES_S_OK = 1
+RES_E_INVALID_PARAMS = -2
+RES_E_NOT_FOUND = -4
+RES_E_INTERNAL_FAIL_INIT = -10005
+
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8'),
+])
+
+TICKS_DTYPE = np.dtype([
+    ('time', '<i8'), ('bid', '<f8'), ('ask', '<f8'), ('last', '<f8'), ('volume', '<u8'),
+    ('time_msc', '<i8'), ('flags', '<u4'), ('volume_real', '<f8'),
+])
+
+# --- ساختارهای خروجی (مثل namedtuple های ماژول اصلی) ---
+Tick = namedtuple('Tick', 'time bid ask last volume time_msc flags volume_real')
+SymbolInfo = namedtuple('SymbolInfo', (
+    'name visible select digits point spread trade_stops_level trade_freeze_level '
+    'trade_tick_size trade_tick_value trade_contract_size volume_min volume_max volume_step '
+    'filling_mode bid ask time'
+))
+AccountInfo = namedtuple('AccountInfo', (
+    'login balance equity profit margin margin_free leverage currency trade_allowed'
+))
+TerminalInfo = namedtuple('TerminalInfo', 'connected trade_allowed ping_last name')
+TradePosition = namedtuple('TradePosition', (
+    'ticket time time_msc time_update type magic identifier volume price_open sl tp '
+    'price_current swap profit symbol comment'
+))
+TradeOrder = namedtuple('TradeOrder', (
+    'ticket time_setup time_setup_msc type type_time type_filling state magic volume_initial '
+    'volume_current price_open sl tp price_current symbol comment'
+))
+OrderSendResult = namedtuple('OrderSendResult', (
+    'retcode deal order volume price bid ask comment request_id retcode_external request'
+))
+
+
+class SimPosition:
+    """پوزیشن باز در بروکر شبیه‌سازی شده"""
+
+    __slots__ = ('ticket', 'time', 'type', 'magic', 'volume', 'price_open', 'sl', 'tp',
+                 'price_current', 'profit', 'symbol', 'comment', 'time_update')
+
+    def __init__(self, ticket, time, type_, magic, volume, price_open, sl, tp, symbol, comment):
+        self.ticket = ticket
+        self.time = time
+        self.type = type_
+        self.magic = magic
+        self.volume = volume
+        self.price_open = price_open
+        self.sl = sl
+        self.tp = tp
+        self.price_current = price_open
+        self.profit = 0.0
+        self.symbol = symbol
+        self.comment = comment
+        self.time_update = time
+
+    def as_tuple(self):
+        return TradePosition(
+            self.ticket, self.time, self.time * 1000, self.time_update, self.type, self.magic,
+            self.ticket, self.volume, self.price_open, self.sl, self.tp, self.price_current,
+            0.0, self.profit, self.symbol, self.comment,
+        )
+
+
+class SimOrder:
+    """سفارش pending (limit/stop) در بروکر شبیه‌سازی شده"""
+
+    __slots__ = ('ticket', 'time_setup', 'type', 'type_time', 'type_filling', 'magic', 'volume',
+                 'price_open', 'sl', 'tp', 'price_current', 'symbol', 'comment', 'state')
+
+    def __init__(self, ticket, time_setup, type_, type_time, type_filling, magic, volume, price_open,
+                 sl, tp, price_current, symbol, comment):
+        self.ticket = ticket
+        self.time_setup = time_setup
+        self.type = type_
+        self.type_time = type_time
+        self.type_filling = type_filling
+        self.magic = magic
+        self.volume = volume
+        self.price_open = price_open
+        self.sl = sl
+        self.tp = tp
+        self.price_current = price_current
+        self.symbol = symbol
+        self.comment = comment
+        self.state = ORDER_STATE_PLACED
+
+    @property
+    def is_buy(self):
+        return self.type in (ORDER_TYPE_BUY_LIMIT, ORDER_TYPE_BUY_STOP)
+
+    def as_tuple(self):
+        return TradeOrder(
+            self.ticket, self.time_setup, self.time_setup * 1000, self.type, self.type_time,
+            self.type_filling, self.state, self.magic, self.volume, self.volume,
+            self.price_open, self.sl, self.tp, self.price_current, self.symbol, self.comment,
+        )
+
+
+def _epoch(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return int(value)
+
+
+def ticks_from_bars(times, open_, high, low, close, timeframe_seconds):
+    """
+    چهار tick برای هر کندل: O، سپس L و H (کندل صعودی) یا H و L (کندل نزولی)، سپس C.
+    خروجی (tick_times, tick_prices) به ترتیب زمانی.
+    """
+    times = np.asarray(times, dtype=np.int64)
+    o = np.asarray(open_, dtype=np.float64)
+    h = np.asarray(high, dtype=np.float64)
+    l = np.asarray(low, dtype=np.float64)
+    c = np.asarray(close, dtype=np.float64)
+    bullish = c >= o
+    prices = np.empty((len(c), 4), dtype=np.float64)
+    prices[:, 0] = o
+    prices[:, 1] = np.where(bullish, l, h)
+    prices[:, 2] = np.where(bullish, h, l)
+    prices[:, 3] = c
+    offsets = np.array([0, timeframe_seconds // 3, 2 * timeframe_seconds // 3, timeframe_seconds - 1],
+                       dtype=np.int64)
+    tick_times = (times[:, None] + offsets[None, :]).ravel()
+    return tick_times, prices.ravel()
+
+
+class SimBroker:
+    """
+    بروکر شبیه‌سازی شده: پخش tick، ساخت کندل‌ها، اجرای سفارش و بررسی SL/TP
+
+    bid همان قیمت داده است و ask = bid + spread. اگر tick از SL عبور کند (gap)
+    پوزیشن با قیمت همان tick بسته می‌شود.
+    """
+
+    def __init__(self, tick_times, bids, asks=None, symbol='XAUUSD', timeframe=TIMEFRAME_M15,
+                 balance=10000.0, spread=0.30, digits=2, contract_size=100.0, leverage=100,
+                 volume_min=0.01, volume_max=100.0, volume_step=0.01,
+                 filling_mode=SYMBOL_FILLING_FOK | SYMBOL_FILLING_IOC, stops_level=0,
+                 slippage=0.0, latency=0.0, start_tick=0, login=1000001):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.tf_seconds = TIMEFRAME_SECONDS[timeframe]
+        self.digits = digits
+        self.point = 10.0 ** -digits
+        self.spread = spread
+        self.contract_size = contract_size
+        self.leverage = leverage
+        self.volume_min = volume_min
+        self.volume_max = volume_max
+        self.volume_step = volume_step
+        self.filling_mode = filling_mode
+        self.stops_level = stops_level
+        self.slippage = slippage
+        self.latency = latency
+        self.login = login
+        self.trade_allowed = True
+        self.connected = False
+
+        self.tick_times = np.asarray(tick_times, dtype=np.int64)
+        self.bids = np.asarray(bids, dtype=np.float64)
+        self.asks = self.bids + spread if asks is None else np.asarray(asks, dtype=np.float64)
+
+        # کندل کامل هر tick و آرایه کندل‌ها (OHLC بر اساس bid مثل MT5)
+        bar_times = self.tick_times - self.tick_times % self.tf_seconds
+        starts = np.flatnonzero(np.r_[True, bar_times[1:] != bar_times[:-1]])
+        self.tick_bar = np.cumsum(np.r_[False, bar_times[1:] != bar_times[:-1]])
+        self.bar_start_tick = starts
+        rates = np.zeros(len(starts), dtype=RATES_DTYPE)
+        rates['time'] = bar_times[starts]
+        rates['open'] = self.bids[starts]
+        rates['high'] = np.maximum.reduceat(self.bids, starts)
+        rates['low'] = np.minimum.reduceat(self.bids, starts)
+        rates['close'] = self.bids[np.r_[starts[1:] - 1, len(self.bids) - 1]]
+        rates['tick_volume'] = np.diff(np.r_[starts, len(self.bids)])
+        rates['spread'] = np.round(np.maximum.reduceat(self.asks - self.bids, starts) / self.point)
+        self.rates = rates
+
+        self.balance = float(balance)
+        self.positions = []
+        self.orders = []
+        self.order_history = []  # سفارش‌های pending فعال شده یا حذف شده
+        self.deals = []
+        self.calls = Counter()
+        self.error = (RES_S_OK, 'Success')
+        # listener(broker) بعد از هر tick پخش شده (مثلا TrailingEngine.poll در شبیه‌سازی)
+        self.tick_listeners = []
+        self._next_ticket = 100000
+        self._tick = -1
+        self._bar_high = self._bar_low = 0.0
+        self.advance(start_tick + 1)
+
+    @classmethod
+    def from_bars(cls, data, **kwargs):
+        """ساخت بروکر از DataFrame کندل‌ها (index زمانی، ستون‌های open/high/low/close)"""
+        timeframe = kwargs.get('timeframe', TIMEFRAME_M15)
+        times = data.index.as_unit('s').asi8 if isinstance(data.index, pd.DatetimeIndex) else np.asarray(data.index)
+        tick_times, prices = ticks_from_bars(
+            times, data['open'].to_numpy(), data['high'].to_numpy(), data['low'].to_numpy(),
+            data['close'].to_numpy(), TIMEFRAME_SECONDS[timeframe],
+        )
+        return cls(tick_times, prices, **kwargs)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """فایل کندل (خروجی MT5 یا ستون time) یا فایل tick با ستون‌های time/bid/ask"""
+        with open(path, encoding='utf-8') as f:
+            header = f.readline().lower()
+        if 'bid' in header:
+            ticks = pd.read_csv(path, sep='\t' if '\t' in header else ',')
+            ticks.columns = [col.strip().strip('<>').lower() for col in ticks.columns]
+            times = ticks['time']
+            if not pd.api.types.is_numeric_dtype(times):
+                times = pd.DatetimeIndex(pd.to_datetime(times, utc=True)).as_unit('s').asi8
+            asks = ticks['ask'].to_numpy() if 'ask' in ticks else None
+            return cls(np.asarray(times, dtype=np.int64), ticks['bid'].to_numpy(), asks, **kwargs)
+        from backtest_gold import load_bars
+        return cls.from_bars(load_bars(path), **kwargs)
+
+    # --- پخش زمان ---
+    @property
+    def now(self):
+        """زمان tick فعلی (epoch ثانیه، زمان سرور)"""
+        return int(self.tick_times[self._tick])
+
+    @property
+    def finished(self):
+        return self._tick >= len(self.tick_times) - 1
+
+    def advance(self, n=1):
+        """جلو رفتن n tick؛ در هر tick SL/TP بررسی می‌شود. خروجی False یعنی پایان داده"""
+        for _ in range(n):
+            if self.finished:
+                return False
+            self._tick += 1
+            i = self._tick
+            bid = float(self.bids[i])
+            if i == self.bar_start_tick[self.tick_bar[i]]:
+                self._bar_high = self._bar_low = bid
+            elif bid > self._bar_high:
+                self._bar_high = bid
+            elif bid < self._bar_low:
+                self._bar_low = bid
+            if self.orders:
+                self._trigger(bid, float(self.asks[i]))
+            if self.positions:
+                self._match(bid, float(self.asks[i]))
+            for listener in self.tick_listeners:
+                listener(self)
+        return True
+
+    def advance_to(self, when):
+        """پخش همه tickها تا زمان when (datetime یا epoch)"""
+        target = _epoch(when)
+        last = int(np.searchsorted(self.tick_times, target, side='right')) - 1
+        if last > self._tick:
+            return self.advance(last - self._tick)
+        return not self.finished
+
+    def _trigger(self, bid, ask):
+        """فعال شدن سفارش‌های pending: limit با قیمت سفارش یا بهتر، stop با قیمت بازار"""
+        for order in list(self.orders):
+            order.price_current = ask if order.is_buy else bid
+            if order.type == ORDER_TYPE_BUY_LIMIT and ask <= order.price_open:
+                price = ask
+            elif order.type == ORDER_TYPE_SELL_LIMIT and bid >= order.price_open:
+                price = bid
+            elif order.type == ORDER_TYPE_BUY_STOP and ask >= order.price_open:
+                price = ask + self.slippage
+            elif order.type == ORDER_TYPE_SELL_STOP and bid <= order.price_open:
+                price = bid - self.slippage
+            else:
+                continue
+            self.orders.remove(order)
+            self.order_history.append(order)
+            margin = order.volume * self.contract_size * price / self.leverage
+            if margin > self.account_info().margin_free:
+                order.state = ORDER_STATE_REJECTED  # مثل MT5: سفارش به خاطر کمبود margin لغو می‌شود
+                continue
+            order.state = ORDER_STATE_FILLED
+            # تیکت پوزیشن همان تیکت سفارش باز کننده است
+            pos = SimPosition(order.ticket, self.now, POSITION_TYPE_BUY if order.is_buy else POSITION_TYPE_SELL,
+                              order.magic, order.volume, price, order.sl, order.tp, self.symbol, order.comment)
+            self.positions.append(pos)
+
+    def _match(self, bid, ask):
+        """بستن پوزیشن‌هایی که SL یا TP آن‌ها در tick فعلی لمس شده"""
+        for pos in list(self.positions):
+            if pos.type == POSITION_TYPE_BUY:
+                hit_sl = pos.sl and bid <= pos.sl
+                hit_tp = pos.tp and bid >= pos.tp
+                price = bid
+            else:
+                hit_sl = pos.sl and ask >= pos.sl
+                hit_tp = pos.tp and ask <= pos.tp
+                price = ask
+            if hit_sl or hit_tp:
+                self._close(pos, price, 'sl' if hit_sl else 'tp')
+            else:
+                pos.price_current = price
+                pos.profit = self._profit(pos, price)
+
+    def _profit(self, pos, price):
+        sign = 1.0 if pos.type == POSITION_TYPE_BUY else -1.0
+        return round(sign * (price - pos.price_open) * pos.volume * self.contract_size, 2)
+
+    def _close(self, pos, price, reason):
+        profit = self._profit(pos, price)
+        self.balance += profit
+        self.positions.remove(pos)
+        self.deals.append({
+            'ticket': pos.ticket, 'type': pos.type, 'volume': pos.volume,
+            'open_time': pos.time, 'price_open': pos.price_open, 'close_time': self.now, 'price_close': price, 'sl': pos.sl, 'tp': pos.tp,
+            'profit': profit, 'reason': reason, 'magic': pos.magic,
+        })
+
+    # --- داده بازار ---
+    def tick(self):
+        i = self._tick
+        bid, ask = float(self.bids[i]), float(self.asks[i])
+        t = int(self.tick_times[i])
+        return Tick(t, bid, ask, bid, 0, t * 1000, 6, 0.0)
+
+    def _rates_slice(self, first, last):
+        """کندل‌های first..last (شامل)؛ کندل در حال شکل‌گیری با tickهای پخش شده تا الان"""
+        current = int(self.tick_bar[self._tick])
+        last = min(last, current)
+        first = max(first, 0)
+        if first > last:
+            return np.zeros(0, dtype=RATES_DTYPE)
+        out = self.rates[first:last + 1].copy()
+        if last == current:
+            row = out[-1]
+            row['high'] = self._bar_high
+            row['low'] = self._bar_low
+            row['close'] = self.bids[self._tick]
+            row['tick_volume'] = self._tick - self.bar_start_tick[current] + 1
+        return out
+
+    def copy_rates_from_pos(self, start_pos, count):
+        current = int(self.tick_bar[self._tick])
+        last = current - start_pos
+        return self._rates_slice(last - count + 1, last)
+
+    def copy_rates_from(self, date_from, count):
+        last = int(np.searchsorted(self.rates['time'], _epoch(date_from), side='right')) - 1
+        return self._rates_slice(last - count + 1, last)
+
+    def copy_rates_range(self, date_from, date_to):
+        first = int(np.searchsorted(self.rates['time'], _epoch(date_from), side='left'))
+        last = int(np.searchsorted(self.rates['time'], _epoch(date_to), side='right')) - 1
+        return self._rates_slice(first, last)
+
+    def _ticks_slice(self, first, last):
+        """tickهای first..last (شامل) که تا الان پخش شده‌اند"""
+        last = min(last, self._tick)
+        first = max(first, 0)
+        if first > last:
+            return np.zeros(0, dtype=TICKS_DTYPE)
+        out = np.zeros(last - first + 1, dtype=TICKS_DTYPE)
+        out['time'] = self.tick_times[first:last + 1]
+        out['bid'] = self.bids[first:last + 1]
+        out['ask'] = self.asks[first:last + 1]
+        out['last'] = out['bid']
+        out['time_msc'] = out['time'] * 1000
+        out['flags'] = 6
+        return out
+
+    def copy_ticks_from(self, date_from, count):
+        first = int(np.searchsorted(self.tick_times, _epoch(date_from), side='left'))
+        return self._ticks_slice(first, first + int(count) - 1)
+
+    def copy_ticks_range(self, date_from, date_to):
+        first = int(np.searchsorted(self.tick_times, _epoch(date_from), side='left'))
+        last = int(np.searchsorted(self.tick_times, _epoch(date_to), side='right')) - 1
+        return self._ticks_slice(first, last)
+
+    def symbol_info(self):
+        tick = self.tick()
+        return SymbolInfo(
+            self.symbol, True, True, self.digits, self.point,
+            int(round((tick.ask - tick.bid) / self.point)), self.stops_level, 0,
+            self.point, self.contract_size * self.point, self.contract_size,
+            self.volume_min, self.volume_max, self.volume_step,
+            self.filling_mode, tick.bid, tick.ask, tick.time,
+        )
+
+    def account_info(self):
+        profit = sum(p.profit for p in self.positions)
+        margin = sum(p.volume * self.contract_size * p.price_open / self.leverage for p in self.positions)
+        equity = self.balance + profit
+        return AccountInfo(self.login, round(self.balance, 2), round(equity, 2), round(profit, 2),
+                           round(margin, 2), round(equity - margin, 2), self.leverage, 'USD', True)
+
+    def terminal_info(self):
+        return TerminalInfo(self.connected, self.trade_allowed, int(self.latency * 1e6), 'MetaTrader 5 (sim)')
+
+    def orders_get(self, symbol=None, ticket=None):
+        return tuple(o.as_tuple() for o in self.orders
+                     if (symbol is None or o.symbol == symbol) and (ticket is None or o.ticket == ticket))
+
+    def history_orders_get(self, ticket=None):
+        return tuple(o.as_tuple() for o in self.order_history if ticket is None or o.ticket == ticket)
+
+    def positions_get(self, symbol=None, ticket=None, magic=None):
+        out = []
+        for p in self.positions:
+            if symbol is not None and p.symbol != symbol:
+                continue
+            if ticket is not None and p.ticket != ticket:
+                continue
+            if magic is not None and p.magic != magic:
+                continue
+            out.append(p.as_tuple())
+        return tuple(out)
+
+    # --- اجرای سفارش ---
+    def _result(self, request, retcode, comment, order=0, deal=0, volume=0.0, price=0.0):
+        tick = self.tick()
+        return OrderSendResult(retcode, deal, order, volume, price, tick.bid, tick.ask,
+                               comment, 0, 0, request)
+
+    def _check_stops(self, is_buy, price, sl, tp):
+        """SL/TP باید حداقل stops_level پوینت از قیمت بسته شدن پوزیشن فاصله داشته باشند"""
+        tick = self.tick()
+        ref = tick.bid if is_buy else tick.ask
+        gap = self.stops_level * self.point
+        if sl:
+            if is_buy and sl > ref - gap:
+                return False
+            if not is_buy and sl < ref + gap:
+                return False
+        if tp:
+            if is_buy and tp < ref + gap:
+                return False
+            if not is_buy and tp > ref - gap:
+                return False
+        return True
+
+    def order_send(self, request):
+        action = request.get('action')
+        if request.get('symbol', self.symbol) != self.symbol:
+            return self._result(request, TRADE_RETCODE_INVALID, 'Invalid symbol')
+        if action == TRADE_ACTION_DEAL:
+            return self._deal(request)
+        if action == TRADE_ACTION_SLTP:
+            return self._sltp(request)
+        if action == TRADE_ACTION_PENDING:
+            return self._pending(request)
+        if action == TRADE_ACTION_MODIFY:
+            return self._modify(request)
+        if action == TRADE_ACTION_REMOVE:
+            return self._remove(request)
+        return self._result(request, TRADE_RETCODE_INVALID, 'Unsupported action')
+
+    def _deal(self, request):
+        if not self.trade_allowed:
+            return self._result(request, TRADE_RETCODE_REJECT, 'AutoTrading disabled by client')
+        filling = request.get('type_filling', ORDER_FILLING_FOK)
+        allowed = {ORDER_FILLING_FOK: SYMBOL_FILLING_FOK, ORDER_FILLING_IOC: SYMBOL_FILLING_IOC}
+        if filling not in allowed or not self.filling_mode & allowed[filling]:
+            return self._result(request, TRADE_RETCODE_INVALID_FILL, 'Unsupported filling mode')
+
+        volume = float(request.get('volume', 0.0))
+        if not self._valid_volume(volume):
+            return self._result(request, TRADE_RETCODE_INVALID_VOLUME, 'Invalid volume')
+
+        order_type = request.get('type')
+        if order_type not in (ORDER_TYPE_BUY, ORDER_TYPE_SELL):
+            return self._result(request, TRADE_RETCODE_INVALID, 'Invalid order type')
+        is_buy = order_type == ORDER_TYPE_BUY
+        tick = self.tick()
+        price = tick.ask + self.slippage if is_buy else tick.bid - self.slippage
+
+        # بستن پوزیشن موجود با ارسال معامله مخالف و فیلد position
+        if request.get('position'):
+            pos = next((p for p in self.positions if p.ticket == request['position']), None)
+            if pos is None:
+                return self._result(request, TRADE_RETCODE_POSITION_CLOSED, 'Position doesn\'t exist')
+            if (pos.type == POSITION_TYPE_BUY) == is_buy:
+                return self._result(request, TRADE_RETCODE_INVALID, 'Invalid close direction')
+            self._close(pos, price, 'client')
+            self._next_ticket += 1
+            return self._result(request, TRADE_RETCODE_DONE, 'Request executed', order=self._next_ticket,
+                                deal=self._next_ticket, volume=pos.volume, price=price)
+
+        sl = request.get('sl', 0.0) or 0.0
+        tp = request.get('tp', 0.0) or 0.0
+        if not self._check_stops(is_buy, price, sl, tp):
+            return self._result(request, TRADE_RETCODE_INVALID_STOPS, 'Invalid stops')
+        margin = volume * self.contract_size * price / self.leverage
+        if margin > self.account_info().margin_free:
+            return self._result(request, TRADE_RETCODE_NO_MONEY, 'No money')
+
+        self._next_ticket += 1
+        ticket = self._next_ticket
+        pos = SimPosition(ticket, self.now, POSITION_TYPE_BUY if is_buy else POSITION_TYPE_SELL,
+                          request.get('magic', 0), volume, price, sl, tp, self.symbol,
+                          request.get('comment', ''))
+        pos.price_current = tick.bid if is_buy else tick.ask
+        pos.profit = self._profit(pos, pos.price_current)
+        self.positions.append(pos)
+        return self._result(request, TRADE_RETCODE_DONE, 'Request executed', order=ticket,
+                            deal=ticket, volume=volume, price=price)
+
+    def _valid_volume(self, volume):
+        steps = volume / self.volume_step
+        return self.volume_min <= volume <= self.volume_max and abs(steps - round(steps)) <= 1e-6
+
+    def _check_pending(self, order_type, price, sl, tp):
+        """قیمت سفارش نسبت به بازار و SL/TP نسبت به قیمت سفارش (با فاصله stops_level)"""
+        tick = self.tick()
+        gap = self.stops_level * self.point
+        if order_type == ORDER_TYPE_BUY_LIMIT:
+            valid_price = price <= tick.ask - gap
+        elif order_type == ORDER_TYPE_SELL_LIMIT:
+            valid_price = price >= tick.bid + gap
+        elif order_type == ORDER_TYPE_BUY_STOP:
+            valid_price = price >= tick.ask + gap
+        else:
+            valid_price = price <= tick.bid - gap
+        if not valid_price:
+            return TRADE_RETCODE_INVALID_PRICE, 'Invalid price'
+        is_buy = order_type in (ORDER_TYPE_BUY_LIMIT, ORDER_TYPE_BUY_STOP)
+        if sl and ((is_buy and sl > price - gap) or (not is_buy and sl < price + gap)):
+            return TRADE_RETCODE_INVALID_STOPS, 'Invalid stops'
+        if tp and ((is_buy and tp < price + gap) or (not is_buy and tp > price - gap)):
+            return TRADE_RETCODE_INVALID_STOPS, 'Invalid stops'
+        return None, None
+
+    def _pending(self, request):
+        if not self.trade_allowed:
+            return self._result(request, TRADE_RETCODE_REJECT, 'AutoTrading disabled by client')
+        order_type = request.get('type')
+        if order_type not in (ORDER_TYPE_BUY_LIMIT, ORDER_TYPE_SELL_LIMIT, ORDER_TYPE_BUY_STOP, ORDER_TYPE_SELL_STOP):
+            return self._result(request, TRADE_RETCODE_INVALID, 'Invalid order type')
+        volume = float(request.get('volume', 0.0))
+        if not self._valid_volume(volume):
+            return self._result(request, TRADE_RETCODE_INVALID_VOLUME, 'Invalid volume')
+        price = float(request.get('price', 0.0))
+        sl = request.get('sl', 0.0) or 0.0
+        tp = request.get('tp', 0.0) or 0.0
+        retcode, comment = self._check_pending(order_type, price, sl, tp)
+        if retcode is not None:
+            return self._result(request, retcode, comment)
+        self._next_ticket += 1
+        tick = self.tick()
+        is_buy = order_type in (ORDER_TYPE_BUY_LIMIT, ORDER_TYPE_BUY_STOP)
+        order = SimOrder(self._next_ticket, self.now, order_type, request.get('type_time', ORDER_TIME_GTC),
+                         request.get('type_filling', ORDER_FILLING_RETURN), request.get('magic', 0), volume,
+                         price, sl, tp, tick.ask if is_buy else tick.bid, self.symbol, request.get('comment', ''))
+        self.orders.append(order)
+        return self._result(request, TRADE_RETCODE_DONE, 'Request executed', order=order.ticket,
+                            volume=volume, price=price)
+
+    def _modify(self, request):
+        order = next((o for o in self.orders if o.ticket == request.get('order')), None)
+        if order is None:
+            return self._result(request, TRADE_RETCODE_INVALID_ORDER, 'Invalid order')
+        price = float(request.get('price', order.price_open))
+        sl = request.get('sl', order.sl) or 0.0
+        tp = request.get('tp', order.tp) or 0.0
+        if price == order.price_open and sl == order.sl and tp == order.tp:
+            return self._result(request, TRADE_RETCODE_NO_CHANGES, 'No changes')
+        retcode, comment = self._check_pending(order.type, price, sl, tp)
+        if retcode is not None:
+            return self._result(request, retcode, comment)
+        order.price_open, order.sl, order.tp = price, sl, tp
+        return self._result(request, TRADE_RETCODE_DONE, 'Request executed', order=order.ticket)
+
+    def _remove(self, request):
+        order = next((o for o in self.orders if o.ticket == request.get('order')), None)
+        if order is None:
+            return self._result(request, TRADE_RETCODE_INVALID_ORDER, 'Invalid order')
+        self.orders.remove(order)
+        order.state = ORDER_STATE_CANCELED
+        self.order_history.append(order)
+        return self._result(request, TRADE_RETCODE_DONE, 'Request executed', order=order.ticket)
+
+    def _sltp(self, request):
+        pos = next((p for p in self.positions if p.ticket == request.get('position')), None)
+        if pos is None:
+            return self._result(request, TRADE_RETCODE_POSITION_CLOSED, 'Position doesn\'t exist')
+        sl = request.get('sl', pos.sl) or 0.0
+        tp = request.get('tp', pos.tp) or 0.0
+        if sl == pos.sl and tp == pos.tp:
+            return self._result(request, TRADE_RETCODE_NO_CHANGES, 'No changes')
+        is_buy = pos.type == POSITION_TYPE_BUY
+        if not self._check_stops(is_buy, pos.price_current, sl, tp):
+            return self._result(request, TRADE_RETCODE_INVALID_STOPS, 'Invalid stops')
+        pos.sl = sl
+        pos.tp = tp
+        pos.time_update = self.now
+        return self._result(request, TRADE_RETCODE_DONE, 'Request executed', order=pos.ticket)
+
+
+def simulated_clock(broker, local_tz=timezone.utc):
+    """ساعت شبیه‌سازی شده‌ای که با هر sleep بروکر را تا همان زمان جلو می‌برد"""
+    from clock_gold import SimulatedClock
+    return SimulatedClock(broker.now, on_advance=broker.advance_to, local_tz=local_tz)
+
+
+# --- API سطح ماژول (همان امضای توابع MetaTrader5) ---
+_broker = None
+
+
+def install(broker):
+    """ثبت این ماژول به عنوان MetaTrader5 با بروکر داده شده؛ خروجی همان broker"""
+    global _broker
+    _broker = broker
+    sys.modules['MetaTrader5'] = sys.modules[__name__]
+    return broker
+
+
+def uninstall():
+    global _broker
+    _broker = None
+    if sys.modules.get('MetaTrader5') is sys.modules[__name__]:
+        del sys.modules['MetaTrader5']
+
+
+def get_broker():
+    return _broker
+
+
+def _call(name, symbol=None):
+    """شمارش فراخوانی، تاخیر مصنوعی و بررسی اتصال/نماد؛ خروجی broker یا None"""
+    broker = _broker
+    if broker is None or (name != 'initialize' and not broker.connected):
+        if broker is not None:
+            broker.error = (RES_E_INTERNAL_FAIL_INIT, 'IPC initialize failed, MetaTrader 5 x64 not found')
+        return None
+    broker.calls[name] += 1
+    if broker.latency:
+        _time.sleep(broker.latency)
+    if symbol is not None and symbol != broker.symbol:
+        broker.error = (RES_E_NOT_FOUND, f'Terminal: Symbol {symbol} not found')
+        return None
+    broker.error = (RES_S_OK, 'Success')
+    return broker
+
+
+def initialize(*args, **kwargs):
+    broker = _call('initialize')
+    if broker is None:
+        return False
+    broker.connected = True
+    return True
+
+
+def shutdown():
+    if _broker is not None:
+        _broker.connected = False
+    return True
+
+
+def last_error():
+    return _broker.error if _broker is not None else (RES_E_INTERNAL_FAIL_INIT, 'No broker installed')
+
+
+def version():
+    return (500, 4000, '01 Jan 2024') if _broker is not None else None
+
+
+def terminal_info():
+    broker = _call('terminal_info')
+    return broker.terminal_info() if broker else None
+
+
+def account_info():
+    broker = _call('account_info')
+    return broker.account_info() if broker else None
+
+
+def symbol_info(symbol):
+    broker = _call('symbol_info', symbol)
+    return broker.symbol_info() if broker else None
+
+
+def symbol_info_tick(symbol):
+    broker = _call('symbol_info_tick', symbol)
+    return broker.tick() if broker else None
+
+
+def symbol_select(symbol, enable=True):
+    return _call('symbol_select', symbol) is not None
+
+
+def _check_timeframe(broker, timeframe):
+    if timeframe != broker.timeframe:
+        broker.error = (RES_E_INVALID_PARAMS, 'Invalid params: unsupported timeframe')
+        return False
+    return True
+
+
+def copy_rates_from_pos(symbol, timeframe, start_pos, count):
+    broker = _call('copy_rates_from_pos', symbol)
+    if broker is None or not _check_timeframe(broker, timeframe):
+        return None
+    return broker.copy_rates_from_pos(start_pos, count)
+
+
+def copy_rates_from(symbol, timeframe, date_from, count):
+    broker = _call('copy_rates_from', symbol)
+    if broker is None or not _check_timeframe(broker, timeframe):
+        return None
+    return broker.copy_rates_from(date_from, count)
+
+
+def copy_rates_range(symbol, timeframe, date_from, date_to):
+    broker = _call('copy_rates_range', symbol)
+    if broker is None or not _check_timeframe(broker, timeframe):
+        return None
+    return broker.copy_rates_range(date_from, date_to)
+
+
+def copy_ticks_from(symbol, date_from, count, flags=COPY_TICKS_ALL):
+    broker = _call('copy_ticks_from', symbol)
+    return broker.copy_ticks_from(date_from, count) if broker else None
+
+
+def copy_ticks_range(symbol, date_from, date_to, flags=COPY_TICKS_ALL):
+    broker = _call('copy_ticks_range', symbol)
+    return broker.copy_ticks_range(date_from, date_to) if broker else None
+
+
+def positions_get(symbol=None, ticket=None, group=None, magic=None):
+    broker = _call('positions_get')
+    if broker is None:
+        return None
+    return broker.positions_get(symbol=symbol, ticket=ticket, magic=magic)
+
+
+def orders_get(symbol=None, ticket=None, group=None):
+    broker = _call('orders_get')
+    if broker is None:
+        return None
+    return broker.orders_get(symbol=symbol, ticket=ticket)
+
+
+def orders_total():
+    broker = _call('orders_total')
+    return len(broker.orders) if broker else None
+
+
+def history_orders_get(date_from=None, date_to=None, ticket=None, position=None, group=None):
+    broker = _call('history_orders_get')
+    if broker is None:
+        return None
+    return broker.history_orders_get(ticket=ticket if ticket is not None else position)
+
+
+def positions_total():
+    broker = _call('positions_total')
+    return len(broker.positions) if broker else None
+
+
+def order_send(request):
+    broker = _call('order_send')
+    if broker is None:
+        return None
+    return broker.order_send(request)
@@ -1,6 +1,6 @@
-from datetime import datetime
 from colorama import init, Fore
 from pathlib import Path
+from clock_gold import now
 
 # راه‌اندازی colorama
 init(autoreset=True)
@@ -15,10 +15,10 @@ def log(msg, level='info', color=None, save_to_file=True):
 
     if save_to_file:
         # ذخیره در فایل TXT روزانه
-        log_filename = LOG_DIR / f"gold_swing_logs_{datetime.now().strftime('%Y-%m-%d')}.txt"
+        log_filename = LOG_DIR / f"gold_swing_logs_{now().strftime('%Y-%m-%d')}.txt"
         try:
             with open(log_filename, 'a', encoding='utf-8') as f:
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                timestamp = now().strftime('%Y-%m-%d %H:%M:%S')
                 f.write(f"[{timestamp}] {msg}\n")
         except Exception as e:
             print(f"خطا در ذخیره لاگ: {e}")
@@ -0,0 +1,73 @@
+"""
+زمان‌بندی هم‌تراز با بسته شدن کندل
+
+به جای درخواست داده هر 5 ثانیه، زمان بسته شدن کندل بعدی از روی زمان سرور بروکر
+محاسبه می‌شود و ربات کمی بعد از آن بیدار می‌شود. اختلاف ساعت سرور با ساعت محلی
+از زمان tickها اندازه‌گیری می‌شود. اگر کندل جدید هنوز نرسیده باشد چند ثانیه با
+فاصله کوتاه دوباره تلاش می‌شود و بعد از آن به polling عادی برمی‌گردد (مثلا بازار بسته).
+"""
+
+from collections import deque
+
+from clock_gold import get_clock
+from metatrader5_config_gold import BAR_SCHEDULER_CONFIG
+
+
+class BarScheduler:
+    """محاسبه زمان بیدار شدن برای کندل بعدی بر اساس زمان سرور"""
+
+    def __init__(self, timeframe_seconds=None, wake_delay=None, retry_interval=None,
+                 max_retry=None, idle_interval=None, offset_samples=50):
+        cfg = BAR_SCHEDULER_CONFIG
+        self.timeframe_seconds = timeframe_seconds or cfg['timeframe_seconds']
+        self.wake_delay = cfg['wake_delay'] if wake_delay is None else wake_delay
+        self.retry_interval = retry_interval or cfg['retry_interval']
+        self.max_retry = cfg['max_retry'] if max_retry is None else max_retry
+        self.idle_interval = idle_interval or cfg['idle_interval']
+        self._offsets = deque(maxlen=offset_samples)
+        self._last_fetch = None
+
+    def observe_tick(self, tick):
+        """
+        ثبت یک نمونه اختلاف ساعت از tick. زمان tick (گرد شده به پایین و با تاخیر
+        رسیدن) همیشه کمتر یا مساوی زمان واقعی سرور است، پس بیشینه نمونه‌های اخیر
+        بهترین تخمین است.
+        """
+        if not tick:
+            return
+        time_msc = getattr(tick, 'time_msc', 0)
+        server_time = time_msc / 1000.0 if time_msc else float(tick.time)
+        self._offsets.append(server_time - get_clock().time())
+
+    @property
+    def offset(self):
+        """اختلاف زمان سرور با ساعت محلی (ثانیه)"""
+        return max(self._offsets) if self._offsets else 0.0
+
+    def server_now(self):
+        return get_clock().time() + self.offset
+
+    def next_bar_time(self, last_bar_time):
+        """زمان باز شدن کندل بعد از کندل last_bar_time (epoch سرور یا Timestamp)"""
+        if hasattr(last_bar_time, 'timestamp'):
+            last_bar_time = last_bar_time.timestamp()
+        return last_bar_time + self.timeframe_seconds
+
+    def mark_fetch(self):
+        """ثبت زمان درخواست داده (برای فاصله تلاش‌های مجدد)"""
+        self._last_fetch = self.server_now()
+
+    def delay_for(self, last_bar_time):
+        """
+        چند ثانیه تا درخواست بعدی داده صبر شود وقتی آخرین کندل دیده شده last_bar_time است؛
+        0 یعنی همین الان درخواست شود. اولین درخواست wake_delay ثانیه بعد از بسته شدن
+        کندل است، سپس هر retry_interval تا max_retry ثانیه و بعد از آن هر idle_interval.
+        """
+        due = self.next_bar_time(last_bar_time) + self.wake_delay
+        now = self.server_now()
+        if now < due:
+            return due - now
+        if self._last_fetch is None or self._last_fetch < due:
+            return 0.0
+        interval = self.retry_interval if now - due < self.max_retry else self.idle_interval
+        return max(0.0, self._last_fetch + interval - now)
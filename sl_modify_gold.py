@@ -0,0 +1,132 @@
+"""
+زمان‌بندی تغییر SL (TRADE_ACTION_SLTP) با hysteresis و محدودیت نرخ
+
+با اجرای Trailing روی هر tick اگر هر بهبود جزئی SL یک درخواست باشد بروکر با سیل
+TRADE_ACTION_SLTP مواجه می‌شود. SLModifyScheduler درخواست‌ها را این‌طور کنترل می‌کند:
+
+- حداقل گام: SL جدید باید حداقل max(min_step_price، min_step_r × ریسک) از آخرین SL
+  ارسال شده بهتر باشد؛ در غیر این صورت کنار گذاشته می‌شود (tick بعدی دوباره پیشنهاد می‌دهد).
+- cooldown هر ticket و بودجه سراسری max_per_second (token bucket): پیشنهادی که به این
+  دلیل ارسال نشود به صورت pending می‌ماند و در flush بعدی (با آخرین مقدار) ارسال می‌شود.
+- در هر ارزیابی پیشنهادها با propose جمع و با flush ارسال می‌شوند؛ برای هر ticket
+  حداکثر یک درخواست (بهترین SL) فرستاده می‌شود.
+
+شمارنده‌ها در stats: proposed، sent، done، rejected و suppressed_* (step/cooldown/budget).
+"""
+
+import threading
+import time
+from collections import Counter
+
+from clock_gold import get_clock
+from metatrader5_config_gold import SL_MODIFY_CONFIG
+from mt5_gateway_gold import mt5
+
+
+class SLModifyScheduler:
+    """کنترل حداقل گام، cooldown هر ticket و نرخ سراسری درخواست‌های تغییر SL"""
+
+    def __init__(self, mt5_conn, min_step_price=None, min_step_r=None, cooldown=None, max_per_second=None):
+        cfg = SL_MODIFY_CONFIG
+        self.mt5_conn = mt5_conn
+        self.min_step_price = cfg['min_step_price'] if min_step_price is None else min_step_price
+        self.min_step_r = cfg['min_step_r'] if min_step_r is None else min_step_r
+        self.cooldown = cfg['cooldown'] if cooldown is None else cooldown
+        self.max_per_second = max_per_second or cfg['max_per_second']
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._pending = {}    # ticket -> (is_buy, new_sl)
+        self._last_sl = {}    # ticket -> آخرین SL ارسال شده و تایید شده
+        self._last_sent = {}  # ticket -> زمان آخرین ارسال
+        self._tokens = float(self.max_per_second)
+        self._tokens_time = None
+
+    @staticmethod
+    def _better(is_buy, a, b):
+        """فاصله بهبود SL از b به a در جهت سود (مثبت یعنی a بهتر است)"""
+        return a - b if is_buy else b - a
+
+    def propose(self, ticket, is_buy, new_sl, current_sl, risk):
+        """
+        ثبت SL پیشنهادی برای یک ticket. current_sl همان SL پوزیشن و risk فاصله entry تا SL
+        (برای حداقل گام بر حسب R) است. خروجی False یعنی پیشنهاد به خاطر حداقل گام کنار گذاشته شد.
+        """
+        with self._lock:
+            self.stats['proposed'] += 1
+            base = self._last_sl.get(ticket)
+            if base is None or (current_sl and self._better(is_buy, current_sl, base) > 0):
+                base = current_sl
+            min_step = max(self.min_step_price, self.min_step_r * risk)
+            if base and self._better(is_buy, new_sl, base) < min_step:
+                self.stats['suppressed_step'] += 1
+                return False
+            pending = self._pending.get(ticket)
+            if pending is not None:
+                self.stats['coalesced'] += 1
+                if self._better(is_buy, new_sl, pending[1]) <= 0:
+                    return True
+            self._pending[ticket] = (is_buy, new_sl)
+            return True
+
+    def _take_token(self, now):
+        if self._tokens_time is not None:
+            self._tokens = min(float(self.max_per_second),
+                               self._tokens + (now - self._tokens_time) * self.max_per_second)
+        self._tokens_time = now
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+    def flush(self, ticket=None, mt5_conn=None):
+        """
+        ارسال پیشنهادهای pending که cooldown و بودجه اجازه می‌دهند (یک درخواست برای هر ticket)؛
+        با ticket فقط همان ticket. خروجی لیست (ticket, new_sl, result, done_at) که done_at زمان
+        perf_counter پایان order_send است. lock هنگام order_send نگه داشته نمی‌شود.
+        mt5_conn connector ارسال کننده است (هر thread connector و snapshot خودش را دارد).
+        """
+        conn = mt5_conn or self.mt5_conn
+        due = []
+        with self._lock:
+            now = get_clock().monotonic()
+            if ticket is None:
+                items = list(self._pending.items())
+            else:
+                items = [(ticket, self._pending[ticket])] if ticket in self._pending else []
+            for t, (is_buy, new_sl) in items:
+                last = self._last_sent.get(t)
+                if last is not None and now - last < self.cooldown:
+                    self.stats['suppressed_cooldown'] += 1
+                    continue
+                if not self._take_token(now):
+                    self.stats['suppressed_budget'] += 1
+                    continue
+                del self._pending[t]
+                self._last_sent[t] = now
+                self.stats['sent'] += 1
+                due.append((t, new_sl))
+        sent = []
+        for t, new_sl in due:
+            result = conn.modify_sl_tp(t, new_sl=new_sl, new_tp=None)
+            done_at = time.perf_counter()
+            with self._lock:
+                if result and result.retcode == mt5.TRADE_RETCODE_DONE:
+                    self.stats['done'] += 1
+                    if t in self._last_sent:  # در این فاصله با retain حذف نشده باشد
+                        self._last_sl[t] = new_sl
+                else:
+                    self.stats['rejected'] += 1
+            sent.append((t, new_sl, result, done_at))
+        return sent
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def retain(self, tickets):
+        """پاک کردن وضعیت ticketهایی که دیگر باز نیستند"""
+        tickets = set(tickets)
+        with self._lock:
+            for state in (self._pending, self._last_sl, self._last_sent):
+                for ticket in [t for t in state if t not in tickets]:
+                    del state[ticket]
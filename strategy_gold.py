@@ -0,0 +1,218 @@
+"""
+منطق تصمیم‌گیری استراتژی Swing + Fibonacci بدون وابستگی به MetaTrader5
+
+این توابع هم در ربات زنده (main_metatrader_gold) و هم در بک‌تست (backtest_gold)
+استفاده می‌شوند تا هر دو دقیقاً یک منطق را اجرا کنند.
+last_closed یک کندل بسته شده است: BarFrame.row()، Series یا dict با کلیدهای timestamp/high/low/close.
+"""
+
+from fibo_calculate_gold import fibonacci_retracement
+from save_file_gold import log
+
+
+def update_fibonacci_setup(state, legs, swing_type, is_swing, last_swing_type, last_closed,
+                           fib_705=0.705, log_fn=log):
+    """
+    Phase 1: ایجاد Fibonacci جدید روی swing شناسایی شده
+
+    legs همان 2 یا 3 leg آخر است. last_swing_type جدید برگردانده می‌شود.
+    """
+    if not is_swing:
+        return last_swing_type
+
+    # بررسی اینکه آیا باید Fibonacci جدید ایجاد شود
+    should_create_fib = False
+    check_price = legs[1].start_value if len(legs) >= 3 else legs[0].start_value
+    new_fib1_time = legs[2].end if len(legs) >= 3 else legs[1].end
+
+    if swing_type == 'bullish':
+        # فقط اگر Fibonacci وجود نداشته باشد یا Swing جدید باشد، ایجاد کن
+        if not state.fib_levels or last_swing_type != swing_type:
+            if last_closed['close'] > check_price * 0.99:  # 1% tolerance
+                should_create_fib = True
+        # اگر زمان fib1 تغییر کرده (legs تغییر کرده)، Fibonacci جدید ایجاد کن
+        elif state.fib1_time != new_fib1_time:
+            if last_closed['close'] > check_price * 0.99:
+                should_create_fib = True
+
+    elif swing_type == 'bearish':
+        if not state.fib_levels or last_swing_type != swing_type:
+            if last_closed['close'] < check_price * 1.01:  # 1% tolerance
+                should_create_fib = True
+        elif state.fib1_time != new_fib1_time:
+            if last_closed['close'] < check_price * 1.01:
+                should_create_fib = True
+
+    if not should_create_fib:
+        return last_swing_type
+
+    # ایجاد Fibonacci جدید
+    state.reset()
+    if len(legs) >= 3:
+        state.fib_levels = fibonacci_retracement(
+            start_price=legs[2].end_value,
+            end_price=legs[2].start_value,
+            fib_705=fib_705
+        )
+        state.fib0_time = legs[2].start
+        state.fib1_time = legs[2].end
+    else:
+        state.fib_levels = fibonacci_retracement(
+            start_price=legs[1].end_value,
+            end_price=legs[0].start_value,
+            fib_705=fib_705
+        )
+        state.fib0_time = legs[0].start
+        state.fib1_time = legs[1].end
+
+    if swing_type == 'bullish':
+        log_fn(f"📈 New bullish fibonacci created: fib1:{state.fib_levels['1.0']:.2f} "
+               f"fib0.705:{state.fib_levels['0.705']:.2f} fib0:{state.fib_levels['0.0']:.2f}",
+               color='green')
+    else:
+        log_fn(f"📉 New bearish fibonacci created: fib1:{state.fib_levels['1.0']:.2f} "
+               f"fib0.705:{state.fib_levels['0.705']:.2f} fib0:{state.fib_levels['0.0']:.2f}",
+               color='green')
+    return swing_type
+
+
+def update_fibonacci_touches(state, legs, last_swing_type, last_closed, fib_705=0.705, log_fn=log):
+    """
+    Phase 2: به‌روزرسانی fib0، ریست با عبور از fib1 و تشخیص first/second touch
+
+    last_swing_type جدید برگردانده می‌شود (None اگر setup ریست شود).
+    """
+    if not state.fib_levels or len(legs) <= 2:
+        return last_swing_type
+
+    entry_level = state.fib_levels[str(fib_705)]
+
+    if last_swing_type == 'bullish':
+        if last_closed['high'] > state.fib_levels['0.0']:
+            state.fib_levels = fibonacci_retracement(
+                start_price=last_closed['high'],
+                end_price=state.fib_levels['1.0'],
+                fib_705=fib_705
+            )
+            state.fib0_time = last_closed['timestamp']
+            state.first_touch = False
+            state.first_touch_value = None
+            log_fn(f"📈 Updated fibonacci: fib0:{state.fib_levels['0.0']:.2f} "
+                   f"fib1:{state.fib_levels['1.0']:.2f}", color='green')
+        elif last_closed['low'] < state.fib_levels['1.0']:
+            state.reset()
+            log_fn(f"📈 Price dropped below fib1 - reset", color='red')
+            return None
+        # شرایط touch آسان‌تر (Optimized): tolerance 1%
+        elif last_closed['low'] <= entry_level * 1.01:
+            # بررسی اینکه آیا این کندل قبلاً پردازش شده است یا نه
+            if not state.first_touch:
+                state.first_touch_value = last_closed
+                state.first_touch = True
+                log_fn(f"📈 First touch on fib0.705", color='yellow')
+            elif not state.second_touch:
+                # بررسی اینکه آیا این کندل جدید است (نه همان کندل First Touch)
+                if state.first_touch_value['timestamp'] != last_closed['timestamp']:
+                    # دومین touch: فقط بررسی کنیم که قیمت دوباره به سطح نزدیک شده
+                    if abs(last_closed['low'] - entry_level) < abs(state.first_touch_value['low'] - entry_level) * 1.5:
+                        state.second_touch_value = last_closed
+                        state.second_touch = True
+                        log_fn(f"📈 Second touch detected - signal ready!", color='green')
+
+    elif last_swing_type == 'bearish':
+        if last_closed['low'] < state.fib_levels['0.0']:
+            state.fib_levels = fibonacci_retracement(
+                start_price=last_closed['low'],
+                end_price=state.fib_levels['1.0'],
+                fib_705=fib_705
+            )
+            state.fib0_time = last_closed['timestamp']
+            state.first_touch = False
+            state.first_touch_value = None
+            log_fn(f"📉 Updated fibonacci: fib0:{state.fib_levels['0.0']:.2f} "
+                   f"fib1:{state.fib_levels['1.0']:.2f}", color='green')
+        elif last_closed['high'] > state.fib_levels['1.0']:
+            state.reset()
+            log_fn(f"📉 Price rose above fib1 - reset", color='red')
+            return None
+        # شرایط touch آسان‌تر (Optimized): tolerance 1%
+        elif last_closed['high'] >= entry_level * 0.99:
+            if not state.first_touch:
+                state.first_touch_value = last_closed
+                state.first_touch = True
+                log_fn(f"📉 First touch on fib0.705", color='yellow')
+            elif not state.second_touch:
+                if state.first_touch_value['timestamp'] != last_closed['timestamp']:
+                    if abs(last_closed['high'] - entry_level) < abs(state.first_touch_value['high'] - entry_level) * 1.5:
+                        state.second_touch_value = last_closed
+                        state.second_touch = True
+                        log_fn(f"📉 Second touch detected - signal ready!", color='green')
+
+    return last_swing_type
+
+
+def can_enter_trade(state, is_first_run, trade_count, use_first_touch=True):
+    """
+    Phase 3: آیا touch فعلی اجازه ورود می‌دهد؟
+
+    در اولین اجرا هیچ پوزیشنی باز نمی‌شود تا از داده‌های تاریخی استفاده نشود.
+    ورود با first touch فقط برای اولین معامله مجاز است.
+    """
+    if is_first_run:
+        return False
+    return state.second_touch or (use_first_touch and state.first_touch and trade_count == 0)
+
+
+def swing_key(last_swing_type, fib_levels):
+    """کلید یکتای swing برای جلوگیری از معامله دوباره روی همان swing"""
+    return (last_swing_type, round(fib_levels['1.0'], 2))
+
+
+def entry_stop_loss(is_buy, entry_price, fib1, min_dist=0.5):
+    """
+    SL ورود بر اساس fib 1.0 با حداقل فاصله min_dist از قیمت ورود
+
+    None یعنی SL معتبر نیست و setup باید ریست شود.
+    """
+    if is_buy:
+        if fib1 >= entry_price:
+            return None
+        if (entry_price - fib1) < min_dist:
+            adj = entry_price - min_dist
+            if adj <= 0:
+                return None
+            return adj
+        return fib1
+    if fib1 <= entry_price:
+        return None
+    if (fib1 - entry_price) < min_dist:
+        return entry_price + min_dist
+    return fib1
+
+
+def trailing_stop_level(is_buy, entry, sl, price, start_r=1.5, gap_r=0.5):
+    """
+    محاسبه SL جدید Trailing Stop
+
+    price برای BUY قیمت bid و برای SELL قیمت ask است. ریسک از فاصله entry تا SL
+    فعلی محاسبه می‌شود. خروجی (new_sl, profit_R) است؛ new_sl برابر None یعنی تغییری لازم نیست.
+    """
+    risk = abs(entry - sl)
+    if risk <= 0:
+        return None, 0.0
+
+    if is_buy:
+        profit_R = (price - entry) / risk
+        if profit_R >= start_r:
+            new_sl = price - (gap_r * risk)
+            # فقط اگر SL جدید بالاتر از SL فعلی باشد
+            if new_sl > sl:
+                return new_sl, profit_R
+    else:
+        profit_R = (entry - price) / risk
+        if profit_R >= start_r:
+            new_sl = price + (gap_r * risk)
+            # فقط اگر SL جدید پایین‌تر از SL فعلی باشد
+            if new_sl < sl:
+                return new_sl, profit_R
+    return None, profit_R
@@ -0,0 +1,199 @@
+"""
+اجرای موازی بک‌تست روی شبکه‌ای از پارامترها (sweep)
+
+کندل‌ها یک بار در multiprocessing.shared_memory قرار می‌گیرند و workerها بدون
+کپی/pickle به آن‌ها متصل می‌شوند. نقاط شبکه بر اساس (threshold, window_size)
+گروه‌بندی می‌شوند تا legs هر گام فقط یک بار برای هر گروه محاسبه شود؛ سایر
+پارامترها (fib_705، min_swing_size، start_r، gap_r) روی همان legs اجرا می‌شوند.
+"""
+
+import csv
+import itertools
+import os
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtest_gold import (load_bars, default_params, run_backtest_arrays, compute_step_legs,
+                           first_step)
+from get_legs_gold import precompute_leg_features
+from metatrader5_config_gold import BACKTEST_CONFIG, SWEEP_CONFIG
+
+# ردیف‌های بلوک حافظه مشترک: time, open, high, low, close (همه float64)
+_FIELDS = ('time', 'open', 'high', 'low', 'close')
+
+# state هر worker (بعد از _init_worker مقداردهی می‌شود)
+_worker_shm = None
+_worker_bars = None
+_worker_features = None
+
+
+class SharedBars:
+    """کندل‌های منتشر شده در حافظه مشترک؛ فقط نام و طول بلوک بین پردازه‌ها جابجا می‌شود"""
+
+    def __init__(self, times, open_, high, low, close):
+        n = len(close)
+        self.length = n
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, len(_FIELDS) * n * 8))
+        block = np.ndarray((len(_FIELDS), n), dtype=np.float64, buffer=self.shm.buf)
+        for row, values in enumerate((times, open_, high, low, close)):
+            block[row] = values
+        del block
+
+    @classmethod
+    def from_frame(cls, data):
+        return cls(data.index.as_unit('s').asi8, data['open'].to_numpy(), data['high'].to_numpy(),
+                   data['low'].to_numpy(), data['close'].to_numpy())
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach_bars(name, length):
+    """اتصال به بلوک حافظه مشترک؛ خروجی (shm, dict آرایه‌ها) بدون کپی داده"""
+    shm = shared_memory.SharedMemory(name=name)
+    block = np.ndarray((len(_FIELDS), length), dtype=np.float64, buffer=shm.buf)
+    bars = dict(zip(_FIELDS, block))
+    bars['time'] = bars['time'].astype(np.int64)
+    return shm, bars
+
+
+def _init_worker(name, length):
+    global _worker_shm, _worker_bars, _worker_features
+    _worker_shm, _worker_bars = attach_bars(name, length)
+    _worker_features = None
+
+
+def _bar_features():
+    global _worker_features
+    if _worker_features is None:
+        b = _worker_bars
+        _worker_features = precompute_leg_features(b['open'], b['high'], b['low'], b['close'])
+    return _worker_features
+
+
+def _run_group(task):
+    """اجرای همه نقاط یک گروه (threshold, window_size) با legs مشترک"""
+    threshold, window_size, combos, start, stop = task
+    b = _worker_bars
+    step_start = max(start, first_step(window_size))
+    step_legs = compute_step_legs(_bar_features(), b['open'], threshold, window_size, step_start, stop)
+    rows = []
+    for combo in combos:
+        params = dict(combo, threshold=threshold, window_size=window_size)
+        result = run_backtest_arrays(
+            b['time'], b['open'], b['high'], b['low'], b['close'],
+            params=params, step_legs=step_legs, start=step_start, stop=stop,
+        )
+        rows.append(dict(params_row(params), **result.summary()))
+    return rows
+
+
+def params_row(params):
+    """فقط پارامترهای قابل sweep برای ستون‌های جدول نتایج"""
+    return {k: v for k, v in params.items() if not isinstance(v, dict)}
+
+
+def expand_grid(grid):
+    """تبدیل dict از لیست‌ها به لیست dict های پارامتر"""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def build_tasks(grid, start, stop):
+    """گروه‌بندی نقاط شبکه بر اساس (threshold, window_size)"""
+    groups = {}
+    for point in expand_grid(grid):
+        point = dict(point)
+        threshold = point.pop('threshold', None)
+        window_size = point.pop('window_size', None)
+        groups.setdefault((threshold, window_size), []).append(point)
+    return [(thr, ws, combos, start, stop) for (thr, ws), combos in groups.items()]
+
+
+def run_sweep(data, grid=None, processes=None, results_file=None, start=None, stop=None, on_row=None):
+    """
+    اجرای sweep و برگرداندن جدول نتایج (DataFrame)
+
+    start/stop بازه کندل‌ها برای همه نقاط شبکه است؛ پیش‌فرض از اولین کندلی که
+    بزرگ‌ترین window_size کامل باشد تا انتهای داده، تا همه نقاط روی یک بازه مقایسه شوند.
+    نتایج به محض آماده شدن هر گروه به results_file اضافه می‌شوند.
+    """
+    grid = grid or SWEEP_CONFIG['grid']
+    defaults = default_params()
+    grid = dict(grid)
+    grid.setdefault('threshold', [defaults['threshold']])
+    grid.setdefault('window_size', [defaults['window_size']])
+    if start is None:
+        start = first_step(max(grid['window_size']))
+    if stop is None:
+        stop = len(data) - 1
+    tasks = build_tasks(grid, start, stop)
+    processes = processes or SWEEP_CONFIG.get('processes') or os.cpu_count()
+
+    rows = []
+    writer = None
+    out = open(results_file, 'w', newline='', encoding='utf-8') if results_file else None
+    try:
+        with SharedBars.from_frame(data) as shared:
+            initargs = (shared.name, shared.length)
+            if processes == 1:
+                _init_worker(*initargs)
+                results = map(_run_group, tasks)
+            else:
+                pool = Pool(processes, initializer=_init_worker, initargs=initargs)
+                results = pool.imap_unordered(_run_group, tasks)
+            try:
+                for group_rows in results:
+                    for row in group_rows:
+                        rows.append(row)
+                        if out is not None:
+                            if writer is None:
+                                writer = csv.DictWriter(out, fieldnames=list(row))
+                                writer.writeheader()
+                            writer.writerow(row)
+                        if on_row:
+                            on_row(row)
+                    if out is not None:
+                        out.flush()
+            finally:
+                if processes != 1:
+                    pool.close()
+                    pool.join()
+                else:
+                    _init_worker_reset()
+    finally:
+        if out is not None:
+            out.close()
+    return pd.DataFrame(rows)
+
+
+def _init_worker_reset():
+    global _worker_shm, _worker_bars, _worker_features
+    _worker_bars = None
+    _worker_features = None
+    if _worker_shm is not None:
+        _worker_shm.close()
+        _worker_shm = None
+
+
+if __name__ == "__main__":
+    import time as _time
+
+    bars = load_bars(BACKTEST_CONFIG['data_file'])
+    t0 = _time.perf_counter()
+    table = run_sweep(bars, results_file=SWEEP_CONFIG['results_file'])
+    print(f"Sweep: {len(table)} runs in {_time.perf_counter() - t0:.1f}s")
+    print(table.sort_values('expectancy_R', ascending=False).head(10).to_string(index=False))
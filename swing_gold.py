@@ -1,4 +1,21 @@
 from colorama import Fore
+import numpy as np
+
+
+def count_confirmation_candles(open_, close, s_index, e_index, bearish):
+    """
+    تعداد کندل‌های تأیید در بازه [s_index, e_index]
+
+    برای bearish: از بین کندل‌های نزولی (open > close)، تعداد کندل‌هایی که close آن‌ها
+    از close کندل نزولی قبلی پایین‌تر است. برای bullish برعکس (open <= close و close بالاتر).
+    """
+    o = open_[s_index:e_index + 1]
+    c = close[s_index:e_index + 1]
+    if bearish:
+        closes = c[o > c]
+        return int(np.count_nonzero(closes[1:] < closes[:-1]))
+    closes = c[o <= c]
+    return int(np.count_nonzero(closes[1:] > closes[:-1]))
 
 
 def get_swing_points(data, legs, min_candles=2):
@@ -14,42 +31,24 @@ def get_swing_points(data, legs, min_candles=2):
         # اگر 3 leg داریم، از منطق قبلی استفاده کن
         if len(legs) == 3:
             ### Up swing ###
-            if legs[1]['end_value'] > legs[0]['start_value'] and legs[0]['end_value'] > legs[1]['end_value']:
+            if legs[1].end_value > legs[0].start_value and legs[0].end_value > legs[1].end_value:
                 ### Check true swing ###
-                s_index = data.index.tolist().index(legs[1]['start'])
-                e_index = data.index.tolist().index(legs[1]['end'])
-                true_candles = 0
-                first_candle = False
-                last_candle_close = None
-
-                for k in range(s_index, e_index+1):
-                    if data.iloc[k]['status'] == 'bearish':
-                        if first_candle:
-                            if last_candle_close is not None and data.iloc[k]['close'] < last_candle_close:
-                                true_candles += 1
-                        last_candle_close = data.iloc[k]['close']
-                        first_candle = True
+                s_index, e_index = legs[1].start_pos, legs[1].end_pos
+                true_candles = count_confirmation_candles(
+                    np.asarray(data['open']), np.asarray(data['close']), s_index, e_index, bearish=True
+                )
                 
                 if true_candles >= min_candles:  # 2 به جای 3
                     swing_type = 'bullish'
                     is_swing = True
             
             ### Down swing ###
-            elif legs[1]['end_value'] < legs[0]['start_value'] and legs[0]['end_value'] < legs[1]['end_value']:
+            elif legs[1].end_value < legs[0].start_value and legs[0].end_value < legs[1].end_value:
                 ### Check true swing ###
-                s_index = data.index.tolist().index(legs[1]['start'])
-                e_index = data.index.tolist().index(legs[1]['end'])
-                true_candles = 0
-                first_candle = False
-                last_candle_close = None
-
-                for k in range(s_index, e_index+1):
-                    if data.iloc[k]['status'] == 'bullish':
-                        if first_candle:
-                            if last_candle_close is not None and data.iloc[k]['close'] > last_candle_close:
-                                true_candles += 1
-                        last_candle_close = data.iloc[k]['close']
-                        first_candle = True
+                s_index, e_index = legs[1].start_pos, legs[1].end_pos
+                true_candles = count_confirmation_candles(
+                    np.asarray(data['open']), np.asarray(data['close']), s_index, e_index, bearish=False
+                )
                 
                 if true_candles >= min_candles:  # 2 به جای 3
                     swing_type = 'bearish'
@@ -58,15 +57,15 @@ def get_swing_points(data, legs, min_candles=2):
         # اگر 2 leg داریم، از منطق ساده‌تر استفاده کن
         elif len(legs) == 2:
             # تشخیص جهت بر اساس legs
-            if legs[1]['end_value'] > legs[0]['start_value']:
+            if legs[1].end_value > legs[0].start_value:
                 # روند صعودی
-                if legs[0]['end_value'] > legs[1]['end_value']:
+                if legs[0].end_value > legs[1].end_value:
                     # pullback وجود دارد
                     swing_type = 'bullish'
                     is_swing = True
-            elif legs[1]['end_value'] < legs[0]['start_value']:
+            elif legs[1].end_value < legs[0].start_value:
                 # روند نزولی
-                if legs[0]['end_value'] < legs[1]['end_value']:
+                if legs[0].end_value < legs[1].end_value:
                     # pullback وجود دارد
                     swing_type = 'bearish'
                     is_swing = True
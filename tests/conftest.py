@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# بدون ترمینال MetaTrader5، شبیه‌ساز خود ربات جای آن ثبت می‌شود (بروکر را هر تست نصب می‌کند)
+try:
+    import MetaTrader5  # noqa: F401
+except ImportError:
+    import mt5_sim_gold
+    mt5_sim_gold.install(None)
+
+
+def random_bars(n, seed=0, tz='UTC'):
+    """کندل‌های M15 تصادفی با قیمت‌های گرد شده (برای تساوی high/low و حالت‌های مرزی)"""
+    rng = np.random.default_rng(seed)
+    close = 2000 + np.cumsum(rng.normal(0, 2.5, n))
+    open_ = np.r_[2000, close[:-1]] + rng.normal(0, 0.3, n)
+    high = np.maximum(open_, close) + np.abs(rng.normal(0, 1.5, n))
+    low = np.minimum(open_, close) - np.abs(rng.normal(0, 1.5, n))
+    open_, close, high, low = (np.round(x, 1) for x in (open_, close, high, low))
+    high = np.maximum.reduce([high, open_, close])
+    low = np.minimum.reduce([low, open_, close])
+    index = pd.date_range('2024-01-01', periods=n, freq='15min', tz='UTC').tz_convert(tz)
+    return pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close},
+                        index=pd.Index(index, name='time'))
+
+
+@pytest.fixture
+def bars():
+    return random_bars
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from bar_buffer_gold import BarBuffer
+from tick_bars_gold import RATES_DTYPE
+
+
+def rates(start, stop, close_offset=0.0):
+    """کندل‌های M15 با time = 900 * i و close = i + close_offset"""
+    out = np.zeros(stop - start, dtype=RATES_DTYPE)
+    out['time'] = np.arange(start, stop) * 900
+    out['close'] = np.arange(start, stop) + close_offset
+    return out
+
+
+@pytest.mark.parametrize('chunk', [1, 3, 7, 10, 25])
+def test_wrap_around_keeps_last_capacity_bars(chunk):
+    buf = BarBuffer(10, RATES_DTYPE)
+    stop = 0
+    while stop < 200:
+        # هر دسته مثل copy_rates_from_pos کندل آخر قبلی (در حال شکل‌گیری) را هم دارد
+        start = max(0, stop - 1)
+        buf.append(rates(start, stop + chunk))
+        stop += chunk
+        view = buf.view()
+        expected = np.arange(max(0, stop - 10), stop)
+        assert len(buf) == len(expected)
+        assert view['close'].tolist() == expected.tolist()
+        assert buf.last_time == (stop - 1) * 900
+    assert buf.view(4)['close'].tolist() == list(range(stop - 4, stop))
+
+
+def test_same_time_overwrites_forming_bar_and_old_bars_are_ignored():
+    buf = BarBuffer(5, RATES_DTYPE)
+    assert buf.append(rates(0, 3)) == 3
+    assert buf.append(rates(2, 3, close_offset=0.5)) == 0
+    assert buf.view()['close'].tolist() == [0, 1, 2.5]
+    assert buf.append(rates(0, 2)) == 0
+    assert buf.append(rates(1, 5)) == 2
+    assert buf.view()['time'].tolist() == [0, 900, 1800, 2700, 3600]
+
+
+def test_large_append_and_clear():
+    buf = BarBuffer(4, RATES_DTYPE)
+    buf.append(rates(0, 3))
+    assert buf.append(rates(3, 20)) == 17
+    assert buf.view()['close'].tolist() == [16, 17, 18, 19]
+    buf.clear()
+    assert len(buf) == 0 and buf.last_time is None
+    assert buf.view(3).size == 0
@@ -0,0 +1,91 @@
+import csv
+import threading
+import time
+
+from analytics.csv_writer import CSVWriter
+
+HEADERS = ["dt_utc", "symbol", "value"]
+
+
+def read(fp):
+    with fp.open(newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+class RecordingSink:
+    def __init__(self, gate=None):
+        self.rows = []
+        self.flushes = 0
+        self.gate = gate
+
+    def add(self, kind, row, path):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.rows.append((kind, row["value"], path.name))
+
+    def flush(self):
+        self.flushes += 1
+
+
+def test_close_writes_queue_and_closes_files(tmp_path):
+    writer = CSVWriter(maxsize=100, flush_interval=60, batch_rows=1000)
+    fp = tmp_path / "XAUUSD_signals_2024-01-01.csv"
+    for i in range(10):
+        assert writer.write(fp, HEADERS, {"dt_utc": "2024-01-01 00:00:00", "symbol": "XAUUSD", "value": i})
+    writer.close()
+    assert [row["value"] for row in read(fp)] == [str(i) for i in range(10)]
+    stats = writer.stats()
+    assert (stats["written"], stats["dropped"], stats["open_files"], stats["queue"]) == (10, 0, 0, 0)
+    assert not writer.running
+
+    # بعد از close سطرها دور ریخته و شمرده می‌شوند
+    assert not writer.write(fp, HEADERS, {"value": 99})
+    assert writer.stats()["dropped"] == 1
+    assert len(read(fp)) == 10
+
+
+def test_full_queue_drops_rows(tmp_path):
+    gate = threading.Event()
+    sink = RecordingSink(gate)
+    writer = CSVWriter(maxsize=2, flush_interval=60, batch_rows=1000)
+    writer.sinks.append(sink)
+    fp = tmp_path / "XAUUSD_trades_2024-01-01.csv"
+    assert writer.write(fp, HEADERS, {"value": 0}, "trades")
+    # thread نویسنده داخل sink.add سطر اول منتظر است تا صف پر شود
+    for _ in range(100):
+        if writer.stats()["queue"] == 0:
+            break
+        time.sleep(0.01)
+    results = [writer.write(fp, HEADERS, {"value": i}, "trades") for i in range(1, 6)]
+    assert results == [True, True, False, False, False]
+    assert writer.stats()["dropped"] == 3
+    gate.set()
+    writer.close()
+    assert [row["value"] for row in read(fp)] == ["0", "1", "2"]
+    assert [value for _, value, _ in sink.rows] == [0, 1, 2]
+    assert sink.rows[0] == ("trades", 0, fp.name) and sink.flushes >= 1
+
+
+def test_flush_and_day_rollover(tmp_path):
+    writer = CSVWriter(flush_interval=60, batch_rows=1000)
+    day1 = tmp_path / "XAUUSD_position_events_2024-01-01.csv"
+    day2 = tmp_path / "XAUUSD_position_events_2024-01-02.csv"
+    other = tmp_path / "XAUUSD_signals_2024-01-01.csv"
+    writer.write(day1, HEADERS, {"value": 1})
+    writer.write(other, HEADERS, {"value": 2})
+    assert writer.flush()
+    assert len(read(day1)) == 1 and writer.stats()["open_files"] == 2
+    writer.write(day2, HEADERS, {"value": 3})
+    assert writer.flush()
+    # فایل روز قبل همان نوع بسته می‌شود، فایل نوع دیگر باز می‌ماند
+    assert writer.stats()["open_files"] == 2
+    assert len(read(day2)) == 1
+    writer.close()
+
+
+def test_close_without_thread_writes_directly(tmp_path):
+    writer = CSVWriter()
+    fp = tmp_path / "XAUUSD_signals_2024-01-01.csv"
+    writer._queue.put_nowait((fp, HEADERS, {"value": 7}, None))
+    writer.close()
+    assert read(fp) == [{"dt_utc": "", "symbol": "", "value": "7"}]
@@ -0,0 +1,177 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import clock_gold
+import mt5_sim_gold
+from mt5_connector_gold import MT5ConnectorGold, FillingModeCache
+from mt5_gateway_gold import MT5Gateway, gateway, is_unknown_outcome, mt5
+
+
+class FakeTerminal:
+    """ماژول MetaTrader5 ساختگی با order_send کند یا خطای IPC"""
+
+    def __init__(self, delay=0.0, ipc_failures=0):
+        self.delay = delay
+        self.ipc_failures = ipc_failures
+        self.calls = []
+        self.error = (1, 'Success')
+        self.sent = threading.Event()
+
+    def initialize(self, *args, **kwargs):
+        self.calls.append('initialize')
+        return True
+
+    def shutdown(self):
+        self.calls.append('shutdown')
+
+    def last_error(self):
+        return self.error
+
+    def _maybe_fail(self, name):
+        self.calls.append(name)
+        if self.ipc_failures:
+            self.ipc_failures -= 1
+            self.error = (-10004, 'No IPC connection')
+            return True
+        self.error = (1, 'Success')
+        return False
+
+    def order_send(self, request):
+        if self._maybe_fail('order_send'):
+            return None
+        time.sleep(self.delay)
+        self.sent.set()
+        return SimpleNamespace(retcode=10009, order=1, comment='done')
+
+    def positions_get(self, **kwargs):
+        return None if self._maybe_fail('positions_get') else ()
+
+
+@pytest.fixture
+def make_gateway():
+    gateways = []
+
+    def make(module, **kwargs):
+        kwargs.setdefault('reinit_interval', 0)
+        gw = MT5Gateway(module, timeout=1.0, order_timeout=kwargs.pop('order_timeout', 1.0), **kwargs)
+        gateways.append(gw)
+        gw.call('initialize')
+        return gw
+
+    yield make
+    for gw in gateways:
+        gw.stop(1)
+
+
+def test_order_send_timeout_is_not_retried(make_gateway):
+    terminal = FakeTerminal(delay=0.3)
+    gw = make_gateway(terminal, order_timeout=0.05)
+    result = gw.call('order_send', {'action': 1})
+    assert is_unknown_outcome(result) and 'timed out' in result.comment
+    assert result.request == {'action': 1}
+    assert terminal.sent.wait(2)
+    # خواندن بعدی پشت همان order_send در صف gateway اجرا می‌شود
+    assert gw.call('positions_get') == ()
+    assert terminal.calls.count('order_send') == 1
+
+
+def test_ipc_error_retries_reads_but_not_orders(make_gateway):
+    terminal = FakeTerminal(ipc_failures=1)
+    gw = make_gateway(terminal)
+    assert gw.call('positions_get') == ()
+    assert terminal.calls == ['initialize', 'positions_get', 'shutdown', 'initialize', 'positions_get']
+
+    terminal.calls.clear()
+    terminal.ipc_failures = 1
+    result = gw.call('order_send', {'action': 1})
+    assert is_unknown_outcome(result) and 'IPC' in result.comment
+    assert terminal.calls == ['order_send', 'shutdown', 'initialize']
+
+
+
+def test_order_send_ipc_error_without_reconnect_is_unknown(make_gateway):
+    terminal = FakeTerminal(ipc_failures=2)
+    gw = make_gateway(terminal, reinit_interval=60)
+    first = gw.call('order_send', {'action': 1})
+    # اتصال مجدد دوم با reinit_interval محدود شده است؛ باز هم None برگردانده نمی‌شود
+    second = gw.call('order_send', {'action': 1})
+    assert is_unknown_outcome(first) and is_unknown_outcome(second)
+    assert terminal.calls == ['initialize', 'order_send', 'shutdown', 'initialize', 'order_send']
+    assert gw.stats['reinitialize'] == 1
+
+    terminal.ipc_failures = 1
+    terminal.initialize = lambda *args, **kwargs: False
+    gw._last_reinit = float('-inf')
+    assert is_unknown_outcome(gw.call('order_send', {'action': 1}))
+    assert terminal.calls.count('order_send') == 3
+
+def test_reads_are_coalesced_within_window(make_gateway):
+    terminal = FakeTerminal()
+    gw = make_gateway(terminal, coalesce_window=60)
+    gw.call('positions_get', symbol='XAUUSD')
+    gw.call('positions_get', symbol='XAUUSD')
+    assert terminal.calls.count('positions_get') == 1
+    gw.call('order_send', {'action': 1})
+    gw.call('positions_get', symbol='XAUUSD')
+    assert terminal.calls.count('positions_get') == 2
+
+
+@pytest.fixture
+def sim_broker(bars, monkeypatch):
+    broker = mt5_sim_gold.install(mt5_sim_gold.SimBroker.from_bars(bars(300, 1), start_tick=4 * 210))
+    previous = clock_gold.set_clock(mt5_sim_gold.simulated_clock(broker))
+    yield broker
+    clock_gold.set_clock(previous)
+    mt5_sim_gold.install(None)
+
+
+def test_connector_confirms_order_after_timeout(sim_broker, monkeypatch):
+    send = mt5_sim_gold.order_send
+
+    def slow_send(request):
+        time.sleep(0.3)
+        return send(request)
+
+    monkeypatch.setattr(mt5_sim_gold, 'order_send', slow_send)
+    monkeypatch.setattr(gateway, 'order_timeout', 0.05)
+    conn = MT5ConnectorGold()
+    conn.filling_cache = FillingModeCache()
+    assert conn.initialize()
+    tick = mt5.symbol_info_tick(conn.symbol)
+    result = conn.open_buy_position(tick, tick.ask - 5, None, comment='test')
+    assert sim_broker.calls['order_send'] == 1
+    assert len(sim_broker.positions) == 1
+    assert result.retcode == mt5_sim_gold.TRADE_RETCODE_DONE
+    assert result.order == sim_broker.positions[0].ticket
+
+
+def test_connector_unknown_outcome_uses_snapshot_not_pre_send_fetch(sim_broker, monkeypatch):
+    conn = MT5ConnectorGold()
+    conn.filling_cache = FillingModeCache()
+    assert conn.initialize()
+    tick = conn.snapshot().tick
+    first = conn.open_buy_position(tick, tick.ask - 5, None, comment='test')
+    assert first.retcode == mt5_sim_gold.TRADE_RETCODE_DONE
+
+    send = mt5_sim_gold.order_send
+
+    def slow_send(request):
+        time.sleep(0.3)
+        return send(request)
+
+    monkeypatch.setattr(mt5_sim_gold, 'order_send', slow_send)
+    monkeypatch.setattr(gateway, 'order_timeout', 0.05)
+    monkeypatch.setattr(gateway, 'coalesce_window', -1)  # هر خواندن به broker برسد
+    snap = conn.snapshot()
+    tick = snap.tick
+    assert len(snap.own_positions(conn.magic)) == 1
+    reads = sim_broker.calls['positions_get']
+    result = conn.open_buy_position(tick, tick.ask - 5, None, comment='test')
+    # فقط یک positions_get بعد از نتیجه نامعلوم، نه قبل از ارسال
+    assert sim_broker.calls['positions_get'] == reads + 1
+    assert len(sim_broker.positions) == 2
+    assert result.retcode == mt5_sim_gold.TRADE_RETCODE_DONE
+    assert result.order == sim_broker.positions[1].ticket != first.order
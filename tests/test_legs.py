@@ -0,0 +1,69 @@
+import pytest
+
+from get_legs_gold import get_legs, get_legs_multi, LegTracker, UP, DOWN
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('threshold', [4, 7, 12])
+def test_numpy_engine_matches_pandas(bars, seed, threshold):
+    data = bars(1500, seed)
+    expected = get_legs(data, threshold, engine='pandas')
+    legs = get_legs(data, threshold, engine='numpy')
+    assert len(expected) > 10
+    assert legs == expected
+
+
+def test_leg_labels_and_positions(bars):
+    data = bars(600, 3)
+    for leg in get_legs(data, 6):
+        assert leg.direction in (UP, DOWN)
+        assert data.index[leg.start_pos] == leg.start
+        assert data.index[leg.end_pos] == leg.end
+        assert leg.start_pos < leg.end_pos
+
+
+def test_unknown_engine(bars):
+    with pytest.raises(ValueError):
+        get_legs(bars(10), 5, engine='numba')
+
+
+@pytest.mark.parametrize('seed', [0, 4])
+def test_leg_tracker_matches_full_run(bars, seed):
+    data = bars(1200, seed)
+    expected = get_legs(data, 6)
+
+    tracker = LegTracker(6)
+    for t, o, h, l, c in zip(data.index, data['open'], data['high'], data['low'], data['close']):
+        tracker.update(t, o, h, l, c)
+    assert tracker.legs == expected
+
+    # دسته‌های با اندازه نامنظم (کوچک‌تر و بزرگ‌تر از _SMALL_CHUNK)
+    tracker = LegTracker(6)
+    pos = 0
+    for size in [1, 3, 8, 9, 50, 2, 400] * 10:
+        chunk = data.iloc[pos:pos + size]
+        tracker.extend(chunk.index, chunk['open'].to_numpy(), chunk['high'].to_numpy(),
+                       chunk['low'].to_numpy(), chunk['close'].to_numpy())
+        pos += size
+    assert tracker.legs == expected
+
+
+def test_leg_tracker_ignores_old_bars_and_trims(bars):
+    data = bars(1500, 5)
+    expected = get_legs(data, 5)
+    tracker = LegTracker.from_history(data.iloc[:1000], threshold=5, max_legs=4)
+    last = data.iloc[999]
+    tracker.update(data.index[999], last['open'], last['high'] + 50, last['low'], last['close'])
+    for t, row in data.iloc[1000:].iterrows():
+        tracker.update(t, row['open'], row['high'], row['low'], row['close'])
+    assert 4 <= len(tracker.legs) <= 8
+    assert tracker.legs == expected[-len(tracker.legs):]
+
+
+def test_get_legs_multi_matches_single_threshold_runs(bars):
+    data = bars(2000, 6)
+    thresholds = [3, 4.5, 6, 10, 15]
+    result = get_legs_multi(data, thresholds)
+    assert list(result) == thresholds
+    for threshold in thresholds:
+        assert result[threshold] == get_legs(data, threshold, engine='pandas')
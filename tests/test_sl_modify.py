@@ -0,0 +1,116 @@
+from types import SimpleNamespace
+
+import pytest
+
+import clock_gold
+from clock_gold import SimulatedClock
+from mt5_gateway_gold import mt5
+from sl_modify_gold import SLModifyScheduler
+
+
+class RecordingConn:
+    """connector با modify_sl_tp که درخواست‌ها را ثبت می‌کند"""
+
+    def __init__(self, retcode=None):
+        self.sent = []
+        self.retcode = mt5.TRADE_RETCODE_DONE if retcode is None else retcode
+
+    def modify_sl_tp(self, ticket, new_sl=None, new_tp=None):
+        self.sent.append((ticket, new_sl))
+        return SimpleNamespace(retcode=self.retcode)
+
+
+@pytest.fixture
+def clock():
+    clk = SimulatedClock(1000.0)
+    previous = clock_gold.set_clock(clk)
+    yield clk
+    clock_gold.set_clock(previous)
+
+
+def scheduler(conn, **kwargs):
+    params = dict(min_step_price=0.1, min_step_r=0.0, cooldown=1.0, max_per_second=2)
+    params.update(kwargs)
+    return SLModifyScheduler(conn, **params)
+
+
+def test_min_step_and_coalescing(clock):
+    conn = RecordingConn()
+    s = scheduler(conn)
+    assert not s.propose(1, True, 100.05, current_sl=100.0, risk=10)
+    assert s.propose(1, True, 100.5, current_sl=100.0, risk=10)
+    assert s.propose(1, True, 100.3, current_sl=100.0, risk=10)  # بدتر از pending: نگه داشته نمی‌شود
+    assert s.propose(1, True, 101.0, current_sl=100.0, risk=10)
+    s.flush()
+    assert conn.sent == [(1, 101.0)]
+    # گام بعدی نسبت به آخرین SL تایید شده سنجیده می‌شود
+    assert not s.propose(1, True, 101.05, current_sl=100.0, risk=10)
+    assert s.stats['suppressed_step'] == 2 and s.stats['coalesced'] == 2
+
+
+def test_sell_direction_step(clock):
+    s = scheduler(RecordingConn(), min_step_r=0.1)
+    assert not s.propose(1, False, 99.5, current_sl=100.0, risk=10)  # حداقل گام 1.0
+    assert s.propose(1, False, 98.9, current_sl=100.0, risk=10)
+
+
+def test_cooldown_per_ticket(clock):
+    conn = RecordingConn()
+    s = scheduler(conn, max_per_second=100)
+    s.propose(1, True, 101.0, current_sl=100.0, risk=10)
+    s.flush()
+    s.propose(1, True, 102.0, current_sl=101.0, risk=10)
+    s.propose(2, True, 51.0, current_sl=50.0, risk=10)
+    clock.advance(0.5)
+    assert [t for t, *_ in s.flush()] == [2]
+    assert s.pending == 1 and s.stats['suppressed_cooldown'] == 1
+    s.propose(1, True, 103.0, current_sl=101.0, risk=10)  # pending با آخرین مقدار جایگزین می‌شود
+    clock.advance(0.5)
+    s.flush()
+    assert conn.sent == [(1, 101.0), (2, 51.0), (1, 103.0)]
+    assert s.pending == 0
+
+
+def test_token_bucket_limits_global_rate(clock):
+    conn = RecordingConn()
+    s = scheduler(conn, cooldown=0.0, max_per_second=2)
+    for ticket in range(1, 6):
+        s.propose(ticket, True, 101.0, current_sl=100.0, risk=10)
+    assert len(s.flush()) == 2
+    assert s.stats['suppressed_budget'] == 3
+    clock.advance(0.25)  # نیم token
+    assert s.flush() == []
+    clock.advance(0.25)
+    assert len(s.flush()) == 1
+    clock.advance(10)  # بودجه بیشتر از max_per_second جمع نمی‌شود
+    assert len(s.flush()) == 2
+    assert [t for t, _ in conn.sent] == [1, 2, 3, 4, 5]
+    assert s.stats['sent'] == 5 and s.stats['done'] == 5
+
+
+def test_flush_single_ticket_and_rejections(clock):
+    conn = RecordingConn(retcode=10016)
+    s = scheduler(conn, max_per_second=10)
+    s.propose(1, True, 101.0, current_sl=100.0, risk=10)
+    s.propose(2, True, 51.0, current_sl=50.0, risk=10)
+    assert [t for t, *_ in s.flush(2)] == [2]
+    assert s.pending == 1 and s.stats['rejected'] == 1
+    # SL رد شده مبنای حداقل گام نمی‌شود
+    clock.advance(2)
+    assert s.propose(2, True, 50.5, current_sl=50.0, risk=10)
+
+
+def test_retain_drops_closed_tickets(clock):
+    s = scheduler(RecordingConn())
+    s.propose(1, True, 101.0, current_sl=100.0, risk=10)
+    s.propose(2, True, 51.0, current_sl=50.0, risk=10)
+    s.retain([2])
+    assert [t for t, *_ in s.flush()] == [2]
+
+
+def test_flush_uses_given_connector(clock):
+    shared, engine = RecordingConn(), RecordingConn()
+    s = scheduler(shared)
+    s.propose(1, True, 101.0, current_sl=100.0, risk=10)
+    s.flush(mt5_conn=engine)
+    assert shared.sent == [] and engine.sent == [(1, 101.0)]
@@ -0,0 +1,110 @@
+import csv
+
+from analytics.csv_writer import CSVWriter
+from analytics.store import AnalyticsStore, SCHEMA, import_history
+from analytics.tick_recorder import TickRecorder
+
+SIGNAL_HEADERS = [name for name, _ in SCHEMA["signals"]]
+TRADE_HEADERS = [name for name, _ in SCHEMA["trades"]]
+
+
+def signal(minute, direction="buy"):
+    return {"dt_utc": f"2024-01-02 10:{minute:02d}:00", "symbol": "XAUUSD", "strategy": "swing",
+            "direction": direction, "entry": 2000 + minute, "sl": 1990}
+
+
+def append(fp, headers, rows):
+    new = not fp.exists()
+    fp.parent.mkdir(parents=True, exist_ok=True)
+    with fp.open("a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=headers, extrasaction="ignore")
+        if new:
+            writer.writeheader()
+        writer.writerows(rows)
+
+
+def test_import_history_is_incremental(tmp_path):
+    raw = tmp_path / "raw"
+    store = AnalyticsStore(tmp_path / "analytics.db")
+    day1 = raw / "signals" / "XAUUSD_signals_2024-01-01.csv"
+    day2 = raw / "signals" / "XAUUSD_signals_2024-01-02.csv"
+    append(day1, SIGNAL_HEADERS, [signal(0), signal(1)])
+    append(day2, SIGNAL_HEADERS, [signal(2)])
+    assert import_history(store, raw)["signals"] == 3
+
+    # فایل بدون تغییر رد می‌شود و از فایل بزرگ‌تر شده فقط سطرهای جدید وارد می‌شوند
+    assert import_history(store, raw)["signals"] == 0
+    append(day2, SIGNAL_HEADERS, [signal(3, "sell"), signal(4)])
+    assert import_history(store, raw, kinds=["signals"]) == {"signals": 2}
+    assert [r["entry"] for r in store.signals()] == [2000, 2001, 2002, 2003, 2004]
+    assert store.signals(since="2024-01-02 10:03:00")[0]["direction"] == "sell"
+
+    # پایگاه داده جدید روی همان فایل‌ها همه را دوباره وارد می‌کند
+    assert import_history(AnalyticsStore(tmp_path / "other.db"), raw)["signals"] == 5
+    store.close()
+
+
+def test_live_rows_are_not_imported_again(tmp_path):
+    raw = tmp_path / "raw"
+    fp = raw / "trades" / "XAUUSD_trades_2024-01-02.csv"
+    store = AnalyticsStore(tmp_path / "analytics.db")
+    # سطر نوشته شده قبل از فعال شدن store
+    append(fp, TRADE_HEADERS, [{"dt_utc": "2024-01-02 09:00:00", "symbol": "XAUUSD", "side": "buy", "order": 1}])
+
+    writer = CSVWriter(flush_interval=60)
+    writer.sinks.append(store)
+    fp.parent.mkdir(parents=True, exist_ok=True)
+    for order in (2, 3):
+        writer.write(fp, TRADE_HEADERS, {"dt_utc": "2024-01-02 10:00:00", "symbol": "XAUUSD",
+                                         "side": "buy", "order": order}, "trades")
+    assert writer.flush()
+    writer.write(fp, TRADE_HEADERS, {"dt_utc": "2024-01-02 11:00:00", "symbol": "XAUUSD",
+                                     "side": "sell", "order": 4}, "trades")
+    writer.close()
+
+    assert [t["order"] for t in store.trades()] == [1, 2, 3, 4]
+    assert import_history(store, raw)["trades"] == 0
+    # حالت همزمان (insert با مسیر فایل)
+    append(fp, TRADE_HEADERS, [{"dt_utc": "2024-01-02 12:00:00", "symbol": "XAUUSD", "order": 5}])
+    store.insert("trades", [{"dt_utc": "2024-01-02 12:00:00", "symbol": "XAUUSD", "order": 5}], fp)
+    assert import_history(store, raw)["trades"] == 0
+    assert [t["order"] for t in store.trades()] == [1, 2, 3, 4, 5]
+    store.close()
+
+
+def test_binary_ticks_live_and_import(tmp_path):
+    raw = tmp_path / "raw"
+    store = AnalyticsStore(tmp_path / "analytics.db")
+    recorder = TickRecorder(raw / "market", flush_interval=60)
+    recorder.sinks.append(store)
+    base = 1704189600000  # 2024-01-02 10:00:00 UTC
+    for i in range(3):
+        recorder.record("XAUUSD", base + i * 1000, 2000.0 + i, 2000.3 + i, None, 6, 0.01, 2)
+    recorder.flush()
+    recorder.record("XAUUSD", base + 5000, 2010.0, 2010.3, None, 6, 0.01, 2)
+    recorder.close()
+
+    rows = store.query("SELECT dt_utc, bid, spread_points, last FROM market ORDER BY ts")
+    assert [r["bid"] for r in rows] == [2000.0, 2001.0, 2002.0, 2010.0]
+    assert rows[0]["dt_utc"] == "2024-01-02 10:00:00" and rows[0]["last"] is None
+    assert round(rows[0]["spread_points"]) == 30
+    # فایل CSV تبدیل شده کنار فایل باینری دوباره وارد نمی‌شود
+    (raw / "market" / "XAUUSD_ticks_2024-01-02.csv").write_text("dt_utc,bid\n2024-01-02 10:00:00,1\n")
+    assert import_history(store, raw)["market"] == 0
+
+    other = AnalyticsStore(tmp_path / "other.db")
+    assert import_history(other, raw)["market"] == 4
+    other.close()
+    store.close()
+
+
+def test_signals_with_trades(tmp_path):
+    store = AnalyticsStore(tmp_path / "analytics.db")
+    store.insert("signals", [signal(0), signal(30, "sell")])
+    store.insert("trades", [
+        {"dt_utc": "2024-01-02 10:02:00", "symbol": "XAUUSD", "side": "buy", "order": 11, "retcode": 10009},
+        {"dt_utc": "2024-01-02 10:03:00", "symbol": "XAUUSD", "side": "buy", "order": 12, "retcode": 10009},
+    ])
+    rows = store.signals_with_trades(window=300)
+    assert [(r["direction"], r["trade_order"]) for r in rows] == [("buy", 11), ("sell", None)]
+    store.close()
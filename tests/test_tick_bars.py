@@ -0,0 +1,177 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import mt5_sim_gold
+from mt5_connector_gold import MT5ConnectorGold
+from mt5_sim_gold import SimBroker, TICKS_DTYPE
+from tick_bars_gold import TickBarAggregator, TickBarFeed, RATES_DTYPE
+from utils_gold import tick_cursor
+
+FIELDS = ('time', 'open', 'high', 'low', 'close', 'tick_volume', 'spread')
+
+
+def resample(rates, seconds):
+    """تجمیع کندل‌های M15 بروکر به تایم‌فریم بزرگ‌تر (مرجع کندل‌های ساخته شده از tick)"""
+    keys = rates['time'] - rates['time'] % seconds
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    out = np.zeros(len(starts), dtype=RATES_DTYPE)
+    out['time'] = keys[starts]
+    out['open'] = rates['open'][starts]
+    out['high'] = np.maximum.reduceat(rates['high'], starts)
+    out['low'] = np.minimum.reduceat(rates['low'], starts)
+    out['close'] = rates['close'][np.r_[starts[1:], len(rates)] - 1]
+    out['tick_volume'] = np.add.reduceat(rates['tick_volume'], starts)
+    out['spread'] = np.maximum.reduceat(rates['spread'], starts)
+    return out
+
+
+def assert_same_bars(actual, expected):
+    assert len(actual) == len(expected)
+    for name in FIELDS:
+        np.testing.assert_array_equal(actual[name], expected[name], err_msg=name)
+
+
+def feed(broker, aggregator, step):
+    """پخش tickهای بروکر با گام‌های step تایی و اعمال tickهای جدید به aggregator"""
+    closed = []
+    more = True
+    while more:
+        more = broker.advance(step)
+        ticks = broker.copy_ticks_range(aggregator.last_msc // 1000, broker.now)
+        closed += aggregator.process(ticks[ticks['time_msc'] > aggregator.last_msc])
+    return closed
+
+
+@pytest.mark.parametrize('step', [1, 3, 9])
+def test_bars_from_ticks_match_broker_bars(bars, step):
+    data = bars(400, 2)
+    broker = SimBroker.from_bars(data, start_tick=4 * 150 + 2)  # وسط یک کندل و یک ساعت
+    aggregator = TickBarAggregator(('M15', 'H1'), capacity=1000, point=broker.point)
+    history = broker.copy_rates_from_pos(0, 1000)
+    aggregator.seed('M15', history)
+    aggregator.seed('H1', resample(history, 3600))
+    aggregator.last_msc = broker.tick().time_msc
+
+    closed = feed(broker, aggregator, step)
+
+    rates = broker.copy_rates_from_pos(0, 1000)
+    assert_same_bars(aggregator.bars('M15'), rates)
+    assert_same_bars(aggregator.bars('H1'), resample(rates, 3600))
+    assert [bar['time'] for name, bar in closed if name == 'M15'] == rates['time'][150:-1].tolist()
+    assert aggregator.bars('M15', 5)['time'].tolist() == rates['time'][-5:].tolist()
+
+
+def test_advance_to_closes_bars_without_next_tick(bars):
+    data = bars(20, 3)
+    broker = SimBroker.from_bars(data)
+    aggregator = TickBarAggregator(('M5', 'M15'), capacity=50, point=broker.point)
+    seen = []
+    aggregator.listeners.append(lambda name, bar: seen.append((name, bar['time'])))
+    broker.advance(3)  # تا tick بسته شدن کندل اول (ثانیه 899)
+    aggregator.process(broker.copy_ticks_range(0, broker.now))
+    first = int(data.index[0].timestamp())
+    assert aggregator.advance_to(first + 899) == []
+    closed = aggregator.advance_to(first + 900)
+    assert [(name, bar['time']) for name, bar in closed] == [('M5', first + 600), ('M15', first)]
+    assert seen[-2:] == [('M5', first + 600), ('M15', first)]
+    bar = aggregator.bars('M15')[-1]
+    assert (bar['open'], bar['close'], bar['tick_volume']) == (data['open'].iloc[0], data['close'].iloc[0], 4)
+
+
+def test_out_of_order_and_ask_only_ticks_are_ignored():
+    aggregator = TickBarAggregator(('M1',), capacity=10, point=0.01)
+    aggregator.on_tick(60_000, 100.0, 100.3, flags=6)
+    aggregator.on_tick(61_000, 101.0, 101.3, flags=4)  # فقط ask تغییر کرده
+    aggregator.on_tick(59_000, 90.0, 90.3, flags=6)    # قدیمی‌تر از آخرین tick
+    aggregator.on_tick(62_000, 99.0, 99.5, flags=6)
+    bar = aggregator.bars('M1')[-1]
+    assert (bar['open'], bar['high'], bar['low'], bar['close']) == (100.0, 100.0, 99.0, 99.0)
+    assert (bar['tick_volume'], bar['spread']) == (2, 50)
+
+
+def test_hand_computed_bars_with_boundary_millisecond_and_empty_interval():
+    aggregator = TickBarAggregator(('M1', 'M5'), capacity=10, point=0.01)
+    t0 = 1_704_067_200  # شروع یک کندل M5
+    ticks = np.zeros(6, dtype=TICKS_DTYPE)
+    ticks['time_msc'] = [t0 * 1000, t0 * 1000 + 59_999, (t0 + 60) * 1000, (t0 + 60) * 1000,
+                         (t0 + 180) * 1000 + 500, (t0 + 180) * 1000 + 700]
+    ticks['bid'] = [10.0, 11.0, 9.0, 9.5, 12.0, 12.0]
+    ticks['ask'] = [10.1, 11.3, 9.1, 9.6, 12.2, 12.1]
+    ticks['flags'] = [6, 6, 6, 6, 6, 4]  # tick آخر فقط ask
+    closed = aggregator.process(ticks)
+    # دقیقه سوم (t0 + 120) بدون tick است و کندلی ندارد
+    assert [(name, bar['time']) for name, bar in closed] == [('M1', t0), ('M1', t0 + 60)]
+    m1 = aggregator.bars('M1')
+    assert m1['time'].tolist() == [t0, t0 + 60, t0 + 180]
+    assert m1['open'].tolist() == [10.0, 9.0, 12.0]
+    assert m1['high'].tolist() == [11.0, 9.5, 12.0]
+    assert m1['low'].tolist() == [10.0, 9.0, 12.0]
+    assert m1['close'].tolist() == [11.0, 9.5, 12.0]
+    assert m1['tick_volume'].tolist() == [2, 2, 1]
+    assert m1['spread'].tolist() == [30, 10, 20]
+    m5 = aggregator.bars('M5')[-1]
+    assert (m5['time'], m5['open'], m5['high'], m5['low'], m5['close']) == (t0, 10.0, 12.0, 9.0, 12.0)
+    assert (m5['tick_volume'], m5['spread']) == (5, 30)
+    assert (aggregator.last_msc, aggregator.last_seen) == ((t0 + 180) * 1000 + 700, 1)
+
+    assert aggregator.advance_to(t0 + 239) == []
+    assert [(name, bar['time']) for name, bar in aggregator.advance_to(t0 + 240)] == [('M1', t0 + 180)]
+    # tick دیر رسیده همان کندل بسته شده را ادامه می‌دهد
+    aggregator.on_tick((t0 + 239) * 1000 + 900, 12.5, 12.6)
+    last = aggregator.bars('M1')[-1]
+    assert len(aggregator.bars('M1')) == 3
+    assert (last['time'], last['high'], last['close'], last['tick_volume']) == (t0 + 180, 12.5, 12.5, 2)
+
+
+class TickSource:
+    """mt5_conn ساختگی با get_ticks_since واقعی روی tickهایی که به تدریج به ترمینال می‌رسند"""
+
+    symbol = 'XAUUSD'
+    iran_tz = None
+    get_ticks_since = MT5ConnectorGold.get_ticks_since
+
+    def __init__(self, monkeypatch):
+        self.ticks = np.zeros(0, dtype=TICKS_DTYPE)
+        monkeypatch.setattr(mt5_sim_gold, 'copy_ticks_from', self.copy_ticks_from)
+
+    def copy_ticks_from(self, symbol, date_from, count, flags=None):
+        return self.ticks[self.ticks['time'] >= date_from][:count]
+
+    def get_symbol_spec(self):
+        return SimpleNamespace(point=0.01)
+
+    def arrive(self, *ticks):
+        rows = np.zeros(len(ticks), dtype=TICKS_DTYPE)
+        for row, (msc, bid) in zip(rows, ticks):
+            row['time'], row['time_msc'], row['bid'], row['ask'], row['flags'] = msc // 1000, msc, bid, bid + 0.2, 6
+        self.ticks = np.concatenate([self.ticks, rows])
+
+
+def test_ticks_sharing_cursor_millisecond_are_not_lost(monkeypatch):
+    source = TickSource(monkeypatch)
+    t0 = 1_704_067_200_000  # شروع یک کندل M15
+    feed = TickBarFeed(source, timeframes=('M15',), capacity=10)
+    feed.aggregator.last_msc = t0 - 1
+
+    source.arrive((t0, 2000.0), (t0 + 5250, 2001.0), (t0 + 5250, 2000.5))
+    feed.update()
+    assert (feed.aggregator.last_msc, feed.aggregator.last_seen) == (t0 + 5250, 2)
+    # tick سوم همان میلی‌ثانیه بعد از خواندن قبلی می‌رسد
+    source.arrive((t0 + 5250, 1999.0), (t0 + 899_999, 2000.2))
+    feed.update()
+    assert feed.update() == []  # بدون tick جدید چیزی دوباره اعمال نمی‌شود
+
+    bar = feed.bars('M15')[-1]
+    assert bar['time'] == t0 // 1000
+    assert (bar['open'], bar['high'], bar['low'], bar['close']) == (2000.0, 2001.0, 1999.0, 2000.2)
+    assert (bar['tick_volume'], bar['spread']) == (5, 20)
+
+
+def test_tick_cursor_counts_ticks_at_last_millisecond():
+    ticks = np.zeros(4, dtype=TICKS_DTYPE)
+    ticks['time_msc'] = [10, 12, 12, 12]
+    assert tick_cursor(ticks, 5, 0) == (12, 3)
+    assert tick_cursor(ticks[1:2], 12, 4) == (12, 5)
+    assert tick_cursor(ticks[:0], 12, 4) == (12, 4)
@@ -0,0 +1,221 @@
+"""
+ساخت کندل از tick برای چند تایم‌فریم به صورت همزمان
+
+TickBarAggregator با هر tick (bid مثل کندل‌های MT5) کندل در حال شکل‌گیری همه
+تایم‌فریم‌ها را به‌روز می‌کند؛ کار هر tick برای هر تایم‌فریم ثابت است (چند مقایسه).
+با عبور از مرز کندل، کندل قبلی در یک BarBuffer با همان dtype خروجی copy_rates_*
+ذخیره و رویداد کندل جدید به listenerها داده می‌شود. advance_to(server_time) کندل‌هایی
+را که زمانشان تمام شده بدون منتظر ماندن برای tick بعدی می‌بندد (tick دیر رسیده همان
+کندل آن را دوباره باز می‌کند).
+
+برای سازگاری با کندل‌های خود بروکر، تاریخچه هر تایم‌فریم با copy_rates_from_pos
+seed می‌شود و کندل آخر (در حال شکل‌گیری) با tickها ادامه پیدا می‌کند:
+time شروع کندل به زمان سرور، tick_volume تعداد tickهای تغییر bid و spread بیشینه
+اسپرد کندل (پوینت) است.
+
+    feed = TickBarFeed(mt5_conn, ('M5', 'M15', 'H1'))
+    feed.seed()
+    for name, bar in feed.update():   # tickهای جدید با یک copy_ticks_from
+        ...
+    feed.aggregator.advance_to(server_now)
+    frame = feed.bar_frame('M15', 120)
+"""
+
+import numpy as np
+
+from bar_buffer_gold import BarBuffer
+from barframe_gold import BarFrame
+from metatrader5_config_gold import TICK_BARS_CONFIG
+from mt5_gateway_gold import mt5
+from utils_gold import tick_cursor
+
+TIMEFRAME_SECONDS = {
+    'M1': 60, 'M5': 300, 'M15': 900, 'M30': 1800, 'H1': 3600, 'H4': 14400, 'D1': 86400,
+}
+
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8'),
+])
+
+TICK_FLAG_BID = 2
+
+
+class _TimeframeBars:
+    """کندل در حال شکل‌گیری (مقادیر اسکالر) و کندل‌های بسته شده یک تایم‌فریم"""
+
+    __slots__ = ('name', 'seconds', 'buffer', 'time', 'open', 'high', 'low', 'close', 'volume', 'spread')
+
+    def __init__(self, name, seconds, capacity):
+        self.name = name
+        self.seconds = seconds
+        self.buffer = BarBuffer(capacity, RATES_DTYPE)
+        self.time = None
+
+    def row(self):
+        out = np.zeros(1, dtype=RATES_DTYPE)
+        out[0] = (self.time, self.open, self.high, self.low, self.close, self.volume, self.spread, 0)
+        return out
+
+
+class TickBarAggregator:
+    """کندل‌های OHLC و tick_volume چند تایم‌فریم از یک جریان tick"""
+
+    def __init__(self, timeframes=None, capacity=None, point=0.01):
+        cfg = TICK_BARS_CONFIG
+        timeframes = timeframes or cfg['timeframes']
+        capacity = capacity or cfg['capacity']
+        self.point = point
+        self._frames = [_TimeframeBars(name, TIMEFRAME_SECONDS[name], capacity) for name in timeframes]
+        self._by_name = {f.name: f for f in self._frames}
+        self.listeners = []  # listener(name, bar) برای هر کندل بسته شده
+        self.last_msc = None
+        self.last_seen = 0  # تعداد tickهای دریافت شده با زمان last_msc (cursor get_ticks_since)
+        self.ticks = 0
+
+    @property
+    def timeframes(self):
+        return [f.name for f in self._frames]
+
+    def seed(self, name, rates):
+        """
+        تاریخچه کندل‌ها از خروجی copy_rates_* (کندل آخر در حال شکل‌گیری فرض می‌شود و با
+        tickهای بعدی ادامه پیدا می‌کند)
+        """
+        frame = self._by_name[name]
+        if rates is None or len(rates) == 0:
+            return
+        frame.buffer.clear()
+        frame.buffer.append(rates[:-1])
+        last = rates[-1]
+        frame.time = int(last['time'])
+        frame.open, frame.high = float(last['open']), float(last['high'])
+        frame.low, frame.close = float(last['low']), float(last['close'])
+        frame.volume, frame.spread = int(last['tick_volume']), int(last['spread'])
+
+    def _close(self, frame, closed):
+        frame.buffer.append(frame.row())
+        bar = {'time': frame.time, 'open': frame.open, 'high': frame.high, 'low': frame.low,
+               'close': frame.close, 'tick_volume': frame.volume, 'spread': frame.spread}
+        closed.append((frame.name, bar))
+        for listener in self.listeners:
+            listener(frame.name, bar)
+
+    def on_tick(self, time_msc, bid, ask, flags=None, closed=None):
+        """
+        اعمال یک tick به همه تایم‌فریم‌ها؛ خروجی لیست (name, bar) کندل‌هایی که با این tick
+        بسته شدند. tickهای بدون تغییر bid (flags بدون TICK_FLAG_BID) و tickهای قدیمی‌تر از
+        آخرین tick پردازش شده نادیده گرفته می‌شوند.
+        """
+        if closed is None:
+            closed = []
+        if flags is not None and flags and not flags & TICK_FLAG_BID:
+            return closed
+        if self.last_msc is not None and time_msc < self.last_msc:
+            return closed
+        self.last_msc = time_msc
+        self.ticks += 1
+        seconds = time_msc // 1000
+        spread = int(round((ask - bid) / self.point))
+        for frame in self._frames:
+            start = seconds - seconds % frame.seconds
+            if frame.time is None and start == frame.buffer.last_time:
+                # tick دیر رسیده کندلی که advance_to بسته است
+                frame.time = start
+            if frame.time == start:
+                if bid > frame.high:
+                    frame.high = bid
+                elif bid < frame.low:
+                    frame.low = bid
+                frame.close = bid
+                frame.volume += 1
+                if spread > frame.spread:
+                    frame.spread = spread
+                continue
+            if frame.time is not None:
+                if start < frame.time:
+                    continue
+                self._close(frame, closed)
+            frame.time = start
+            frame.open = frame.high = frame.low = frame.close = bid
+            frame.volume = 1
+            frame.spread = spread
+        return closed
+
+    def process(self, ticks):
+        """اعمال tickهای یک structured array خروجی copy_ticks_*؛ خروجی کندل‌های بسته شده"""
+        closed = []
+        if ticks is None or len(ticks) == 0:
+            return closed
+        cursor = tick_cursor(ticks, self.last_msc, self.last_seen)
+        flags = ticks['flags'].tolist() if 'flags' in ticks.dtype.names else [None] * len(ticks)
+        for msc, bid, ask, flag in zip(ticks['time_msc'].tolist(), ticks['bid'].tolist(),
+                                       ticks['ask'].tolist(), flags):
+            self.on_tick(msc, bid, ask, flag, closed)
+        if self.last_msc is None or cursor[0] >= self.last_msc:
+            # tickهای نادیده گرفته شده (فقط ask) هم دوباره خوانده نمی‌شوند
+            self.last_msc, self.last_seen = cursor
+        return closed
+
+    def advance_to(self, server_time):
+        """بستن کندل‌هایی که تا زمان سرور server_time (ثانیه) تمام شده‌اند"""
+        closed = []
+        for frame in self._frames:
+            if frame.time is not None and frame.time + frame.seconds <= server_time:
+                self._close(frame, closed)
+                frame.time = None
+        return closed
+
+    def bars(self, name, count=None):
+        """
+        آخرین count کندل (کندل در حال شکل‌گیری در انتها) با dtype خروجی copy_rates_*؛
+        view تا tick بعدی معتبر است
+        """
+        frame = self._by_name[name]
+        if frame.time is not None:
+            # BarBuffer کندل با زمان برابر آخرین کندل را در جا بازنویسی می‌کند
+            frame.buffer.append(frame.row())
+        return frame.buffer.view(count)
+
+
+class TickBarFeed:
+    """دریافت tickها از MT5 (copy_ticks_from) و نگه‌داری کندل‌های چند تایم‌فریم"""
+
+    def __init__(self, mt5_conn, timeframes=None, capacity=None):
+        self.mt5_conn = mt5_conn
+        info = mt5_conn.get_symbol_spec()
+        self.aggregator = TickBarAggregator(timeframes, capacity, point=info.point if info else 0.01)
+
+    def seed(self):
+        """تاریخچه همه تایم‌فریم‌ها از کندل‌های بروکر؛ خروجی False اگر داده‌ای دریافت نشود"""
+        ok = True
+        last_time = 0
+        for name in self.aggregator.timeframes:
+            count = self.aggregator._by_name[name].buffer.capacity
+            rates = mt5.copy_rates_from_pos(self.mt5_conn.symbol, getattr(mt5, f'TIMEFRAME_{name}'), 0, count)
+            if rates is None or len(rates) == 0:
+                ok = False
+                continue
+            self.aggregator.seed(name, rates)
+            last_time = max(last_time, int(rates['time'][-1]))
+        tick = mt5.symbol_info_tick(self.mt5_conn.symbol)
+        # tickهای کندل در حال شکل‌گیری قبلا در کندل seed شده شمرده شده‌اند
+        self.aggregator.last_msc = getattr(tick, 'time_msc', 0) if tick else last_time * 1000
+        self.aggregator.last_seen = 1 if tick else 0
+        return ok
+
+    def update(self):
+        """دریافت و اعمال tickهای جدید؛ خروجی لیست (name, bar) کندل‌های بسته شده"""
+        if self.aggregator.last_msc is None:
+            self.seed()
+        ticks = self.mt5_conn.get_ticks_since(self.aggregator.last_msc, self.aggregator.last_seen)
+        return self.aggregator.process(ticks)
+
+    def bars(self, name, count=None):
+        return self.aggregator.bars(name, count)
+
+    def bar_frame(self, name, count=None):
+        rates = self.aggregator.bars(name, count)
+        if rates is None or len(rates) == 0:
+            return None
+        return BarFrame.from_rates(rates, tz=self.mt5_conn.iran_tz)
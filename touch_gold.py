@@ -0,0 +1,123 @@
+"""
+تشخیص touch سطح fib 0.705 در سطح tick
+
+Phase 2 در حالت bar (update_fibonacci_touches) فقط کندل بسته شده را بررسی می‌کند و
+touchها و ابطال fib 1.0 تا 15 دقیقه دیر دیده می‌شوند. TickTouchTracker همان قواعد را
+روی هر tick (قیمت bid، مثل high/low کندل‌ها) اجرا می‌کند و BotState را مستقیما به‌روز می‌کند:
+
+- عبور از fib 0.0: محاسبه دوباره Fibonacci از قیمت جدید و پاک شدن first touch
+- عبور از fib 1.0: ریست setup
+- tick در محدوده touch (1% tolerance): first touch، و در کندل دیگری (زمان tick گرد شده به
+  کندل M15) second touch با همان شرط نزدیکی به سطح. first_touch_value مثل حالت bar
+  کندل touch است و low/high آن تا پایان همان کندل با tickها به‌روز می‌شود.
+
+هزینه هر tick ثابت است (چند مقایسه و در صورت نیاز یک fibonacci_retracement). حالت 'bar'
+همان رفتار قبلی است و بک‌تست همیشه با آن اجرا می‌شود.
+"""
+
+from fibo_calculate_gold import fibonacci_retracement
+from metatrader5_config_gold import TOUCH_CONFIG, BAR_SCHEDULER_CONFIG
+from save_file_gold import log
+from utils_gold import tick_cursor
+
+
+class TickTouchTracker:
+    """ماشین حالت touch روی tickها برای setup فعال (bullish یا bearish)"""
+
+    def __init__(self, mode=None, poll_interval=None, fib_705=0.705, bar_seconds=None, log_fn=log):
+        self.mode = mode or TOUCH_CONFIG['mode']
+        self.poll_interval = poll_interval or TOUCH_CONFIG['poll_interval']
+        self.fib_705 = fib_705
+        self.bar_seconds = bar_seconds or BAR_SCHEDULER_CONFIG['timeframe_seconds']
+        self.log_fn = log_fn
+        self.swing_type = None
+        self.cursor_msc = None  # زمان آخرین tick پردازش شده (میلی‌ثانیه زمان سرور)
+        self.cursor_seen = 0    # تعداد tickهای پردازش شده با زمان cursor_msc
+        self.ticks = 0
+
+    @property
+    def enabled(self):
+        return self.mode == 'tick'
+
+    @property
+    def cursor(self):
+        """آرگومان‌های get_ticks_since برای tickهای بعد از آخرین tick پردازش شده"""
+        return self.cursor_msc, self.cursor_seen
+
+    @property
+    def armed(self):
+        return self.enabled and self.swing_type is not None
+
+    def arm(self, swing_type, from_msc=None):
+        """
+        شروع یا ادامه دنبال کردن setup. from_msc برای setup جدید زمان شروع tickهایی است
+        که باید بررسی شوند (باز شدن کندل در حال شکل‌گیری)؛ None یعنی ادامه از cursor فعلی.
+        """
+        self.swing_type = swing_type
+        if from_msc is not None:
+            self.cursor_msc = from_msc
+            self.cursor_seen = 0
+
+    def disarm(self):
+        self.swing_type = None
+
+    def process(self, state, ticks):
+        """
+        اجرای ماشین حالت روی tickهای جدید (structured array خروجی copy_ticks_*).
+        خروجی set رویدادها: 'fib_update'، 'first_touch'، 'second_touch' و 'reset'.
+        بعد از 'reset' دنبال کردن متوقف می‌شود (last_swing_type باید None شود).
+        """
+        events = set()
+        if ticks is None or len(ticks) == 0:
+            return events
+        self.cursor_msc, self.cursor_seen = tick_cursor(ticks, self.cursor_msc, self.cursor_seen)
+        if not self.armed or not state.fib_levels:
+            return events
+        bullish = self.swing_type == 'bullish'
+        extreme = 'low' if bullish else 'high'
+        key = str(self.fib_705)
+        bar_seconds = self.bar_seconds
+        self.ticks += len(ticks)
+        for price, msc in zip(ticks['bid'].tolist(), ticks['time_msc'].tolist()):
+            fib = state.fib_levels
+            entry_level = fib[key]
+            seconds = msc // 1000
+            bar_time = seconds - seconds % bar_seconds
+            if (price > fib['0.0']) if bullish else (price < fib['0.0']):
+                state.fib_levels = fibonacci_retracement(start_price=price, end_price=fib['1.0'],
+                                                         fib_705=self.fib_705)
+                state.fib0_time = bar_time
+                state.first_touch = False
+                state.first_touch_value = None
+                events.add('fib_update')
+                continue
+            if (price < fib['1.0']) if bullish else (price > fib['1.0']):
+                state.reset()
+                self.disarm()
+                self.log_fn(f"{'📈 Price dropped below' if bullish else '📉 Price rose above'} fib1 (tick {price:.2f}) - reset",
+                            color='red')
+                events.add('reset')
+                return events
+            if not ((price <= entry_level * 1.01) if bullish else (price >= entry_level * 0.99)):
+                continue
+            first = state.first_touch_value
+            if not state.first_touch:
+                state.first_touch = True
+                state.first_touch_value = {'timestamp': bar_time, 'high': price, 'low': price, 'close': price}
+                events.add('first_touch')
+                self.log_fn(f"{'📈' if bullish else '📉'} First touch on fib0.705 (tick {price:.2f})", color='yellow')
+            elif first['timestamp'] == bar_time:
+                # همان کندل first touch: low/high کندل touch به‌روز می‌شود
+                first[extreme] = min(first[extreme], price) if bullish else max(first[extreme], price)
+                first['close'] = price
+            elif not state.second_touch and abs(price - entry_level) < abs(first[extreme] - entry_level) * 1.5:
+                state.second_touch = True
+                state.second_touch_value = {'timestamp': bar_time, 'high': price, 'low': price, 'close': price}
+                events.add('second_touch')
+                self.log_fn(f"{'📈' if bullish else '📉'} Second touch detected (tick {price:.2f}) - signal ready!",
+                            color='green')
+        if 'fib_update' in events:
+            fib = state.fib_levels
+            self.log_fn(f"{'📈' if bullish else '📉'} Updated fibonacci (tick): fib0:{fib['0.0']:.2f} "
+                        f"fib1:{fib['1.0']:.2f}", color='green')
+        return events
@@ -0,0 +1,209 @@
+"""
+موتور Trailing Stop در سطح tick
+
+manage_trailing_stop در حلقه main فقط با هر کندل جدید M15 اجرا می‌شود و در حرکت‌های
+سریع طلا ممکن است خیلی بیشتر از gap_r سود پس داده شود. TrailingEngine روی یک thread
+جدا symbol_info_tick را هر poll_interval ثانیه می‌خواند (MT5 در پایتون tick را push
+نمی‌کند) و برای هر tick جدید قاعده EXIT_MANAGEMENT_CONFIG['trailing_stop'] را روی همه
+پوزیشن‌های magic ربات اجرا می‌کند. همه فراخوانی‌ها از mt5_gateway_gold عبور می‌کنند.
+
+پوزیشن‌ها هر positions_refresh ثانیه (و بعد از هر تغییر یا خطا) دوباره خوانده می‌شوند
+و SL بین دو خواندن به صورت محلی نگه داشته می‌شود. درخواست‌های تغییر SL از
+SLModifyScheduler (حداقل گام، cooldown و محدودیت نرخ) عبور می‌کنند. فاصله دریافت tick تا پایان
+order_send (tick-to-modify) اندازه‌گیری و با latency_budget_ms مقایسه می‌شود.
+
+mt5_conn باید connector جدا از حلقه main باشد: modify_sl_tp snapshot و cache مشخصات
+نماد همان connector را باطل می‌کند و MT5ConnectorGold برای استفاده همزمان از دو thread
+ساخته نشده است. modifier مشترک SLModifyScheduler (با lock خودش) است و درخواست‌های این
+thread را با همین connector ارسال می‌کند.
+"""
+
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+from clock_gold import get_clock
+from metatrader5_config_gold import MT5_CONFIG, EXIT_MANAGEMENT_CONFIG, TRAILING_ENGINE_CONFIG
+from mt5_gateway_gold import mt5
+from save_file_gold import log
+from sl_modify_gold import SLModifyScheduler
+from strategy_gold import trailing_stop_level
+
+
+class TrailedPosition:
+    """وضعیت محلی یک پوزیشن برای محاسبه trailing بین دو خواندن positions_get"""
+
+    __slots__ = ('ticket', 'is_buy', 'price_open', 'sl')
+
+    def __init__(self, ticket, is_buy, price_open, sl):
+        self.ticket = ticket
+        self.is_buy = is_buy
+        self.price_open = price_open
+        self.sl = sl
+
+
+class TrailingEngine:
+    """اجرای Trailing Stop روی هر tick برای پوزیشن‌های magic ربات"""
+
+    def __init__(self, mt5_conn, modifier=None, poll_interval=None, positions_refresh=None,
+                 latency_budget_ms=None, metrics_window=None):
+        cfg = TRAILING_ENGINE_CONFIG
+        self.mt5_conn = mt5_conn
+        self.modifier = modifier or SLModifyScheduler(mt5_conn)
+        self.symbol = mt5_conn.symbol
+        self.magic = MT5_CONFIG['magic_number']
+        self.poll_interval = poll_interval or cfg['poll_interval']
+        self.positions_refresh = positions_refresh or cfg['positions_refresh']
+        self.latency_budget_ms = latency_budget_ms or cfg['latency_budget_ms']
+        self.stats = Counter()
+        self._latencies = deque(maxlen=metrics_window or cfg['metrics_window'])
+        self._positions = {}
+        self._positions_time = None
+        self._last_tick_msc = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    # --- چرخه عمر thread ---
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='trailing-engine', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                self.stats['errors'] += 1
+                log(f"❌ Trailing engine error: {e}", color='red')
+            self._stop.wait(self.poll_interval)
+
+    # --- پردازش tick ---
+    def poll(self):
+        """خواندن tick فعلی و پردازش آن اگر جدید باشد؛ خروجی تعداد SLهای تغییر داده شده"""
+        tick = mt5.symbol_info_tick(self.symbol)
+        received = time.perf_counter()
+        if not tick:
+            return 0
+        tick_msc = getattr(tick, 'time_msc', 0) or tick.time * 1000
+        if tick_msc == self._last_tick_msc:
+            return 0
+        self._last_tick_msc = tick_msc
+        return self.on_tick(tick, received)
+
+    def on_tick(self, tick, received=None):
+        """اجرای قاعده trailing روی یک tick؛ received زمان perf_counter دریافت tick است"""
+        if received is None:
+            received = time.perf_counter()
+        self.stats['ticks'] += 1
+        if not EXIT_MANAGEMENT_CONFIG.get('enable', False):
+            return 0
+        trailing_config = EXIT_MANAGEMENT_CONFIG.get('trailing_stop', {})
+        if not trailing_config.get('enable', False):
+            return 0
+        start_r = trailing_config.get('start_r', 1.5)
+        gap_r = trailing_config.get('gap_r', 0.5)
+
+        now = get_clock().monotonic()
+        if self._positions_time is None or now - self._positions_time >= self.positions_refresh:
+            self.refresh_positions()
+
+        profits = {}
+        for pos in list(self._positions.values()):
+            # برای BUY با bid و برای SELL با ask محاسبه می‌شود
+            price = tick.bid if pos.is_buy else tick.ask
+            new_sl, profit_R = trailing_stop_level(pos.is_buy, pos.price_open, pos.sl, price,
+                                                   start_r=start_r, gap_r=gap_r)
+            profits[pos.ticket] = profit_R
+            if new_sl is not None:
+                self.modifier.propose(pos.ticket, pos.is_buy, new_sl, pos.sl, abs(pos.price_open - pos.sl))
+
+        # پیشنهادهای این tick و pendingهای قبلی (cooldown/بودجه) با یک درخواست برای هر ticket
+        updated = 0
+        if self.modifier.pending:
+            for ticket, new_sl, result, done_at in self.modifier.flush(mt5_conn=self.mt5_conn):
+                if self._record(ticket, new_sl, profits.get(ticket), result, (done_at - received) * 1000.0):
+                    updated += 1
+        return updated
+
+    def refresh_positions(self):
+        """خواندن دوباره پوزیشن‌های باز ربات از MT5"""
+        positions = mt5.positions_get(symbol=self.symbol)
+        self._positions_time = get_clock().monotonic()
+        if positions is None:
+            return
+        self.stats['refreshes'] += 1
+        current = {}
+        for p in positions:
+            if p.magic != self.magic:
+                continue
+            if p.type not in (mt5.POSITION_TYPE_BUY, mt5.POSITION_TYPE_SELL):
+                continue
+            current[p.ticket] = TrailedPosition(p.ticket, p.type == mt5.POSITION_TYPE_BUY, p.price_open, p.sl)
+        self._positions = current
+        self.modifier.retain(current)
+
+    def _record(self, ticket, new_sl, profit_R, result, latency_ms):
+        """ثبت نتیجه یک درخواست ارسال شده توسط modifier و latency آن"""
+        self._latencies.append(latency_ms)
+        if latency_ms > self.latency_budget_ms:
+            self.stats['over_budget'] += 1
+            log(f"⚠️ Trailing modify took {latency_ms:.1f}ms (budget {self.latency_budget_ms}ms): Ticket={ticket}",
+                color='yellow', save_to_file=False)
+        pos = self._positions.get(ticket)
+        if result and result.retcode == mt5.TRADE_RETCODE_DONE:
+            self.stats['modified'] += 1
+            if pos is not None:
+                old_sl, pos.sl = pos.sl, new_sl
+                icon = "📈" if pos.is_buy else "📉"
+                profit = f"{profit_R:.2f}R" if profit_R is not None else "-"
+                log(f"{icon} Trailing Stop updated (tick): Ticket={ticket}, Old SL={old_sl:.2f}, "
+                    f"New SL={new_sl:.2f}, Profit={profit}, Latency={latency_ms:.1f}ms", color='green')
+            return True
+        # پوزیشن ممکن است بسته شده باشد یا SL از بیرون تغییر کرده باشد
+        self.stats['failed'] += 1
+        self._positions_time = None
+        log(f"❌ Failed to update Trailing Stop: {result.comment if result else 'No result'}", color='red')
+        return False
+
+    # --- متریک‌ها ---
+    def metrics(self):
+        """شمارنده‌ها و آمار latency (میلی‌ثانیه) tick-to-modify روی metrics_window تغییر اخیر"""
+        out = dict(self.stats)
+        out['positions'] = len(self._positions)
+        out['sl_modify'] = dict(self.modifier.stats)
+        if self._latencies:
+            values = np.fromiter(self._latencies, dtype=np.float64)
+            out['latency_ms'] = {
+                'last': float(values[-1]),
+                'p50': float(np.percentile(values, 50)),
+                'p95': float(np.percentile(values, 95)),
+                'max': float(values.max()),
+            }
+        return out
+
+    def summary(self):
+        """یک خط خلاصه برای لاگ"""
+        m = self.metrics()
+        line = (f"ticks={m.get('ticks', 0)}, modified={m.get('modified', 0)}, failed={m.get('failed', 0)}, "
+                f"over_budget={m.get('over_budget', 0)}")
+        suppressed = sum(v for k, v in m['sl_modify'].items() if k.startswith('suppressed_'))
+        line += f", sl sent={m['sl_modify'].get('sent', 0)} suppressed={suppressed}"
+        latency = m.get('latency_ms')
+        if latency:
+            line += f", latency p50={latency['p50']:.1f}ms p95={latency['p95']:.1f}ms max={latency['max']:.1f}ms"
+        return line
@@ -1,3 +1,35 @@
+from datetime import time
+
+
+def is_within_trading_hours(now_t, trading_hours):
+    """
+    بررسی قرار گرفتن ساعت now_t (ساعت ایران) در بازه trading_hours
+    (بازه‌هایی مثل 17:30 - 02:30 که از نیمه‌شب عبور می‌کنند هم پشتیبانی می‌شوند)
+    """
+    start = time.fromisoformat(trading_hours['start'])
+    end = time.fromisoformat(trading_hours['end'])
+    if start <= end:
+        return start <= now_t <= end
+    return now_t >= start or now_t <= end
+
+
+def is_weekday(weekday):
+    """شنبه و یکشنبه (weekday 5 و 6) بازار طلا بسته است"""
+    return weekday not in (5, 6)
+
+
+def tick_cursor(ticks, time_msc, seen):
+    """
+    cursor بعد از پردازش خروجی get_ticks_since(time_msc, seen): (time_msc آخرین tick،
+    تعداد tickهای خوانده شده با همان time_msc)
+    """
+    if ticks is None or len(ticks) == 0:
+        return time_msc, seen
+    times = ticks['time_msc']
+    last = int(times[-1])
+    count = len(times) - int(times.searchsorted(last, side='left'))
+    return last, count + (seen if last == time_msc else 0)
+
 
 
 class BotState:
@@ -0,0 +1,199 @@
+"""
+بهینه‌سازی Walk-forward
+
+داده به foldهای پشت سر هم تقسیم می‌شود: در هر fold شبکه پارامترها روی بازه train
+اجرا می‌شود، بهترین نقطه بر اساس objective انتخاب می‌شود و همان نقطه روی بازه test
+بعدی (خارج از نمونه) ارزیابی می‌شود. نتیجه نهایی فقط از بازه‌های test ساخته می‌شود.
+
+foldها به صورت موازی روی کندل‌های حافظه مشترک (sweep_gold.SharedBars) اجرا می‌شوند.
+هر worker legs گام‌ها را برای هر (threshold, window_size) در یک cache لغزان نگه
+می‌دارد، بنابراین بخش مشترک بازه‌های train foldهای پشت سر هم دوباره محاسبه نمی‌شود.
+"""
+
+import math
+import os
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from backtest_gold import load_bars, default_params, run_backtest_arrays, compute_step_legs, first_step
+from get_legs_gold import precompute_leg_features
+from sweep_gold import SharedBars, attach_bars, expand_grid, params_row
+from metatrader5_config_gold import BACKTEST_CONFIG, SWEEP_CONFIG, WALKFORWARD_CONFIG
+
+# state هر worker (بعد از _init_worker مقداردهی می‌شود)
+_worker_shm = None
+_worker_bars = None
+_worker_features = None
+_legs_cache = {}
+
+
+def make_folds(n_bars, train_bars, test_bars, step_bars=None, start=0):
+    """
+    لیست foldها به صورت (train_start, train_stop, test_start, test_stop) روی
+    اندیس کندل‌های بسته شده؛ test هر fold بلافاصله بعد از train آن است.
+    """
+    step_bars = step_bars or test_bars
+    last = n_bars - 1  # آخرین کندل فقط نقش کندل در حال شکل‌گیری را دارد
+    folds = []
+    a = start
+    while a + train_bars + test_bars <= last:
+        folds.append((a, a + train_bars, a + train_bars, a + train_bars + test_bars))
+        a += step_bars
+    return folds
+
+
+def _init_worker(name, length):
+    global _worker_shm, _worker_bars, _worker_features, _legs_cache
+    _worker_shm, _worker_bars = attach_bars(name, length)
+    _worker_features = None
+    _legs_cache = {}
+
+
+def _step_legs(threshold, window_size, start, stop):
+    """
+    legs گام‌های [start, stop) با cache لغزان برای هر (threshold, window_size)
+
+    foldها به ترتیب زمانی به worker می‌رسند؛ اگر بازه جدید با بازه cache شده
+    هم‌پوشانی داشته باشد فقط گام‌های جدید محاسبه و گام‌های قبل از start دور ریخته می‌شوند.
+    """
+    global _worker_features
+    if _worker_features is None:
+        b = _worker_bars
+        _worker_features = precompute_leg_features(b['open'], b['high'], b['low'], b['close'])
+    key = (threshold, window_size)
+    cached = _legs_cache.get(key)
+    if cached is None or not cached[0] <= start <= cached[0] + len(cached[1]):
+        cached = (start, [])
+    lo, legs = cached
+    hi = lo + len(legs)
+    if stop > hi:
+        legs = legs + compute_step_legs(_worker_features, _worker_bars['open'], threshold, window_size, hi, stop)
+    legs = legs[start - lo:]
+    _legs_cache[key] = (start, legs)
+    return legs[:stop - start]
+
+
+def _run_fold_group(task):
+    """اجرای همه نقاط یک گروه (threshold, window_size) روی train و test یک fold"""
+    fold_id, threshold, window_size, combos, (train_start, train_stop, test_start, test_stop) = task
+    b = _worker_bars
+    train_start = max(train_start, first_step(window_size))
+    step_legs = _step_legs(threshold, window_size, train_start, test_stop)
+    split = test_start - train_start
+    rows = []
+    for combo in combos:
+        params = dict(combo, threshold=threshold, window_size=window_size)
+        row = dict(params_row(params), fold=fold_id)
+        for phase, legs, start, stop in (('train', step_legs[:split], train_start, train_stop),
+                                         ('test', step_legs[split:], test_start, test_stop)):
+            result = run_backtest_arrays(
+                b['time'], b['open'], b['high'], b['low'], b['close'],
+                params=params, step_legs=legs, start=start, stop=stop,
+            )
+            for k, v in result.summary().items():
+                row[f'{phase}_{k}'] = v
+        rows.append(row)
+    return rows
+
+
+def build_tasks(grid, folds):
+    """یک task برای هر fold و هر گروه (threshold, window_size)؛ مرتب بر اساس گروه و سپس زمان"""
+    groups = {}
+    for point in expand_grid(grid):
+        point = dict(point)
+        key = (point.pop('threshold'), point.pop('window_size'))
+        groups.setdefault(key, []).append(point)
+    return [(fold_id, thr, ws, combos, fold)
+            for (thr, ws), combos in groups.items()
+            for fold_id, fold in enumerate(folds)]
+
+
+def select_best(table, objective='expectancy_R', min_trades=0):
+    """بهترین نقطه شبکه هر fold بر اساس objective روی train"""
+    column = f'train_{objective}'
+    valid = table[table['train_trades'] >= min_trades]
+    valid = valid[np.isfinite(valid[column])]
+    if valid.empty:
+        return valid
+    best = valid.loc[valid.groupby('fold')[column].idxmax()]
+    return best.sort_values('fold').reset_index(drop=True)
+
+
+def out_of_sample_summary(best):
+    """خلاصه عملکرد فقط روی بازه‌های test (پارامترها در هر fold مستقل انتخاب شده‌اند)"""
+    trades = int(best['test_trades'].sum())
+    total_r = float(best['test_total_R'].sum())
+    return {
+        'folds': int(len(best)),
+        'trades': trades,
+        'total_R': total_r,
+        'expectancy_R': total_r / trades if trades else 0.0,
+        'return_pct': float((np.prod(1.0 + best['test_return_pct'].to_numpy() / 100.0) - 1.0) * 100.0),
+        'max_fold_drawdown_pct': float(best['test_max_drawdown_pct'].max()) if len(best) else 0.0,
+        'profitable_folds': int((best['test_total_R'] > 0).sum()),
+    }
+
+
+def run_walkforward(data, grid=None, train_bars=None, test_bars=None, step_bars=None,
+                    objective=None, min_trades=None, processes=None, results_file=None):
+    """
+    اجرای walk-forward؛ خروجی (جدول کامل نتایج، پارامترهای انتخاب شده هر fold، خلاصه خارج از نمونه)
+    """
+    cfg = WALKFORWARD_CONFIG
+    defaults = default_params()
+    grid = dict(grid or SWEEP_CONFIG['grid'])
+    grid.setdefault('threshold', [defaults['threshold']])
+    grid.setdefault('window_size', [defaults['window_size']])
+    objective = objective or cfg['objective']
+    min_trades = cfg['min_trades'] if min_trades is None else min_trades
+
+    folds = make_folds(
+        len(data), train_bars or cfg['train_bars'], test_bars or cfg['test_bars'],
+        step_bars or cfg.get('step_bars'), start=first_step(max(grid['window_size'])),
+    )
+    if not folds:
+        raise ValueError("Not enough bars for a single walk-forward fold")
+    tasks = build_tasks(grid, folds)
+    processes = processes or SWEEP_CONFIG.get('processes') or os.cpu_count()
+
+    rows = []
+    with SharedBars.from_frame(data) as shared:
+        initargs = (shared.name, shared.length)
+        if processes == 1:
+            _init_worker(*initargs)
+            try:
+                for task in tasks:
+                    rows.extend(_run_fold_group(task))
+            finally:
+                _worker_shm.close()
+        else:
+            # chunk های پیوسته از foldهای یک گروه به یک worker می‌رسند تا cache لغزان استفاده شود
+            chunksize = max(1, math.ceil(len(tasks) / (processes * 4)))
+            with Pool(processes, initializer=_init_worker, initargs=initargs) as pool:
+                for group_rows in pool.imap_unordered(_run_fold_group, tasks, chunksize=chunksize):
+                    rows.extend(group_rows)
+
+    table = pd.DataFrame(rows).sort_values('fold', kind='stable').reset_index(drop=True)
+    best = select_best(table, objective, min_trades)
+    if len(best):
+        times = data.index
+        best.insert(1, 'test_from', [times[folds[f][2] + 1] for f in best['fold']])
+        best.insert(2, 'test_to', [times[folds[f][3]] for f in best['fold']])
+    if results_file:
+        best.to_csv(results_file, index=False)
+    return table, best, out_of_sample_summary(best)
+
+
+if __name__ == "__main__":
+    import time as _time
+
+    bars = load_bars(BACKTEST_CONFIG['data_file'])
+    t0 = _time.perf_counter()
+    table, best, summary = run_walkforward(bars, results_file=WALKFORWARD_CONFIG['results_file'])
+    print(f"Walk-forward: {best['fold'].nunique() if len(best) else 0} folds, "
+          f"{len(table)} runs in {_time.perf_counter() - t0:.1f}s")
+    print(best.to_string(index=False))
+    for k, v in summary.items():
+        print(f"{k}: {v}")